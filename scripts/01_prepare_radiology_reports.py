@@ -3,44 +3,45 @@
 # Objective: Merge the suidDFFound.csv (brain image metadata) with post_traumatic_hemorrhage_search.xlsx (annotated for trauma and hemorrhage)
 # Output: data/processed/suid_rad_reports.csv
 
+import os
+
+import numpy as np
 import pandas as pd
 
+from nu_tbi.instrument import span
+from nu_tbi.joins import join, key_index, lookup
+from nu_tbi.report_tags import tag_reports, KEYWORDS, DERIVED
+from nu_tbi.workbooks import read_sheet
+
+# identifiers in suidDFFound.csv that are never read; the unnamed index column ('Unnamed: 0') is skipped as well and
+# every other column is read as text
+SUID_SKIPPED = ('Name', 'DOB')
+SUID_CHUNK_ROWS = 200000
+
 # remove whitespace that exists before and after strings
 def remove_whitespace(string): 
     processed_string = string.rstrip()
     processed_string = processed_string.lstrip()
     return processed_string
 
-# load in the image meta-data ; these images look to have been a large extraction for brain CTs between a range of dates
-print('loading in suidDFFound.csv')
-suid = pd.read_csv('data/suidDFFound.csv', index_col = 0)
-print('length of suid dataframe', len(suid))
-
-# evaluate whether each row is a unique accession number
-# if so, the unique `SearchAccession` ids should equal the length of the dataframe
-print('evaluating whether each row is a unique accession number - TRUE if so')
-print(len(suid[['SearchAccession']].drop_duplicates()) == len(suid))
-
-print('pre-processing suid dataframe')
-
-# convert `StudyDate_format` into a datatime variable
-suid['StudyDate_format'] = pd.to_datetime(suid['StudyDate'], format='%Y%m%d')
-
-# pre-process accession text to remove '*CT' prefix
-suid['SearchAccession_temp'] = suid['SearchAccession'].str.replace("*","")
-suid['SearchAccession_temp'] = suid['SearchAccession_temp'].str.replace("CT","")
-
-# remove whitespace
-suid['SearchAccession_temp'] = suid['SearchAccession_temp'].apply(lambda x:remove_whitespace(x))
-
 # import annotated radiology reports; these reports have been annotated by 
 # the key-word matching and NLP detection method described by data/post_traumatic_hemorrhage/search_criteria.txt
 print('importing radiology reports')
-rad_reports = pd.read_excel('data/post_traumatic_hemorrhage_search.xlsx',
-                             engine = 'openpyxl')
+rad_reports = read_sheet('data/post_traumatic_hemorrhage_search.xlsx')
 
 print('length of radiology reports', len(rad_reports))
 
+# re-tag the reports in one pass; the annotated flags stay the source of truth, the re-tagged ones are compared to
+# them and the portable scanner flags (not in the xlsx) are kept
+print('tagging radiology reports')
+report_tags = tag_reports(rad_reports['report'], jobs = os.cpu_count())
+for flag in list(KEYWORDS) + list(DERIVED):
+    if flag in rad_reports.columns:
+        agreement = (report_tags[flag] == rad_reports[flag].fillna(0).astype(bool)).mean()
+        print(f'agreement with annotated flag {flag!r}: {agreement:.4f}')
+rad_reports['portable'] = report_tags['portable'].astype('int8')
+rad_reports['8-slice'] = report_tags['8-slice'].astype('int8')
+
 # pre-process rad_reports `accession` numbers similarly to suid
 # pre-process accession text to remove '*CT' prefix
 print('pre-processing radiology reports')
@@ -50,23 +51,57 @@ rad_reports['accession_temp'] = rad_reports['accession_temp'].str.replace("CT","
 # remove whitespace
 rad_reports['accession_temp'] = rad_reports['accession_temp'].apply(lambda x:remove_whitespace(x))
 
+# index the reports by accession; every chunk of suidDFFound.csv is probed against it
+# each image matches at most one report; the join stops with the duplicated accessions if not
+report_index = key_index(rad_reports, 'accession')
+
+# load in the image meta-data ; these images look to have been a large extraction for brain CTs between a range of dates
+# the file is read in chunks of SUID_CHUNK_ROWS rows, without Name, DOB and the index column,
+# and only the rows matching a report are kept, so memory does not grow with the size of the extraction
+print('streaming suidDFFound.csv and keeping images with a report')
+suid_parts = []
+accession_hashes = []
+n_suid = 0
+with span('01 stream suidDFFound.csv') as timer:
+    for chunk in pd.read_csv('data/suidDFFound.csv',
+                             usecols = lambda c: c not in SUID_SKIPPED and not c.startswith('Unnamed: '),
+                             dtype = 'str',
+                             chunksize = SUID_CHUNK_ROWS):
+        n_suid += len(chunk)
+        accession_hashes.append(pd.util.hash_pandas_object(chunk['SearchAccession'], index = False).to_numpy())
+        suid_parts.append(join(chunk,
+                               report_index, 
+                               left_on = 'EDWAccession', 
+                               right_on = 'accession',
+                               cardinality = 'm:1'))
+        timer.add(items = len(chunk))
+print('length of suid dataframe', n_suid)
+
+# evaluate whether each row is a unique accession number
+# if so, the number of unique `SearchAccession` ids (hashed while streaming) should equal the length of the dataframe
+print('evaluating whether each row is a unique accession number - TRUE if so')
+print(len(np.unique(np.concatenate(accession_hashes))) == n_suid)
+
 # combine rad_reports with the suid dataframe
-print('merging rad_reports with suid dataframe')
-suid_rad_reports = pd.merge(suid,
-                            rad_reports, 
-                            left_on = 'EDWAccession', 
-                            right_on = 'accession',
-                            how = 'inner')  
+suid_rad_reports = pd.concat(suid_parts, ignore_index = True)
+
+print('pre-processing suid dataframe')
+
+# convert `StudyDate_format` into a datatime variable
+suid_rad_reports['StudyDate_format'] = pd.to_datetime(suid_rad_reports['StudyDate'], format='%Y%m%d')
+
+# pre-process accession text to remove '*CT' prefix
+suid_rad_reports['SearchAccession_temp'] = suid_rad_reports['SearchAccession'].str.replace("*","")
+suid_rad_reports['SearchAccession_temp'] = suid_rad_reports['SearchAccession_temp'].str.replace("CT","")
+
+# remove whitespace
+suid_rad_reports['SearchAccession_temp'] = suid_rad_reports['SearchAccession_temp'].apply(lambda x:remove_whitespace(x))
 
 # add report_num_temp which is used throughout other scripts
 suid_rad_reports['report_num_temp'] = suid_rad_reports['EDWAccession'].str.replace(r'.*CT', 'CT', regex=True)
 
 print('length of merged dataset', len(suid_rad_reports))
 
-# delete identifying information
-del suid_rad_reports['Name']
-del suid_rad_reports['DOB']
-
 # add previously generated unique ids as initially assigned via notebooks/03_process_image_data.ipynb 
 
 # load data
@@ -75,10 +110,10 @@ unique_ids = pd.read_csv('data/suid_reports_identifiers_master_list.csv')
 
 # merge dataframes
 print('merging dataframes by accession numbers')
-suid_rad_reports = pd.merge(suid_rad_reports, 
-                            unique_ids[['unique_study_id', 'SearchAccession', 'VNAAccession', 'EDWAccession']],
-                            on = ['SearchAccession', 'VNAAccession', 'EDWAccession'],
-                            how = 'inner')
+suid_rad_reports = join(suid_rad_reports, 
+                        lookup(unique_ids, ['SearchAccession', 'VNAAccession', 'EDWAccession'], ['unique_study_id']),
+                        on = ['SearchAccession', 'VNAAccession', 'EDWAccession'],
+                        cardinality = 'm:1')
 
 print('length of merged dataset with identifiers', len(suid_rad_reports))
 
@@ -88,7 +123,8 @@ suid_rad_reports = suid_rad_reports[['unique_study_id',  'report_num_temp', 'Sea
                                      'StudyDescription', 'StudyDate', 'StudyTime', 'SUIDs',
                                      'StudyDate_format', 'SearchAccession_temp', 'order_reason', 'accession',
                                      'trauma', 'fall', 'injury', 'assault', 'auto', 'any trauma',
-                                     ' hemorrhage ', 'posttraumatic hemorrhage', 'report', 'accession_temp']]
+                                     ' hemorrhage ', 'posttraumatic hemorrhage', 'report', 'accession_temp',
+                                     'portable', '8-slice']]
 
 # save merged dataset 
 print('saving merged dataset to data/processed/suid_rad_reports.csv')
@@ -4,8 +4,11 @@
 
 import pandas as pd
 
+from nu_tbi.joins import join, key_index, lookup, unmatched
+from nu_tbi.paths import HEMORRHAGE_PROJECT_DIR
+
 # import scans to include 
-tbi_scans = pd.read_csv('data/processed/20240325_1136_tbi_patients_scans_to_include.csv')
+tbi_scans = pd.read_csv('data/processed/20240325_1136_tbi_patients_scans_to_include.csv').drop_duplicates(ignore_index = True)
 
 # remove whitespace that exists before and after strings to aid in pre-processing
 def remove_whitespace(string): 
@@ -25,8 +28,8 @@ batch2 = batch2 = pd.read_csv('data/HemorrhageProject/HemorrhageTransfer20231128
                     header = None, delimiter = '|', names = ['patient_id', 'accession', 'folder'])
 
 # add file paths for scans
-batch1['file_path'] = '/share/hemorrhage_project/Transfer20211010/images/' + batch1['folder']
-batch2['file_path'] = '/share/hemorrhage_project/HemorrhageTransfer20231128/images/' + batch2['folder']
+batch1['file_path'] = HEMORRHAGE_PROJECT_DIR + '/Transfer20211010/images/' + batch1['folder']
+batch2['file_path'] = HEMORRHAGE_PROJECT_DIR + '/HemorrhageTransfer20231128/images/' + batch2['folder']
 
 # combine batches 
 batch_all = pd.concat([batch1, batch2])
@@ -48,25 +51,24 @@ batch_all['accession_temp'] = batch_all['accession_temp'].str.replace(r"^.*?CT",
 # remove white spaces
 batch_all['accession_temp'] = batch_all['accession_temp'].apply(lambda x:remove_whitespace(x))
 
+# index the file paths by accession once; it is used for the match, the missing scans and the VNA match below
+batch_all = batch_all.drop_duplicates(ignore_index = True)
+batch_index = key_index(batch_all, 'accession_temp')
+
 # merge our list of tbi_scans for our identified cohort and merge with the file paths
-tbi_scans_id = pd.merge(tbi_scans,
-                        batch_all, 
-                        on = 'accession_temp',
-                        how = 'inner').drop_duplicates()
+# one row per scan in tbi_scans; a scan can have more than one folder (e.g. in both transfers)
+tbi_scans_id = join(tbi_scans,
+                    batch_index, 
+                    on = 'accession_temp',
+                    cardinality = '1:m')
 
 # print total number of scans
 print('print total number of scans to match', tbi_scans['report_num_temp'].nunique())
 print('print number of scans that matched', tbi_scans_id['report_num_temp'].nunique())
 
 # identify whether any missing images
-tbi_scans_review = pd.merge(tbi_scans, 
-                            batch_all, 
-                            on = 'accession_temp',
-                            how = 'outer',
-                            indicator = True)
-
 # create new data frame of images that we did not find a matching accession number for
-tbi_scans_missing = tbi_scans_review[tbi_scans_review['_merge']=='left_only'].drop_duplicates()
+tbi_scans_missing = unmatched(tbi_scans, batch_index, on = 'accession_temp')
 
 # print number of 'missing' scans
 print('print number of mising scans', tbi_scans_missing.nunique())
@@ -83,27 +85,29 @@ vna_suid_df['VNAAccession_temp'] = vna_suid_df['VNAAccession_temp'].str.replace(
 vna_suid_df['VNAAccession_temp'] = vna_suid_df['VNAAccession_temp'].apply(lambda x:remove_whitespace(x))
 
 # perform the merge with VNAAccession
-tbi_scans_vna = pd.merge(batch_all,
-                        vna_suid_df,
-                        left_on = 'accession_temp',
-                        right_on = 'VNAAccession_temp',
-                        how = 'right')
+tbi_scans_vna = join(vna_suid_df,
+                     batch_index,
+                     left_on = 'VNAAccession_temp',
+                     right_on = 'accession_temp',
+                     cardinality = '1:m',
+                     how = 'left')
 
 # check if any columns are missing
 print('checking if any columns have missing values', tbi_scans_vna.isnull().sum())
 
 # merge the list of 'found' scans (tbi_scans_vna) with the initial tbi_scans dataframe 
 # merge by `unique_study_id` and `report_num_temp`
-tbi_scans_id2 = pd.merge(tbi_scans,
-                         tbi_scans_vna[['unique_study_id', 'report_num_temp', 'VNAAccession_temp', 'folder', 'file_path', 'patient_id']], 
-                         on = ['unique_study_id', 'report_num_temp'],
-                         how = 'inner')
+tbi_scans_id2 = join(tbi_scans,
+                     lookup(tbi_scans_vna, ['unique_study_id', 'report_num_temp'], ['VNAAccession_temp', 'folder', 'file_path', 'patient_id']), 
+                     on = ['unique_study_id', 'report_num_temp'],
+                     cardinality = '1:m')
 
 # check if any columns are missing
 print('checking if any columns have missing values', tbi_scans_id2.isnull().sum())
 
 # merge all scans with associated file paths together
-tbi_scans_all = pd.concat([tbi_scans_id, tbi_scans_id2]).drop_duplicates()
+# the VNA matches are only for scans without an accession match, so the two sets of rows do not overlap
+tbi_scans_all = pd.concat([tbi_scans_id, tbi_scans_id2], ignore_index = True)
 
 # print total number of scans
 print('print total number of scans', tbi_scans_all['report_num_temp'].nunique())
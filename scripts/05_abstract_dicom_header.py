@@ -5,41 +5,38 @@
 import os
 
 import pandas as pd
-from glob import glob
-import time
 import pydicom
 import csv
 
+from nu_tbi.cohort_store import write_table
+from nu_tbi.dicom_inventory import INVENTORY_PATH, crawl
+from nu_tbi.instrument import span
+from nu_tbi.staging import format_stats, stage
+
 # import list of scans for TBI cohort
 tbi_scan_list = pd.read_csv('data/processed/tbi_scan_file_paths.csv')
 
 # list out all ct scans from the folders identified in tbi_scan_list
 file_paths = tbi_scan_list['file_path'].tolist()
 
-# abstract all CT scans from each directory indicated in file_path
-print('creating list of CT scans')
-start = time.time()
-
-# create empty list to store indiviudal CT scans
-image_list = []
+# inventory of the CT series in each directory indicated in file_path
+# (folders are listed concurrently with os.scandir; see scripts/nu_tbi/dicom_inventory.py)
+print('creating inventory of CT series')
 
-# for each directory in file_paths
-for i in file_paths:
-    # create a list of CT scans from the main folder we want to process
-    ct_list = [y for x in os.walk(i) for y in glob(os.path.join(x[0], 'CT.*'))]
-    image_list.append(ct_list)
+with span('05 list CT scans', items = len(set(file_paths))):
+    inventory = crawl(file_paths, threads = 32)
 
-end = time.time()
-print('list of CT scans completed in', (end - start)/60, 'minutes')
+print('number of CT series', (inventory['n_files'] > 0).sum(), 'with', inventory['n_files'].sum(), 'CT files')
+print('number of folders that could not be listed', inventory['error'].notnull().sum())
 
-# the previous for loop created a list of lists
-# to collapse we can perform the following nested list comprehension
-image_list_collapse = [i for sublist in image_list for i in sublist] 
+# save the inventory so later steps do not list the share again
+inventory.to_csv(INVENTORY_PATH, index = False)
+write_table(inventory, 'dicom_inventory')
 
-# separate file paths
-data = [s.split('/CT.') for s in image_list_collapse]
-data = [item[0] for item in data]
-data = list(set(data))
+# series folders and the first CT file (by name) of each
+series = inventory[inventory['error'].isnull()]
+data = series['series_dir'].tolist()
+first_file_names = dict(zip(series['series_dir'], series['first_file']))
 
 # **Abstract dicom header info**
 
@@ -49,34 +46,35 @@ data = list(set(data))
 print('abstracting dicom header. this process takes time.')
 
 # https://stackoverflow.com/questions/66640997/write-dicom-header-to-csv
-start = time.time()
 
 # initialize counter to create new index for each file processed - this will facilitate the pivot step
 counter = 0
 
-with open('data/processed/dicom_header_table.csv', 'w', newline='') as csvfile:
-    writer = csv.writer(csvfile)
-    # define column names
-    writer.writerow("file_path Group Elem Description VR value".split())
+with span('05 abstract dicom header') as timer:
+    with open('data/processed/dicom_header_table.csv', 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        # define column names
+        writer.writerow("file_path Group Elem Description VR value".split())
     
-    for i in data:
-        #counter = counter + 1
-        #print(counter)
-        file_dir = i
-        first_file = os.listdir(file_dir)[0]
-        ds = pydicom.dcmread(file_dir+'/'+first_file)
+        for i in data:
+            #counter = counter + 1
+            #print(counter)
+            file_dir = i
+            first_file = first_file_names[file_dir]
+            # read through the local staging cache so later passes over these files do not go to the share
+            ds = pydicom.dcmread(stage(file_dir+'/'+first_file))
+            timer.add(items = 1, bytes_read = os.path.getsize(file_dir+'/'+first_file))
         
-        for elem in ds:
-            if elem.description() != 'Pixel Data':
-                writer.writerow([
-                    # specify values for each column
-                    file_dir,
-                    f"{elem.tag.group:04X}", f"{elem.tag.element:04X}",
-                    elem.description(), elem.VR, str(elem.value)
-            ])
-
-end = time.time()
-print('dicom header abstracted in', (end - start)/60, 'minutes')
+            for elem in ds:
+                if elem.name != 'Pixel Data':
+                    writer.writerow([
+                        # specify values for each column
+                        file_dir,
+                        f"{elem.tag.group:04X}", f"{elem.tag.element:04X}",
+                        elem.name, elem.VR, str(elem.value)
+                ])
+
+print(format_stats())
 
 # read in dicom_header_table
 dicom_table =  pd.read_csv('data/processed/dicom_header_table.csv')
@@ -3,18 +3,17 @@
 # Objective: Identify axial brain scans and brain tissue windows
 
 import ast
-import time
+import os
 import pandas as pd
 
+from nu_tbi.instrument import span
+
 # load list of TBI scan file paths
 tbi_scan_list = pd.read_csv('data/processed/tbi_scan_file_paths.csv')
 
-start = time.time()
-
-dicom_table =  pd.read_csv('data/processed/dicom_header_table_processed.csv')
-
-end = time.time()
-print((end - start)/60)
+with span('06 load dicom header table', bytes_read = os.path.getsize('data/processed/dicom_header_table_processed.csv')) as timer:
+    dicom_table =  pd.read_csv('data/processed/dicom_header_table_processed.csv')
+    timer.add(items = len(dicom_table))
 
 # create a separate list of the main scan folder name
 data = [s.split('/images/') for s in dicom_table['file_path']]
@@ -34,16 +33,12 @@ print('printing number of unique accession numbers after filtering axial images'
 
 # create separate list of axial folder paths
 print('creating separate list of axial folders')
-start = time.time()
-
 axial_folder_list = []
 
-for line in dicom_table_axial['file_path']:
-    line2 = line.split('CT.')[0] 
-    axial_folder_list.append(line2)
-
-end = time.time()
-print((end - start)/60)
+with span('06 list axial folders', items = len(dicom_table_axial)):
+    for line in dicom_table_axial['file_path']:
+        line2 = line.split('CT.')[0] 
+        axial_folder_list.append(line2)
 
 # remove duplicates
 print('printing length of axial_folder_list', len(axial_folder_list))
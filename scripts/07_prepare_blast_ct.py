@@ -8,25 +8,25 @@ import os
 
 import re
 import pandas as pd
-import time
 from glob import glob
 import nibabel as nib
 
+from nu_tbi.fingerprints import DUPLICATES_PATH, FINGERPRINT_PATH, find_duplicates, fingerprint_files
+from nu_tbi.instrument import span
+from nu_tbi.paths import NU_TBI_DIR
+
 # **Create list of scans to process for blast-ct**
 # This function loops through all of the nifti processed images in the
 #  specified folder (`nifti_images/`) and appends the full file path. 
 print('creating a list of nifti_images/')
-start = time.time()
-
 ct_list = []
 
-for root, dirs, files in os.walk("nifti_images"):
-    for file in files:
-        if file.endswith(".nii"):
-             ct_list.append(os.path.join(root, file))
-
-end = time.time()
-print((end - start)/60)
+with span('07 list nifti images') as timer:
+    for root, dirs, files in os.walk("nifti_images"):
+        for file in files:
+            if file.endswith(".nii"):
+                 ct_list.append(os.path.join(root, file))
+        timer.add(items = len(files))
 
 # create dataframe
 print('converting ct_list to dataframe')
@@ -45,32 +45,41 @@ col = ct_df.pop('id')
 ct_df.insert(0, 'id', col)
 
 # identify images with a fourth dimension - these will be removed as they causes an error when running blast-ct
-# note: this takes a while to run.
-
+# the same pass fingerprints every image (scripts/nu_tbi/fingerprints.py) to find series that are copies of each other
+# images are read in parallel through the local staging cache; fingerprints of unchanged images are reused
+print('fingerprinting images and identifying images with a fourth dimension to remove')
+previous = pd.read_csv(FINGERPRINT_PATH) if os.path.exists(FINGERPRINT_PATH) else None
 
-print('identifying images with a fourth dimension to remove')
-# initiate empty list
-to_remove = [] 
+with span('07 fingerprint images', items = len(ct_df)) as timer:
+    fingerprints = fingerprint_files(ct_df, previous = previous, jobs = os.cpu_count())
+    timer.add(bytes_read = int(fingerprints['source_size'].fillna(0).sum()))
+fingerprints.to_csv(FINGERPRINT_PATH, index = False)
+print('images that could not be read', fingerprints['error'].notnull().sum())
 
-for i in ct_df['image']:
-    img = nib.load(i)
-    img_array = img.get_fdata()
-    img_shape = img_array.shape
-    if len(img_shape)==4:
-        to_remove.append(i)
-        print(i)
+to_remove = fingerprints.loc[fingerprints['shape'].str.count('x') == 3, 'image'].tolist()
+for i in to_remove:
+    print(i)
 
 # remove specified images
 print('printing initial number of file paths', len(ct_df))
 
 print('removing images')
-ct_df = ct_df[~ct_df['image'].str.contains('|'.join(to_remove))]
+ct_df = ct_df[~ct_df['image'].isin(to_remove)]
 
 print('printing number of images after removing problematic images', len(ct_df))
 
 # save list of files
 print('saving list of files')
-ct_df.to_csv('/share/nubar/Neurotrauma/hematoma_expansion/NU_TBI/data/processed/nifti_file_paths.csv', index = False)
+ct_df.to_csv(os.path.join(NU_TBI_DIR, 'data/processed/nifti_file_paths.csv'), index = False)
+
+# collapse near duplicate series before inference: only the first image of each cluster is segmented, and
+# 08_prepare_predictions.py copies its prediction to the others
+print('finding duplicate series')
+clusters = find_duplicates(fingerprints[fingerprints['id'].isin(ct_df['id'])].reset_index(drop = True))
+duplicates = clusters[clusters['id'] != clusters['representative_id']]
+duplicates[['id', 'image', 'representative_id', 'representative_image', 'cluster_size']].to_csv(DUPLICATES_PATH, index = False)
+print('number of duplicate images not sent to blast-ct', len(duplicates), 'in', duplicates['cluster'].nunique(), 'clusters')
+ct_df = ct_df[~ct_df['id'].isin(duplicates['id'])]
 
 ## save datasets in batches -thanks chatgpt :) 
 # Create a list to store DataFrames
@@ -12,11 +12,17 @@ import pandas as pd
 import numpy as np
 import nibabel as nib
 import csv
+from glob import glob
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+from nu_tbi.cohort_store import write_table
+from nu_tbi.fingerprints import DUPLICATES_PATH, expand_predictions
+from nu_tbi.joins import join, lookup
+from nu_tbi.paths import NU_TBI_DIR
+
 # set working directory
-os.chdir('/share/nubar/Neurotrauma/hematoma_expansion/NU_TBI')
+os.chdir(NU_TBI_DIR)
 
 # set options (this is neccessary for correct file imports/processing)
 pd.set_option('display.max_colwidth', None)
@@ -35,27 +41,22 @@ print('loading in data')
 tbi_scan_list = pd.read_csv('data/processed/tbi_scan_file_paths.csv')
 
 ## blast-ct predictions
-batch_1 = pd.read_csv('data/processed/blast_ct_predictions/batch_1/predictions/prediction.csv')
-batch_2 = pd.read_csv('data/processed/blast_ct_predictions/batch_2/predictions/prediction.csv')
-batch_3 = pd.read_csv('data/processed/blast_ct_predictions/batch_3/predictions/prediction.csv')
-batch_4 = pd.read_csv('data/processed/blast_ct_predictions/batch_4/predictions/prediction.csv')
-batch_5 = pd.read_csv('data/processed/blast_ct_predictions/batch_5/predictions/prediction.csv')
-batch_6 = pd.read_csv('data/processed/blast_ct_predictions/batch_6/predictions/prediction.csv')
-batch_7 = pd.read_csv('data/processed/blast_ct_predictions/batch_7/predictions/prediction.csv')
-batch_8 = pd.read_csv('data/processed/blast_ct_predictions/batch_8/predictions/prediction.csv')
-batch_9 = pd.read_csv('data/processed/blast_ct_predictions/batch_9/predictions/prediction.csv')
-batch_10 = pd.read_csv('data/processed/blast_ct_predictions/batch_10/predictions/prediction.csv')
-batch_11 = pd.read_csv('data/processed/blast_ct_predictions/batch_11/predictions/prediction.csv')
-batch_12 = pd.read_csv('data/processed/blast_ct_predictions/batch_12/predictions/prediction.csv')
-batch_13 = pd.read_csv('data/processed/blast_ct_predictions/batch_13/predictions/prediction.csv')
+# one prediction.csv per batch (data/processed/blast_ct_predictions/batch_<n>/predictions/), combined in batch order
+prediction_files = sorted(glob('data/processed/blast_ct_predictions/batch_*/predictions/prediction.csv'),
+                          key = lambda path: int(re.search(r'batch_(\d+)', path).group(1)))
+print('number of prediction batches', len(prediction_files))
 
 # combine prediction batches into one dataframe
 print('joining predictions')
-predictions = pd.concat([batch_1, batch_2, batch_3, batch_4, batch_5, batch_6, batch_7, batch_8, 
-                         batch_9, batch_10, batch_11, batch_12, batch_13])
+predictions = pd.concat([pd.read_csv(path) for path in prediction_files])
 
-# delete unneeded dataframes
-del batch_1, batch_2, batch_3, batch_4, batch_5, batch_6, batch_7, batch_8, batch_9, batch_10, batch_11, batch_12, batch_13
+# images collapsed into a near duplicate by 07_prepare_blast_ct.py were not segmented; they get a copy of the
+# prediction of the image they duplicate
+if os.path.exists(DUPLICATES_PATH):
+    duplicates = pd.read_csv(DUPLICATES_PATH, dtype = {'id': 'str', 'representative_id': 'str'})
+    n_segmented = len(predictions)
+    predictions = expand_predictions(predictions, duplicates)
+    print('predictions copied to duplicate images', len(predictions) - n_segmented)
 
 # abstract folder name from predictions
 # this will facilitate joining the unique_study_id to the predictions dataframe
@@ -69,26 +70,29 @@ predictions['prediction'] = predictions['prediction'].apply(lambda x:remove_whit
 
 # merge predictions and tbi_scan_list together to join unique_study_id and folder (scan identifier)
 print('merging predictions and tbi_scan_list to join `unique_study_id`')
-predictions_ids = pd.merge(predictions, 
-                           tbi_scan_list[['unique_study_id', 'folder']].drop_duplicates(),
-                           on = ['folder'],
-                           how = 'inner')
+# each folder belongs to one patient
+predictions_ids = join(predictions, 
+                       lookup(tbi_scan_list, 'folder', ['unique_study_id']),
+                       on = ['folder'],
+                       cardinality = 'm:1')
 print(len(predictions_ids))
 
 ### add additional scan information
 tbi_scans = pd.read_csv('data/processed/20240325_1136_tbi_patients_scans_to_include_all.csv')
 
 ### add back report_num_temp
-tbi_scans_all_preds = pd.merge(predictions_ids, 
-                                tbi_scan_list[['unique_study_id', 'report_num_temp', 'folder']].drop_duplicates(),
-                                on = ['unique_study_id', 'folder'],
-                                how = 'inner')
+# a folder can have more than one report number (the same scan under two reports); these rows are kept here and
+# 09_filter_predictions.py selects one image per folder
+tbi_scans_all_preds = join(predictions_ids, 
+                           lookup(tbi_scan_list, ['unique_study_id', 'folder'], ['report_num_temp']),
+                           on = ['unique_study_id', 'folder'],
+                           cardinality = 'm:m')
 
 ## add back additional scan data
-tbi_scans_all_preds = pd.merge(tbi_scans_all_preds, 
-                                tbi_scans,
-                                on = ['unique_study_id', 'report_num_temp'],
-                                how = 'inner')
+tbi_scans_all_preds = join(tbi_scans_all_preds, 
+                           lookup(tbi_scans, ['unique_study_id', 'report_num_temp'], tbi_scans.columns),
+                           on = ['unique_study_id', 'report_num_temp'],
+                           cardinality = 'm:1')
 
 # convert StudyDate_Time_format
 tbi_scans_all_preds['StudyDate_Time_format'] = pd.to_datetime(tbi_scans_all_preds['StudyDate_Time_format'])
@@ -113,19 +117,24 @@ def slice_number(dataframe, i):
                     'prediction': scan['prediction']})
     return(df)
 
-# create empty dataframe to collect slice_num 
-slice_df = pd.DataFrame({'unique_study_id': [], 'slice_num': [], 'image': []})
+# collect slice_num for each image
+slice_dfs = []
 
 for i in range(0, len(tbi_scans_all_preds)):
     df = slice_number(tbi_scans_all_preds, i)
-    slice_df = slice_df.append(df)
+    slice_dfs.append(df)
+
+slice_df = pd.concat(slice_dfs)
 
 print('check that length of tbi_scans_all_preds is equal to slice_df', len(tbi_scans_all_preds) == len(slice_df))
 
-# merge slice_num with the rest of the scan information
-tbi_scans_all_preds = pd.merge(tbi_scans_all_preds,
-                               slice_df,
-                               how = 'inner')
+# add slice_num to the rest of the scan information
+# slice_df has one row per row of tbi_scans_all_preds, in the same order (merging on image would multiply the rows of
+# images listed more than once)
+tbi_scans_all_preds['slice_num'] = slice_df['slice_num'].to_numpy()
 
 # save prepared_predictions for further processing
-tbi_scans_all_preds.to_csv('data/processed/prepped_predictions.csv', index = False)
\ No newline at end of file
+tbi_scans_all_preds.to_csv('data/processed/prepped_predictions.csv', index = False)
+
+# save typed columnar copy read by scripts/09_filter_predictions.py
+write_table(tbi_scans_all_preds, 'prepped_predictions')
\ No newline at end of file
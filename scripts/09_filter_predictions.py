@@ -14,8 +14,16 @@ import nibabel as nib
 import csv
 import openpyxl
 
+from nu_tbi.selection import select_best, prefer_ids, prefer_pattern, superseded_by, TILT_PATTERNS
+from nu_tbi.trajectory import compute_trajectories, COMPARTMENTS
+from nu_tbi.regional import split_regional
+from nu_tbi.cohort_store import read_table, write_table
+from nu_tbi.joins import check_unique
+from nu_tbi.paths import NU_TBI_DIR
+from nu_tbi.workbooks import read_sheet
+
 # set working directory
-os.chdir('/share/nubar/Neurotrauma/hematoma_expansion/NU_TBI')
+os.chdir(NU_TBI_DIR)
 
 # set options (this is neccessary for correct file imports/processing)
 pd.set_option('display.max_colwidth', None)
@@ -23,8 +31,15 @@ pd.set_option('display.max_columns', None)
 pd.set_option('display.max_rows', 200)
 
 ## load data
-predictions = pd.read_csv('data/processed/prepped_predictions.csv')
-predictions = predictions.drop_duplicates()
+# typed columnar copy of data/processed/prepped_predictions.csv written by scripts/08_prepare_predictions.py
+predictions = read_table('prepped_predictions')
+# 08 joins with checked cardinalities, so there is one row per image and report number (no duplicate rows to drop)
+check_unique(predictions, ['id', 'report_num_temp'], 'prepped_predictions')
+
+# split off the ~120 regional volumes (prediction_{compartment}_{region}_ml) into a long table of non-zero volumes
+# so they are not carried through every filter and merge below; they can be joined back on `id`
+print('splitting regional volumes into long format')
+predictions, regional_volumes = split_regional(predictions, id_col = 'id')
 
 # manually remove problematic scan
 print('manually removing problematic scan')
@@ -84,154 +99,42 @@ predictions_filtered[['unique_study_id', 'id', 'image']].nunique()
 
 print('print unique number of patients and images', predictions[['unique_study_id', 'id', 'image']].nunique())
 
-# separate by tilt/eq separated to facilitate further pre-processing and evaluation of scans to include
-print('separating by tilt/eq corrected vs non-tilt corrected')
-tilt_predictions = predictions_filtered[predictions_filtered['image'].str.contains('|'.join(['tilt', '_Eq']), case = False)].drop_duplicates()
-non_tilt_predictions = predictions_filtered[~(predictions_filtered['image'].str.contains('|'.join(['tilt', '_Eq']), case = False))].drop_duplicates()
-
-### Evaluate cases when there are multiple images per unique_study_id, image_name, and scan_number
-# count number of unique scans per unique_study_id and image
-tilt_scan_counts = tilt_predictions.groupby(['unique_study_id', 'image_name', 'scan_number'])['image_name'].count().reset_index(name = 'count').sort_values('count', ascending = False)
-non_tilt_scan_counts = non_tilt_predictions.groupby(['unique_study_id', 'image_name', 'scan_number'])['image_name'].count().reset_index(name = 'count').sort_values('count', ascending = False)
-
-### create new dataframe with images that have multiple scans during the same imaging session
-
-## tilt scans
-multiple_scans = tilt_scan_counts[tilt_scan_counts['count'] > 1]
-one_scan = tilt_scan_counts[tilt_scan_counts['count'] == 1]
-
-tilt_predictions_multiple = pd.merge(tilt_predictions, multiple_scans,
-                                     how = 'inner')
-tilt_predictions_one = pd.merge(tilt_predictions, one_scan,
-                                     how = 'inner')
-
-## non-tilt scans
-multiple_scans_non_tilt = non_tilt_scan_counts[non_tilt_scan_counts['count'] > 1]
-one_scan_non_tilt = non_tilt_scan_counts[non_tilt_scan_counts['count'] == 1]
-
-non_tilt_predictions_multiple = pd.merge(non_tilt_predictions, multiple_scans_non_tilt,
-                                     how = 'inner')
-non_tilt_predictions_one = pd.merge(non_tilt_predictions, one_scan_non_tilt,
-                                     how = 'inner')
-
-# if multiple scans, we select the one with the lowest (best) quality_control_metric
-tilt_predictions_multiple_filtered = tilt_predictions_multiple.loc[tilt_predictions_multiple.groupby(['unique_study_id', 'image_name', 'scan_number'])['quality_control_metric'].idxmin()]
-non_tilt_predictions_multiple_filtered = non_tilt_predictions_multiple.loc[non_tilt_predictions_multiple.groupby(['unique_study_id', 'image_name', 'scan_number'])['quality_control_metric'].idxmin()]
-
-## merge back with the single scans
-tilt_predictions_filtered = pd.concat([tilt_predictions_one, tilt_predictions_multiple_filtered])
-non_tilt_predictions_filtered = pd.concat([non_tilt_predictions_one, non_tilt_predictions_multiple_filtered])
-
-# if there is a tilted version, we will remove from the `non_tilt_predictions_filtered`
-non_tilt_predictions_to_filter = pd.merge(non_tilt_predictions_filtered[['unique_study_id', 'report_num_temp', 'scan_number', 'folder', 'image_name']],
-                                          tilt_predictions_filtered[['unique_study_id', 'report_num_temp', 'scan_number', 'folder', 'image_name']],
-                                          how = 'outer',
-                                          indicator = True)
-
-# if a unique_study_id and report_num only appear in the left df (non_tilt_predictions), then we will keep those - these do not have a corrected counter part
-non_tilt_predictions_filtered_keep = non_tilt_predictions_to_filter[(non_tilt_predictions_to_filter['_merge'] == "left_only")]
-print('printing length of non_tilt_predictions_filtered', len(non_tilt_predictions_filtered_keep))
-
-del non_tilt_predictions_filtered_keep['_merge']
-
-# merge in order to retrieve full data frame
-non_tilt_predictions_filtered2 = pd.merge(non_tilt_predictions_filtered_keep,
-                                         non_tilt_predictions_filtered,
-                                         how = 'inner')
-
-print('printing length of the filtered non_tilt_predictions_filtered2', len(non_tilt_predictions_filtered2))
-
-print('combing tilt/eq and non-tilt/eq predictions back together')
-tbi_predictions = pd.concat([tilt_predictions_filtered, non_tilt_predictions_filtered2])
-
-print('printing unique number of patients and images', tbi_predictions[['unique_study_id', 'id', 'image']].nunique())
-
-# further evaluate folders with multiple images
-## evaluate if images within each folder are now unique
-counts = tbi_predictions.groupby(['unique_study_id', 'report_num_temp', 'folder', 'image_name', 'scan_number'])['image_name'].count().reset_index(name = 'count').sort_values('count', ascending = False)
-print('eval if images are unique', counts['count'].max()==1)
-
-# evaluate whether there is one scan per folder
-counts = tbi_predictions.groupby(['unique_study_id', 'folder', 'scan_number'])['folder'].count().reset_index(name = 'count').sort_values('count', ascending = False)
-
-# identify folders with > 1 scan
-counts_2 = counts[counts['count']>=2]
-
-# prepare a dataframe contianing the image information for folders with more than one scan
-# we will further evaluate these cases
-to_eval = pd.merge(tbi_predictions, 
-                   counts_2, 
-                   on = ['unique_study_id', 'folder', 'scan_number'],
-                   how = 'inner')
-
-# keep columns of interest
-to_eval = to_eval[['unique_study_id', 'report_num_temp', 'scan_number', 'folder', 'image_name', 'id', 'slice_num', 'max_slice', 'image', 'iph_predicted_volume_ml', 'eah_predicted_volume_ml', 'quality_control_metric']]
-
 #### For subset of patients we reviewed, we will manually choose which image to select. Otherwise, we will select image with min(quality_control_metric)
-
-reviewed_scans = pd.read_excel('/share/nubar/Neurotrauma/hematoma_expansion/NU_TBI/data/processed/manual_review/02_initial_tbi_patient_list_inclusion.xlsx',
-                               sheet_name = 'multiple_image_filter',
-                               engine='openpyxl')
-
-# create a dataframe containing the scan info of the patients we've manually reviewed
-reviewed_ids = pd.merge(to_eval, 
-                        reviewed_scans[['unique_study_id', 'id_to_keep']],
-                        left_on = ['unique_study_id', 'id'],
-                        right_on = ['unique_study_id', 'id_to_keep'],
-                        how = 'inner')
-
-# create a list of report numbers
-reviewed_ids_list = reviewed_ids['report_num_temp']
-
-# remove report numbers that we identified from the `to_eval` dataframe
-to_eval_filtered = to_eval[~to_eval['report_num_temp'].isin(reviewed_ids_list)]
-
-# for the rest of the images, we will select the report with min(quality_control_metric)
-to_eval_filtered = to_eval_filtered.loc[to_eval_filtered.groupby(['unique_study_id', 'report_num_temp'])['quality_control_metric'].idxmin()]
-
-# remove unneeded column
-del reviewed_ids['id_to_keep']
-
-# combine the updated `to_eval_filtered`` and `reviewed_ids` dataframe
-# there should only be one scan per folder now 
-to_eval_filtered_combined = pd.concat([to_eval_filtered, reviewed_ids])
-
-print('evaluating whether there is 1 report_num_temp per folder')
-counts_check = to_eval_filtered_combined.groupby(['unique_study_id', 'folder'])['report_num_temp'].count().reset_index(name = 'count').sort_values('count', ascending = False)
-
-print('length of counts_check should be 0:', len(counts_check[counts_check['count']>1])==0)
-
-# combine with the rest of the predictions
-print('combining updated predictions together')
-tbi_predictions_outer = pd.merge(tbi_predictions, 
-                                to_eval_filtered_combined[['unique_study_id', 'report_num_temp', 'folder']], 
-                                how = 'outer', 
-                                indicator = True)
-
-# create a separate dataframe with the images we have not-updated (the ones that only had one image per folder)
-print('creating tbi_prediction_outer')
-tbi_predictions_outer = tbi_predictions_outer[tbi_predictions_outer['_merge']=="left_only"]
-print('printing unique numbre of patients and scans', tbi_predictions_outer[['unique_study_id', 'id', 'report_num_temp', 'folder']].nunique())
-
-# create a new dataframe with the predictions we just pre-processed (those that had multiple images per folder)
-print('creating tbi_predictions_right')
-tbi_predictions_right = pd.merge(tbi_predictions, 
-                                to_eval_filtered_combined[['unique_study_id', 'report_num_temp', 'folder', 'id']], 
-                                how = 'right', 
-                                indicator = True)
-print('printing unique numbre of patients and scans', tbi_predictions_right[['unique_study_id', 'id', 'report_num_temp', 'folder']].nunique())
-
-# combine predictions
-print('combing predictions')
-tbi_predictions_clean = pd.concat([tbi_predictions_outer, tbi_predictions_right])
-del tbi_predictions_clean['_merge']
-
-print('printing unique patient and report numbers', tbi_predictions_clean[['unique_study_id', 'id', 'report_num_temp', 'folder']].nunique())
-
-### one patient appears to have two separate report numbres for the same scan. They look essentially the same so we will just take the first 
-print('removing duplicate folder')
-tbi_predictions_clean = tbi_predictions_clean.sort_values(['unique_study_id', 'scan_number'], ascending = True)
-tbi_predictions_clean = tbi_predictions_clean.groupby(['unique_study_id', 'folder']).first().reset_index(drop=False)
+reviewed_scans = read_sheet('data/processed/manual_review/02_initial_tbi_patient_list_inclusion.xlsx', 'multiple_image_filter')
+
+# rank images so that we can select one image per folder with a single sort
+# 1. tilt/eq corrected images are preferred over their non-corrected counterpart (same unique_study_id, image_name, and scan_number);
+#    as before, a non-tilt image with a tilt/eq corrected counterpart is removed even if manual review names it
+# 2. images we manually reviewed (`id_to_keep`) are kept
+# 3. otherwise, we select the image with the lowest (best) quality_control_metric
+# 4. ties are broken by preferring tilt/eq corrected images and then the image with more slices
+print('ranking images by manual review, tilt/eq correction, and quality_control_metric')
+predictions_filtered = predictions_filtered.drop_duplicates()
+
+predictions_filtered['reviewed_rank'] = prefer_ids(predictions_filtered['id'], reviewed_scans['id_to_keep'])
+predictions_filtered['tilt_rank'] = prefer_pattern(predictions_filtered['image'], TILT_PATTERNS)
+predictions_filtered['superseded_rank'] = superseded_by(predictions_filtered, 
+                                                        ['unique_study_id', 'image_name', 'scan_number'], 
+                                                        predictions_filtered['tilt_rank'] == 0)
+
+print('number of non-tilt images with a tilt/eq corrected counterpart', predictions_filtered['superseded_rank'].sum())
+
+### one patient appears to have two separate report numbres for the same scan. They look essentially the same so we will just take the first (lowest scan_number)
+print('selecting one image per folder')
+tbi_predictions_clean = select_best(predictions_filtered, 
+                                    group_cols = ['unique_study_id', 'folder'],
+                                    rank_by = [('scan_number', True), 
+                                               ('superseded_rank', True), 
+                                               ('reviewed_rank', True), 
+                                               ('quality_control_metric', True),
+                                               ('tilt_rank', True),
+                                               ('slice_num', False)])
+
+tbi_predictions_clean = tbi_predictions_clean.drop(columns = ['reviewed_rank', 'tilt_rank', 'superseded_rank'])
+
+print('evaluating whether there is 1 image per folder')
+counts_check = tbi_predictions_clean.groupby(['unique_study_id', 'folder'])['id'].count()
+print('eval if images are unique per folder', counts_check.max() == 1)
 
 print('printing updated patient and report numbers', tbi_predictions_clean[['unique_study_id', 'id', 'report_num_temp', 'folder']].nunique())
 
@@ -257,9 +160,6 @@ print('calculate changes in volume of hemorrhage')
 # format `StudyDate_Time_format`
 tbi_predictions_clean['StudyDate_Time_format'] = pd.to_datetime(tbi_predictions_clean['StudyDate_Time_format'])
 
-# sort by `unique_study_id` and `StudyDate_Time_format`
-tbi_predictions_clean = tbi_predictions_clean.sort_values(['unique_study_id', 'StudyDate_Time_format'])
-
 # every patient should have at least 2 scans 
 print('evaluate whether each patient has 2 scans')
 print(tbi_predictions_clean.groupby(['unique_study_id'])['scan_number'].count().min() == 2)
@@ -268,20 +168,16 @@ print(tbi_predictions_clean.groupby(['unique_study_id'])['scan_number'].count().
 print('calculate total volume of hemorrhage for each scan')
 tbi_predictions_clean['total_volume_scan'] = tbi_predictions_clean[['iph_predicted_volume_ml', 'eah_predicted_volume_ml', 'ivh_predicted_volume_ml']].sum(axis=1)
 
-# create new column for total first scan
-# subtract this from each subsequent row. This will allow us to more easily identify changes in volume that may not have occured right away
-tbi_predictions_clean['total_volume_first_scan'] = tbi_predictions_clean.groupby(['unique_study_id'])['total_volume_scan'].transform('first')
-tbi_predictions_clean['change_total_volume_scan'] = tbi_predictions_clean['total_volume_scan'] - tbi_predictions_clean['total_volume_first_scan']       
-
-# calculate change by compartment
+# calculate change from the first scan for the total volume and for each compartment
+# this sorts by `unique_study_id` and `StudyDate_Time_format` and subtracts the first scan from each subsequent row.
+# This will allow us to more easily identify changes in volume that may not have occured right away
 print('calculating change in volume by compartment')
-tbi_predictions_clean['iph_volume_first'] = tbi_predictions_clean.groupby(['unique_study_id'])['iph_predicted_volume_ml'].transform('first')
-tbi_predictions_clean['eah_volume_first'] = tbi_predictions_clean.groupby(['unique_study_id'])['eah_predicted_volume_ml'].transform('first')
-tbi_predictions_clean['ivh_volume_first'] = tbi_predictions_clean.groupby(['unique_study_id'])['ivh_predicted_volume_ml'].transform('first')
+tbi_predictions_clean = compute_trajectories(tbi_predictions_clean,
+                                             compartments = dict(COMPARTMENTS, total = 'total_volume_scan'),
+                                             order_by = ['StudyDate_Time_format'])
 
-tbi_predictions_clean['change_iph_volume_first_scan'] = tbi_predictions_clean['iph_predicted_volume_ml'] - tbi_predictions_clean['iph_volume_first']         
-tbi_predictions_clean['change_eah_volume_first_scan'] = tbi_predictions_clean['eah_predicted_volume_ml'] - tbi_predictions_clean['eah_volume_first']         
-tbi_predictions_clean['change_ivh_volume_first_scan'] = tbi_predictions_clean['ivh_predicted_volume_ml'] - tbi_predictions_clean['ivh_volume_first']         
+tbi_predictions_clean['total_volume_first_scan'] = tbi_predictions_clean['total_volume_first']
+tbi_predictions_clean['change_total_volume_scan'] = tbi_predictions_clean['change_total_volume_first_scan']
 
 # reorder columns
 print('reordering columns')
@@ -309,130 +205,6 @@ tbi_predictions_clean_final = tbi_predictions_clean[[
  'change_iph_volume_first_scan',
  'change_eah_volume_first_scan',
  'change_ivh_volume_first_scan',
- 'prediction_iph_BrainStem_ml',
- 'prediction_iph_Cerebellum_ml',
- 'prediction_iph_LeftBasalForebrain_ml',
- 'prediction_iph_LeftBasalGanglia_ml',
- 'prediction_iph_LeftBasalganglia-lentiform-nucleus_ml',
- 'prediction_iph_LeftCaudate_ml',
- 'prediction_iph_LeftCerebellum_ml',
- 'prediction_iph_LeftFrontalLobe-inferior-orbital_ml',
- 'prediction_iph_LeftFrontalLobe-lateral_ml',
- 'prediction_iph_LeftFrontalLobe-medial_ml',
- 'prediction_iph_LeftHippocampus_ml',
- 'prediction_iph_LeftInsula_ml',
- 'prediction_iph_LeftOccipitalLobe_ml',
- 'prediction_iph_LeftParietalLobe_ml',
- 'prediction_iph_LeftTemporalLobe_ml',
- 'prediction_iph_LeftThalamusProper_ml',
- 'prediction_iph_RightBasalForebrain_ml',
- 'prediction_iph_RightBasalGanglia_ml',
- 'prediction_iph_RightBasalGanglia-lentiform-nucleus_ml',
- 'prediction_iph_RightCaudate_ml',
- 'prediction_iph_RightCerebellum_ml',
- 'prediction_iph_RightFrontalLobe-inferior-orbital_ml',
- 'prediction_iph_RightFrontalLobe-lateral_ml',
- 'prediction_iph_RightFrontalLobe-medial_ml',
- 'prediction_iph_RightHippocampus_ml',
- 'prediction_iph_RightInsula_ml',
- 'prediction_iph_RightOccipitalLobe_ml',
- 'prediction_iph_RightParietalLobe_ml',
- 'prediction_iph_RightTemporalLobe_ml',
- 'prediction_iph_RightThalamusProper_ml',
- 'prediction_iph_Ventricle_ml',
- 'prediction_eah_BrainStem_ml',
- 'prediction_eah_Cerebellum_ml',
- 'prediction_eah_LeftBasalForebrain_ml',
- 'prediction_eah_LeftBasalGanglia_ml',
- 'prediction_eah_LeftBasalganglia-lentiform-nucleus_ml',
- 'prediction_eah_LeftCaudate_ml',
- 'prediction_eah_LeftCerebellum_ml',
- 'prediction_eah_LeftFrontalLobe-inferior-orbital_ml',
- 'prediction_eah_LeftFrontalLobe-lateral_ml',
- 'prediction_eah_LeftFrontalLobe-medial_ml',
- 'prediction_eah_LeftHippocampus_ml',
- 'prediction_eah_LeftInsula_ml',
- 'prediction_eah_LeftOccipitalLobe_ml',
- 'prediction_eah_LeftParietalLobe_ml',
- 'prediction_eah_LeftTemporalLobe_ml',
- 'prediction_eah_LeftThalamusProper_ml',
- 'prediction_eah_RightBasalForebrain_ml',
- 'prediction_eah_RightBasalGanglia_ml',
- 'prediction_eah_RightBasalGanglia-lentiform-nucleus_ml',
- 'prediction_eah_RightCaudate_ml',
- 'prediction_eah_RightCerebellum_ml',
- 'prediction_eah_RightFrontalLobe-inferior-orbital_ml',
- 'prediction_eah_RightFrontalLobe-lateral_ml',
- 'prediction_eah_RightFrontalLobe-medial_ml',
- 'prediction_eah_RightHippocampus_ml',
- 'prediction_eah_RightInsula_ml',
- 'prediction_eah_RightOccipitalLobe_ml',
- 'prediction_eah_RightParietalLobe_ml',
- 'prediction_eah_RightTemporalLobe_ml',
- 'prediction_eah_RightThalamusProper_ml',
- 'prediction_eah_Ventricle_ml',
- 'prediction_oedema_BrainStem_ml',
- 'prediction_oedema_Cerebellum_ml',
- 'prediction_oedema_LeftBasalForebrain_ml',
- 'prediction_oedema_LeftBasalGanglia_ml',
- 'prediction_oedema_LeftBasalganglia-lentiform-nucleus_ml',
- 'prediction_oedema_LeftCaudate_ml',
- 'prediction_oedema_LeftCerebellum_ml',
- 'prediction_oedema_LeftFrontalLobe-inferior-orbital_ml',
- 'prediction_oedema_LeftFrontalLobe-lateral_ml',
- 'prediction_oedema_LeftFrontalLobe-medial_ml',
- 'prediction_oedema_LeftHippocampus_ml',
- 'prediction_oedema_LeftInsula_ml',
- 'prediction_oedema_LeftOccipitalLobe_ml',
- 'prediction_oedema_LeftParietalLobe_ml',
- 'prediction_oedema_LeftTemporalLobe_ml',
- 'prediction_oedema_LeftThalamusProper_ml',
- 'prediction_oedema_RightBasalForebrain_ml',
- 'prediction_oedema_RightBasalGanglia_ml',
- 'prediction_oedema_RightBasalGanglia-lentiform-nucleus_ml',
- 'prediction_oedema_RightCaudate_ml',
- 'prediction_oedema_RightCerebellum_ml',
- 'prediction_oedema_RightFrontalLobe-inferior-orbital_ml',
- 'prediction_oedema_RightFrontalLobe-lateral_ml',
- 'prediction_oedema_RightFrontalLobe-medial_ml',
- 'prediction_oedema_RightHippocampus_ml',
- 'prediction_oedema_RightInsula_ml',
- 'prediction_oedema_RightOccipitalLobe_ml',
- 'prediction_oedema_RightParietalLobe_ml',
- 'prediction_oedema_RightTemporalLobe_ml',
- 'prediction_oedema_RightThalamusProper_ml',
- 'prediction_oedema_Ventricle_ml',
- 'prediction_ivh_BrainStem_ml',
- 'prediction_ivh_Cerebellum_ml',
- 'prediction_ivh_LeftBasalForebrain_ml',
- 'prediction_ivh_LeftBasalGanglia_ml',
- 'prediction_ivh_LeftBasalganglia-lentiform-nucleus_ml',
- 'prediction_ivh_LeftCaudate_ml',
- 'prediction_ivh_LeftCerebellum_ml',
- 'prediction_ivh_LeftFrontalLobe-inferior-orbital_ml',
- 'prediction_ivh_LeftFrontalLobe-lateral_ml',
- 'prediction_ivh_LeftFrontalLobe-medial_ml',
- 'prediction_ivh_LeftHippocampus_ml',
- 'prediction_ivh_LeftInsula_ml',
- 'prediction_ivh_LeftOccipitalLobe_ml',
- 'prediction_ivh_LeftParietalLobe_ml',
- 'prediction_ivh_LeftTemporalLobe_ml',
- 'prediction_ivh_LeftThalamusProper_ml',
- 'prediction_ivh_RightBasalForebrain_ml',
- 'prediction_ivh_RightBasalGanglia_ml',
- 'prediction_ivh_RightBasalGanglia-lentiform-nucleus_ml',
- 'prediction_ivh_RightCaudate_ml',
- 'prediction_ivh_RightCerebellum_ml',
- 'prediction_ivh_RightFrontalLobe-inferior-orbital_ml',
- 'prediction_ivh_RightFrontalLobe-lateral_ml',
- 'prediction_ivh_RightFrontalLobe-medial_ml',
- 'prediction_ivh_RightHippocampus_ml',
- 'prediction_ivh_RightInsula_ml',
- 'prediction_ivh_RightOccipitalLobe_ml',
- 'prediction_ivh_RightParietalLobe_ml',
- 'prediction_ivh_RightTemporalLobe_ml',
- 'prediction_ivh_RightThalamusProper_ml',
- 'prediction_ivh_Ventricle_ml',
  'Brain_volume_ml',
  'BrainStem_volume_ml',
  'Cerebellum_volume_ml',
@@ -475,4 +247,10 @@ print('printing final prediction numbers', tbi_predictions_clean_final[['unique_
 
 ### Save predictions
 print('saving cleaned up predictions')
-tbi_predictions_clean_final.to_csv('data/processed/tbi_cohort/0_initial_tbi_scans_volumes_v3.csv', index = False)
\ No newline at end of file
+tbi_predictions_clean_final.to_csv('data/processed/tbi_cohort/0_initial_tbi_scans_volumes_v3.csv', index = False)
+write_table(tbi_predictions_clean_final, 'initial_tbi_scans_volumes')
+
+# save regional volumes (long format) for the final scans
+regional_volumes = regional_volumes[regional_volumes['id'].isin(tbi_predictions_clean_final['id'])]
+regional_volumes.to_csv('data/processed/tbi_cohort/0_initial_tbi_scans_regional_volumes_v3.csv', index = False)
+write_table(regional_volumes, 'initial_tbi_scans_regional_volumes')
\ No newline at end of file
@@ -20,6 +20,10 @@ import seaborn as sns
 from matplotlib.colors import ListedColormap
 import matplotlib.patches as mpatches
 
+from nu_tbi.cohort_store import read_table
+from nu_tbi.paths import NU_TBI_DIR
+from nu_tbi.workbooks import read_sheet
+
 # Define your custom colormap with black as the first color
 colors = [(0, 0, 0), (1, 0, 0), (0, 1, 0), (1, 1, 0), (0, 0, 1)]  # Black, Red, Green, Yellow, Blue
 custom_cmap = ListedColormap(colors)
@@ -51,11 +55,11 @@ def window_function(nii_img, nii_array, window_center, window_width):
 
     return(hu_image)
 
-os.chdir('/share/nubar/Neurotrauma/hematoma_expansion/NU_TBI')
+os.chdir(NU_TBI_DIR)
 
 ## Load data
 # load in csv file of our cohort with blast-ct predicted volumes
-tbi_initial_cohort = pd.read_csv('data/processed/tbi_cohort/0_initial_tbi_scans_volumes_v3.csv')
+tbi_initial_cohort = read_table('initial_tbi_scans_volumes')
 
 print('Nunber of unique patients and reports:', tbi_initial_cohort[['unique_study_id', 'report_num_temp']].nunique())
 
@@ -63,14 +67,10 @@ print('Nunber of unique patients and reports:', tbi_initial_cohort[['unique_stud
 suid_rad_reports = pd.read_csv('data/processed/suid_rad_reports.csv')
 
 # load in the xlsx file and sheet used for manual review of patients
-reviewed_scans = pd.read_excel('data/processed/manual_review/02_initial_tbi_patient_list_inclusion.xlsx',
-                               sheet_name = '02_initial_tbi_patient_list_inc',
-                               engine='openpyxl')
+reviewed_scans = read_sheet('data/processed/manual_review/02_initial_tbi_patient_list_inclusion.xlsx', '02_initial_tbi_patient_list_inc')
 
 # load in the xlsx file and sheet used for manual review of patients we want to exclude
-scans_to_exclude = pd.read_excel('data/processed/manual_review/02_initial_tbi_patient_list_inclusion.xlsx',
-                               sheet_name = 'scans_to_exclude',
-                               engine='openpyxl')
+scans_to_exclude = read_sheet('data/processed/manual_review/02_initial_tbi_patient_list_inclusion.xlsx', 'scans_to_exclude')
 
 # merge initial cohort with the reviewed scans
 tbi_initial_cohort = pd.merge(tbi_initial_cohort,
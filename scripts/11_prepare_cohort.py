@@ -13,11 +13,22 @@ import openpyxl
 import matplotlib.pyplot as plt
 import seaborn as sns
 
-os.chdir('/share/nubar/Neurotrauma/hematoma_expansion/NU_TBI')
+from nu_tbi.trajectory import compute_trajectories
+from nu_tbi.thresholds import expansion_outcome, prepare_sweep, sweep_outcomes
+from nu_tbi.cohort_store import read_table, write_table
+from nu_tbi.paths import NU_TBI_DIR
+from nu_tbi.workbooks import read_sheet
+
+os.chdir(NU_TBI_DIR)
 
 ## Load data
 # load in csv file of our cohort with blast-ct predicted volumes
-tbi_initial_cohort = pd.read_csv('/share/nubar/Neurotrauma/hematoma_expansion/NU_TBI/data/processed/tbi_cohort/0_initial_tbi_scans_volumes_v3.csv')
+# only the columns used below are read (change from first scan is recalculated after excluding scans)
+tbi_initial_cohort = read_table('initial_tbi_scans_volumes',
+                                columns = ['unique_study_id', 'report_num_temp', 'id', 'scan_number', 'StudyDate_Time_format', 
+                                           'quality_control_metric', 'iph_predicted_volume_ml', 'eah_predicted_volume_ml', 
+                                           'ivh_predicted_volume_ml', 'oedema_predicted_volume_ml', 'change_iph_volume_first_scan', 
+                                           'change_eah_volume_first_scan', 'change_ivh_volume_first_scan'])
 
 print('Unique number of included tbi patients', tbi_initial_cohort[['unique_study_id', 'report_num_temp']].nunique())
 
@@ -25,14 +36,10 @@ print('Unique number of included tbi patients', tbi_initial_cohort[['unique_stud
 suid_rad_reports = pd.read_csv('data/processed/suid_rad_reports.csv')
 
 # load in the xlsx file and sheet used for manual review of patients
-reviewed_scans = pd.read_excel('data/processed/manual_review/02_initial_tbi_patient_list_inclusion.xlsx',
-                               sheet_name = '02_initial_tbi_patient_list_inc',
-                               engine='openpyxl')
+reviewed_scans = read_sheet('data/processed/manual_review/02_initial_tbi_patient_list_inclusion.xlsx', '02_initial_tbi_patient_list_inc')
 
 # load in the xlsx file and sheet used for manual review of patients we want to exclude
-scans_to_exclude = pd.read_excel('data/processed/manual_review/02_initial_tbi_patient_list_inclusion.xlsx',
-                               sheet_name = 'scans_to_exclude',
-                               engine='openpyxl')
+scans_to_exclude = read_sheet('data/processed/manual_review/02_initial_tbi_patient_list_inclusion.xlsx', 'scans_to_exclude')
 
 ### Prepare Cohort for Review
 ### add reports from scans
@@ -42,7 +49,7 @@ tbi_initial_cohort = pd.merge(tbi_initial_cohort,
                               how = 'left')
 
 tbi_initial_cohort_include = pd.merge(tbi_initial_cohort,
-                              suid_rad_reports[['unique_study_id', 'report_num_temp', 'report']])
+                              suid_rad_reports[['unique_study_id', 'report_num_temp', 'report', 'portable', '8-slice']])
 
 
 print('Number of patients and scans:', tbi_initial_cohort_include[['unique_study_id', 'report_num_temp']].nunique())
@@ -53,14 +60,11 @@ print('Number of patients and scans:', tbi_initial_cohort_include[['unique_study
 ### Keep scans within first 72 hours of the first scan
 tbi_initial_cohort_include['StudyDate_Time_format'] = pd.to_datetime(tbi_initial_cohort_include['StudyDate_Time_format'])
 
-# sort scans in chronological order
-tbi_initial_cohort_include = tbi_initial_cohort_include.sort_values(['unique_study_id', 'StudyDate_Time_format'])
-
-# create column for time of first scan
-tbi_initial_cohort_include['first_scan_time'] = tbi_initial_cohort_include.groupby('unique_study_id')['StudyDate_Time_format'].transform('first')
-
-# calculate time difference
-tbi_initial_cohort_include['time_since_first_scan'] = (tbi_initial_cohort_include['StudyDate_Time_format'] - tbi_initial_cohort_include['first_scan_time']).dt.round('H') / pd.Timedelta('1 day')*24
+# sort scans in chronological order and calculate the time since the first scan (`first_scan_time`, `time_since_first_scan` in hours)
+# only the time columns are needed here; volume changes are recalculated below after excluding scans
+tbi_initial_cohort_include = compute_trajectories(tbi_initial_cohort_include,
+                                                  compartments = {},
+                                                  order_by = ['StudyDate_Time_format'])
 
 # keep scans within 72 hours
 print(len(tbi_initial_cohort_include))
@@ -94,9 +98,7 @@ two_ml_first_all[((two_ml_first_all['change_iph_volume_first_scan'] >= 6) | (two
 
 ### Upload and clean reviewed patients with >= 2mL of hemorrhage
 # reload updated annotations
-two_ml_annotated = pd.read_excel('data/processed/manual_review/02_initial_tbi_patient_list_inclusion_2ml.xlsx',
-                                 sheet_name = 'chart_review',
-                                 engine='openpyxl')
+two_ml_annotated = read_sheet('data/processed/manual_review/02_initial_tbi_patient_list_inclusion_2ml.xlsx', 'chart_review')
 
 exclude_reasons = pd.DataFrame(two_ml_annotated[two_ml_annotated['exclude']==1]['reason_excluded'].str.lower())
 exclude_reasons = exclude_reasons['reason_excluded'].str.strip().value_counts().reset_index(drop=False)
@@ -304,8 +306,9 @@ two_ml_annotated_censored_scans = two_ml_annotated_censored_scans[~(two_ml_annot
 #### Review blast-ct QC metric for remaining scans
 
 ### Review for portable scanner
-#two_ml_annotated_censored_scans[(two_ml_annotated_censored_scans['report'].str.contains('8-slice', case = False))][['unique_study_id', 'id', 'report']]
-#two_ml_annotated_censored_scans[(two_ml_annotated_censored_scans['report'].str.contains('portable', case = False))][['unique_study_id', 'id', 'report']]
+# `8-slice` and `portable` are tagged from the reports in 01_prepare_radiology_reports.py
+#two_ml_annotated_censored_scans[two_ml_annotated_censored_scans['8-slice'] == 1][['unique_study_id', 'id', 'report']]
+#two_ml_annotated_censored_scans[two_ml_annotated_censored_scans['portable'] == 1][['unique_study_id', 'id', 'report']]
 
 print('Unique number of censored patients and scans:', two_ml_annotated_censored_scans[['unique_study_id', 'id']].nunique())
 
@@ -325,23 +328,11 @@ first[(first['iph_predicted_volume_ml']>=2) | (first['eah_predicted_volume_ml']>
 ### Recalculate change from first scan
 # We will recalculated the change from the first scan after having excluded some patient's first scan
 
-# ensure data is arranged by patient and scan number
-two_ml_annotated_censored_scans = two_ml_annotated_censored_scans.sort_values(['unique_study_id', 'scan_number'])
-
-# calculate change by compartment
-two_ml_annotated_censored_scans['iph_volume_first'] = two_ml_annotated_censored_scans.groupby(['unique_study_id'])['iph_predicted_volume_ml'].transform('first')
-two_ml_annotated_censored_scans['eah_volume_first'] = two_ml_annotated_censored_scans.groupby(['unique_study_id'])['eah_predicted_volume_ml'].transform('first')
-two_ml_annotated_censored_scans['ivh_volume_first'] = two_ml_annotated_censored_scans.groupby(['unique_study_id'])['ivh_predicted_volume_ml'].transform('first')
-
-two_ml_annotated_censored_scans['change_iph_volume_first_scan'] = two_ml_annotated_censored_scans['iph_predicted_volume_ml'] - two_ml_annotated_censored_scans['iph_volume_first']         
-two_ml_annotated_censored_scans['change_eah_volume_first_scan'] = two_ml_annotated_censored_scans['eah_predicted_volume_ml'] - two_ml_annotated_censored_scans['eah_volume_first']         
-two_ml_annotated_censored_scans['change_ivh_volume_first_scan'] = two_ml_annotated_censored_scans['ivh_predicted_volume_ml'] - two_ml_annotated_censored_scans['ivh_volume_first']   
-
+# ensure data is arranged by patient and scan number, then calculate change by compartment
 ### Identify potential HE Cases
-## identify max change for each patient
-two_ml_annotated_censored_scans['max_change_iph_volume_first_scan'] = two_ml_annotated_censored_scans.groupby('unique_study_id')['change_iph_volume_first_scan'].transform('max')
-two_ml_annotated_censored_scans['max_change_eah_volume_first_scan'] = two_ml_annotated_censored_scans.groupby('unique_study_id')['change_eah_volume_first_scan'].transform('max')
-two_ml_annotated_censored_scans['max_change_ivh_volume_first_scan'] = two_ml_annotated_censored_scans.groupby('unique_study_id')['change_ivh_volume_first_scan'].transform('max')
+## this also identifies the max change for each patient (`max_change_*_volume_first_scan`)
+two_ml_annotated_censored_scans = compute_trajectories(two_ml_annotated_censored_scans,
+                                                       order_by = ['scan_number'])
 
 #### Create columns for outcomes
 #two_ml_annotated_censored_scans['second_scan_post_surgery_trauma'].value_counts()
@@ -351,19 +342,33 @@ two_ml_annotated_censored_scans['second_scan_post_surgery_trauma'] = np.where(tw
 
 #two_ml_annotated_censored_scans['second_scan_post_surgery_trauma'].value_counts()
 
-two_ml_annotated_censored_scans['outcome_6ml'] = np.where((two_ml_annotated_censored_scans['second_scan_post_surgery_trauma'] == 0) & 
-((two_ml_annotated_censored_scans['max_change_iph_volume_first_scan'] >= 6) | (two_ml_annotated_censored_scans['max_change_eah_volume_first_scan'] >= 6)), 1, 0) 
-
-two_ml_annotated_censored_scans['outcome_8ml'] = np.where((two_ml_annotated_censored_scans['second_scan_post_surgery_trauma'] == 0) & 
-((two_ml_annotated_censored_scans['max_change_iph_volume_first_scan'] >= 8) | (two_ml_annotated_censored_scans['max_change_eah_volume_first_scan'] >= 8)), 1, 0) 
-
-two_ml_annotated_censored_scans['outcome_10ml'] = np.where((two_ml_annotated_censored_scans['second_scan_post_surgery_trauma'] == 0) & 
-((two_ml_annotated_censored_scans['max_change_iph_volume_first_scan'] >= 10) | (two_ml_annotated_censored_scans['max_change_eah_volume_first_scan'] >= 10)), 1, 0)
+# outcome: >= 6, 8 or 10 mL growth of IPH or EAH from the first scan, censored patients are not cases
+for expansion_ml in [6, 8, 10]:
+    two_ml_annotated_censored_scans[f'outcome_{expansion_ml}ml'] = expansion_outcome(two_ml_annotated_censored_scans, expansion_ml)
+
+### Sensitivity of the cohort to the outcome definition
+# cohort size and prevalence for a grid of (first scan inclusion mL, expansion mL, window hours); see nu_tbi/thresholds.py
+# uses all scans (not only those within 72 hours) after removing excluded scans and patients; patients below 2 mL were not
+# chart reviewed, so counts at lower inclusion cutoffs include unreviewed patients
+sweep_scans = tbi_initial_cohort_include[~(tbi_initial_cohort_include['id'].isin(scans_to_exclude['id_to_remove'])) &
+                                         ~(tbi_initial_cohort_include['unique_study_id'].isin(two_ml_annotated[two_ml_annotated['exclude'] == 1]['unique_study_id']))]
+sweep_scans = pd.merge(sweep_scans[['unique_study_id', 'StudyDate_Time_format', 'iph_predicted_volume_ml', 'eah_predicted_volume_ml']],
+                       two_ml_annotated[['unique_study_id', 'second_scan_post_surgery_trauma']].drop_duplicates('unique_study_id'),
+                       on = 'unique_study_id',
+                       how = 'left')
+outcome_sweep = sweep_outcomes(prepare_sweep(sweep_scans, censor_col = 'second_scan_post_surgery_trauma'),
+                               inclusion_ml = np.arange(1, 10.5, 0.5),
+                               expansion_ml = np.arange(2, 20.5, 0.5),
+                               window_hours = [24, 48, 72, 96, 120, 168])
+print('Cohort size and prevalence for the current outcome definitions:')
+print(outcome_sweep[(outcome_sweep['inclusion_ml'] == 2) & (outcome_sweep['expansion_ml'].isin([6, 8, 10])) & (outcome_sweep['window_hours'] == 72)].to_string(index = False))
+outcome_sweep.to_csv('data/modeling/outcome_threshold_sweep.csv', index = False)
 
 ### Prepare data for modeling
 tbi_cohort_clean_to_model = two_ml_annotated_censored_scans[[
     'unique_study_id', 
     'report_num_temp', 
+    'id',
     'scan_number',
     'StudyDate_Time_format', 
     'quality_control_metric', 
@@ -386,100 +391,7 @@ tbi_cohort_clean_to_model = two_ml_annotated_censored_scans[[
     'change_ivh_volume_first_scan',
     'max_change_iph_volume_first_scan',	
     'max_change_eah_volume_first_scan', 
-    'max_change_ivh_volume_first_scan',
-    'prediction_iph_BrainStem_ml',
-    'prediction_iph_Cerebellum_ml',
-    'prediction_iph_LeftBasalForebrain_ml',
-    'prediction_iph_LeftBasalGanglia_ml',
-    'prediction_iph_LeftBasalganglia-lentiform-nucleus_ml',
-    'prediction_iph_LeftCaudate_ml',
-    'prediction_iph_LeftCerebellum_ml',
-    'prediction_iph_LeftFrontalLobe-inferior-orbital_ml',
-    'prediction_iph_LeftFrontalLobe-lateral_ml',
-    'prediction_iph_LeftFrontalLobe-medial_ml',
-    'prediction_iph_LeftHippocampus_ml',
-    'prediction_iph_LeftInsula_ml',
-    'prediction_iph_LeftOccipitalLobe_ml',
-    'prediction_iph_LeftParietalLobe_ml',
-    'prediction_iph_LeftTemporalLobe_ml',
-    'prediction_iph_LeftThalamusProper_ml',
-    'prediction_iph_RightBasalForebrain_ml',
-    'prediction_iph_RightBasalGanglia_ml',
-    'prediction_iph_RightBasalGanglia-lentiform-nucleus_ml',
-    'prediction_iph_RightCaudate_ml',
-    'prediction_iph_RightCerebellum_ml',
-    'prediction_iph_RightFrontalLobe-inferior-orbital_ml',
-    'prediction_iph_RightFrontalLobe-lateral_ml',
-    'prediction_iph_RightFrontalLobe-medial_ml',
-    'prediction_iph_RightHippocampus_ml',
-    'prediction_iph_RightInsula_ml',
-    'prediction_iph_RightOccipitalLobe_ml',
-    'prediction_iph_RightParietalLobe_ml',
-    'prediction_iph_RightTemporalLobe_ml',
-    'prediction_iph_RightThalamusProper_ml',
-    'prediction_iph_Ventricle_ml',
-    'prediction_eah_BrainStem_ml',
-    'prediction_eah_Cerebellum_ml',
-    'prediction_eah_LeftBasalForebrain_ml',
-    'prediction_eah_LeftBasalGanglia_ml',
-    'prediction_eah_LeftBasalganglia-lentiform-nucleus_ml',
-    'prediction_eah_LeftCaudate_ml',
-    'prediction_eah_LeftCerebellum_ml',
-    'prediction_eah_LeftFrontalLobe-inferior-orbital_ml',
-    'prediction_eah_LeftFrontalLobe-lateral_ml',
-    'prediction_eah_LeftFrontalLobe-medial_ml',
-    'prediction_eah_LeftHippocampus_ml',
-    'prediction_eah_LeftInsula_ml',
-    'prediction_eah_LeftOccipitalLobe_ml',
-    'prediction_eah_LeftParietalLobe_ml',
-    'prediction_eah_LeftTemporalLobe_ml',
-    'prediction_eah_LeftThalamusProper_ml',
-    'prediction_eah_RightBasalForebrain_ml',
-    'prediction_eah_RightBasalGanglia_ml',
-    'prediction_eah_RightBasalGanglia-lentiform-nucleus_ml',
-    'prediction_eah_RightCaudate_ml',
-    'prediction_eah_RightCerebellum_ml',
-    'prediction_eah_RightFrontalLobe-inferior-orbital_ml',
-    'prediction_eah_RightFrontalLobe-lateral_ml',
-    'prediction_eah_RightFrontalLobe-medial_ml',
-    'prediction_eah_RightHippocampus_ml',
-    'prediction_eah_RightInsula_ml',
-    'prediction_eah_RightOccipitalLobe_ml',
-    'prediction_eah_RightParietalLobe_ml',
-    'prediction_eah_RightTemporalLobe_ml',
-    'prediction_eah_RightThalamusProper_ml',
-    'prediction_eah_Ventricle_ml',
-    'prediction_ivh_BrainStem_ml',
-    'prediction_ivh_Cerebellum_ml',
-    'prediction_ivh_LeftBasalForebrain_ml',
-    'prediction_ivh_LeftBasalGanglia_ml',
-    'prediction_ivh_LeftBasalganglia-lentiform-nucleus_ml',
-    'prediction_ivh_LeftCaudate_ml',
-    'prediction_ivh_LeftCerebellum_ml',
-    'prediction_ivh_LeftFrontalLobe-inferior-orbital_ml',
-    'prediction_ivh_LeftFrontalLobe-lateral_ml',
-    'prediction_ivh_LeftFrontalLobe-medial_ml',
-    'prediction_ivh_LeftHippocampus_ml',
-    'prediction_ivh_LeftInsula_ml',
-    'prediction_ivh_LeftOccipitalLobe_ml',
-    'prediction_ivh_LeftParietalLobe_ml',
-    'prediction_ivh_LeftTemporalLobe_ml',
-    'prediction_ivh_LeftThalamusProper_ml',
-    'prediction_ivh_RightBasalForebrain_ml',
-    'prediction_ivh_RightBasalGanglia_ml',
-    'prediction_ivh_RightBasalGanglia-lentiform-nucleus_ml',
-    'prediction_ivh_RightCaudate_ml',
-    'prediction_ivh_RightCerebellum_ml',
-    'prediction_ivh_RightFrontalLobe-inferior-orbital_ml',
-    'prediction_ivh_RightFrontalLobe-lateral_ml',
-    'prediction_ivh_RightFrontalLobe-medial_ml',
-    'prediction_ivh_RightHippocampus_ml',
-    'prediction_ivh_RightInsula_ml',
-    'prediction_ivh_RightOccipitalLobe_ml',
-    'prediction_ivh_RightParietalLobe_ml',
-    'prediction_ivh_RightTemporalLobe_ml',
-    'prediction_ivh_RightThalamusProper_ml',
-    'prediction_ivh_Ventricle_ml']]
+    'max_change_ivh_volume_first_scan']]
 
 print('Number of unique patients for modeling:', tbi_cohort_clean_to_model[['unique_study_id']].nunique())
 
@@ -504,6 +416,16 @@ print('Number of unique patients for modeling (first scan for modeling):', tbi_c
 # saved on 6.14.2024 with cleaned up surgery labels
 tbi_cohort_clean_to_model_first.to_csv('data/modeling/tbi_data_first_scan_v3.csv', index = False)
 tbi_cohort_clean_to_model.to_csv('data/modeling/tbi_data_all_scans_v3.csv', index = False)
+write_table(tbi_cohort_clean_to_model_first, 'tbi_data_first_scan')
+write_table(tbi_cohort_clean_to_model, 'tbi_data_all_scans')
+
+# regional volumes (prediction_{compartment}_{region}_ml) are stored separately in long format and can be joined on `id`
+# see nu_tbi/regional.py for converting back to wide columns or rolling up by side, lobe, or compartment
+tbi_regional_volumes = read_table('initial_tbi_scans_regional_volumes')
+tbi_regional_volumes = tbi_regional_volumes[(tbi_regional_volumes['id'].isin(tbi_cohort_clean_to_model['id'])) & 
+                                            (tbi_regional_volumes['compartment'].isin(['iph', 'eah', 'ivh']))]
+tbi_regional_volumes.to_csv('data/modeling/tbi_data_all_scans_regional_v3.csv', index = False)
+write_table(tbi_regional_volumes, 'tbi_data_all_scans_regional')
 
 # to check outputs are the same
 # ran on 10/28/2024
@@ -8,7 +8,10 @@ import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 
-os.chdir('/share/nubar/Neurotrauma/hematoma_expansion/NU_TBI')
+from nu_tbi.cohort_store import read_table, write_table
+from nu_tbi.paths import NU_TBI_DIR
+
+os.chdir(NU_TBI_DIR)
 
 ## load data
 # April 30, 2024
@@ -16,8 +19,13 @@ os.chdir('/share/nubar/Neurotrauma/hematoma_expansion/NU_TBI')
 # tbi_data_all = pd.read_csv('data/modeling/tbi_data_all_scans_v2.csv')
 
 # October 29, 2024: used v3 for splitting - this is the same as '_v2' results, except with additional cleaning on columns: 'Injury', 'surgery_type', and floating point precession (rounded to three decimal places) of blast-ct predictions
-tbi_data = pd.read_csv('data/modeling/tbi_data_first_scan_v3.csv')
-tbi_data_all = pd.read_csv('data/modeling/tbi_data_all_scans_v3.csv')
+# only the columns used below are read from the typed copies written by scripts/11_prepare_cohort.py
+tbi_data = read_table('tbi_data_first_scan',
+                      columns = ['unique_study_id', 'surgery', 'surgery_type', 'second_scan_post_surgery_trauma', 
+                                 'iph_predicted_volume_ml', 'eah_predicted_volume_ml', 'oedema_predicted_volume_ml', 'ivh_predicted_volume_ml',
+                                 'outcome_6ml', 'outcome_8ml', 'outcome_10ml'])
+tbi_data_all = read_table('tbi_data_all_scans',
+                          columns = ['unique_study_id', 'report_num_temp', 'second_scan_post_surgery_trauma'])
 
 print('Number of patients:', len(tbi_data))
 
@@ -37,6 +45,7 @@ X = tbi_data.drop(['outcome_6ml', 'outcome_8ml', 'outcome_10ml'], axis=1)[['uniq
 y = tbi_data[['unique_study_id', 'second_scan_post_surgery_trauma', 'outcome_6ml', 'outcome_8ml', 'outcome_10ml']]
 
 # split into train and test sets
+# scripts/run_split_study.py repeats patient-grouped, outcome-stratified splits to check how much results depend on this split
 X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=1300, shuffle=True)
 
 print('Print len(X_train):', len(X_train))
@@ -59,6 +68,11 @@ y_train.to_csv('data/modeling/model1_structured_radiographic/y_train_id_v4.csv')
 X_test.to_csv('data/modeling/model1_structured_radiographic/X_test_id_v4.csv')
 y_test.to_csv('data/modeling/model1_structured_radiographic/y_test_id_v4.csv')
 
+write_table(X_train, 'X_train_id')
+write_table(y_train, 'y_train_id')
+write_table(X_test, 'X_test_id')
+write_table(y_test, 'y_test_id')
+
 
 # save without id
 del X_train['unique_study_id']
@@ -79,3 +93,8 @@ y_train.to_csv('data/modeling/model1_structured_radiographic/y_train_v4.csv')
 
 X_test.to_csv('data/modeling/model1_structured_radiographic/X_test_v4.csv')
 y_test.to_csv('data/modeling/model1_structured_radiographic/y_test_v4.csv')
+
+write_table(X_train, 'X_train')
+write_table(y_train, 'y_train')
+write_table(X_test, 'X_test')
+write_table(y_test, 'y_test')
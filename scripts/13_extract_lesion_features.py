@@ -0,0 +1,47 @@
+# Date: 10-19-2026
+# Objective: Extract lesion level shape, density and location features (see scripts/nu_tbi/lesion_features.py) from the
+# CT and blast-ct label map of every scan in the modeling cohort, to complement the four compartment volumes used in 12.
+# Output: data/modeling/lesion_features_v1.csv (and a typed parquet copy), one row per scan; joins on `id`
+
+import argparse
+import os
+import time
+
+import pandas as pd
+
+from nu_tbi.cohort_store import read_table, write_table
+from nu_tbi.lesion_features import extract_features
+from nu_tbi.paths import NU_TBI_DIR
+
+parser = argparse.ArgumentParser(description = 'extract lesion features')
+parser.add_argument('--jobs', type = int, default = os.cpu_count())
+args = parser.parse_args()
+
+os.chdir(NU_TBI_DIR)
+
+## load data
+# scans in the modeling cohort and the paths of their images and blast-ct outputs
+tbi_data_all = read_table('tbi_data_all_scans', columns = ['unique_study_id', 'id'])
+predictions = read_table('prepped_predictions', columns = ['id', 'image', 'prediction', 'atlas_in_native_space', 'brain_mask_native_space'])
+
+scans = pd.merge(tbi_data_all.astype({'id': 'str'}),
+                 predictions.astype('object').drop_duplicates('id').astype({'id': 'str'}),
+                 on = 'id',
+                 how = 'inner')
+print('Number of scans:', len(scans))
+
+## extract features
+start = time.time()
+lesion_features = extract_features(scans[['id', 'image', 'prediction', 'atlas_in_native_space', 'brain_mask_native_space']], jobs = args.jobs)
+print(f'extracted features for {len(lesion_features)} scans in {(time.time() - start) / 60:.2f} minutes')
+
+errors = lesion_features[lesion_features['error'].notnull()]
+print('Number of scans that could not be processed:', len(errors))
+if len(errors):
+    print(errors[['id', 'error']].head(20).to_string(index = False))
+
+lesion_features = pd.merge(scans[['unique_study_id', 'id']], lesion_features, on = 'id', how = 'left')
+
+### Save features
+lesion_features.to_csv('data/modeling/lesion_features_v1.csv', index = False)
+write_table(lesion_features, 'lesion_features')
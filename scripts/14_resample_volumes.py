@@ -0,0 +1,53 @@
+# Date: 10-19-2026
+# Objective: Resample the CT and blast-ct label map of every scan in the modeling cohort to a common voxel spacing and
+# orientation (see scripts/nu_tbi/resample.py). Resampled volumes are cached by source content and target spec, so
+# rerunning only resamples new or changed scans, and several specs can be kept side by side.
+# Output: data/processed/resampled/<spec name>/index.csv (id -> resampled image and prediction paths)
+#
+# Usage (from NU_TBI/):
+#   python scripts/14_resample_volumes.py --spacing 1 1 1 --orientation RAS --jobs 8
+#   python scripts/14_resample_volumes.py --spacing 0.5 0.5 5 --prune
+
+import argparse
+import os
+import time
+
+import pandas as pd
+
+from nu_tbi.cohort_store import read_table
+from nu_tbi.paths import NU_TBI_DIR
+from nu_tbi.resample import make_spec, resample_scans, prune_cache
+
+parser = argparse.ArgumentParser(description = 'resample volumes to a common grid')
+parser.add_argument('--spacing', type = float, nargs = 3, default = [1.0, 1.0, 1.0], help = 'voxel spacing in mm')
+parser.add_argument('--orientation', default = 'RAS', help = 'axis codes of the resampled volumes')
+parser.add_argument('--jobs', type = int, default = os.cpu_count())
+parser.add_argument('--prune', action = 'store_true', help = 'remove cached volumes that are no longer in the cohort')
+args = parser.parse_args()
+
+os.chdir(NU_TBI_DIR)
+
+## load data
+# scans in the modeling cohort and the paths of their images and blast-ct label maps
+tbi_data_all = read_table('tbi_data_all_scans', columns = ['id'])
+predictions = read_table('prepped_predictions', columns = ['id', 'image', 'prediction'])
+scans = pd.merge(tbi_data_all.astype({'id': 'str'}),
+                 predictions.astype('object').drop_duplicates('id').astype({'id': 'str'}),
+                 on = 'id',
+                 how = 'inner')
+print('Number of scans:', len(scans))
+
+## resample
+spec = make_spec(spacing = args.spacing, orientation = args.orientation)
+start = time.time()
+index = resample_scans(scans, spec, jobs = args.jobs)
+print(f"resampled {(~index['cached'] & index['error'].isnull()).sum()} scans, {index['cached'].sum()} already cached, "
+      f"in {(time.time() - start) / 60:.2f} minutes")
+
+errors = index[index['error'].notnull()]
+print('Number of scans that could not be resampled:', len(errors))
+if len(errors):
+    print(errors[['id', 'error']].head(20).to_string(index = False))
+
+if args.prune:
+    print('Removed cached volumes:', prune_cache(spec))
@@ -0,0 +1,47 @@
+# Date: 10-19-2026
+# Objective: Encode every blast-ct prediction as a sparse run-length mask (see scripts/nu_tbi/sparse_masks.py), so voxel
+# counts, bounding boxes, overlay slices and overlaps between scans can be computed without loading full volumes.
+# Output: data/processed/sparse_masks/masks.npz (runs of all scans, load with nu_tbi.sparse_masks.load_masks)
+#         data/processed/sparse_masks/index.csv (id, shape, number of runs, voxels per label, bounding box)
+#
+# Usage (from NU_TBI/):
+#   python scripts/15_encode_sparse_masks.py --jobs 8
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from nu_tbi.cohort_store import read_table
+from nu_tbi.paths import NU_TBI_DIR
+from nu_tbi.sparse_masks import SPARSE_DIR, encode_predictions, save_masks
+
+parser = argparse.ArgumentParser(description = 'encode blast-ct predictions as sparse masks')
+parser.add_argument('--jobs', type = int, default = os.cpu_count())
+args = parser.parse_args()
+
+os.chdir(NU_TBI_DIR)
+
+## load data
+predictions = read_table('prepped_predictions', columns = ['id', 'prediction'])
+predictions = predictions.astype('object').drop_duplicates('id').astype({'id': 'str'})
+print('Number of predictions:', len(predictions))
+
+## encode
+start = time.time()
+masks, index = encode_predictions(predictions, jobs = args.jobs)
+print(f'encoded {len(masks)} predictions in {(time.time() - start) / 60:.2f} minutes')
+
+errors = index[index['error'].notnull()]
+print('Number of predictions that could not be encoded:', len(errors))
+if len(errors):
+    print(errors[['id', 'error']].head(20).to_string(index = False))
+
+encoded = index[index['error'].isnull()]
+print('Number of predictions without any label:', (encoded[['voxels_1', 'voxels_2', 'voxels_3', 'voxels_4']].sum(axis = 1) == 0).sum())
+print('Median number of runs per prediction:', np.median(encoded['n_runs']) if len(encoded) else np.nan)
+
+os.makedirs(SPARSE_DIR, exist_ok = True)
+save_masks(masks, os.path.join(SPARSE_DIR, 'masks.npz'))
+index.to_csv(os.path.join(SPARSE_DIR, 'index.csv'), index = False)
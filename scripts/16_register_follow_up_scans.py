@@ -0,0 +1,57 @@
+# Date: 10-19-2026
+# Objective: Rigidly register every follow-up scan to the patient's first scan (ordered by scan_number) and measure
+# voxel-wise new and resolved hemorrhage per compartment (see scripts/nu_tbi/registration.py), as a complement to the
+# volume differences (change_*_volume_first_scan) used for the outcome in 11.
+# Transforms are cached, so rerunning only registers new or changed scans.
+# Output: data/modeling/registered_expansion_v1.csv (and a typed parquet copy), one row per follow-up scan; joins on `id`
+#         data/processed/registration/maps.npz (sparse new/resolved label maps on the first scan's grid, keys
+#         '<id>_new' and '<id>_resolved'; load with nu_tbi.sparse_masks.load_masks)
+#
+# Usage (from NU_TBI/):
+#   python scripts/16_register_follow_up_scans.py --jobs 16
+
+import argparse
+import os
+import time
+
+import pandas as pd
+
+from nu_tbi.cohort_store import read_table, write_table
+from nu_tbi.paths import NU_TBI_DIR
+from nu_tbi.registration import REGISTRATION_DIR, register_cohort
+from nu_tbi.sparse_masks import save_masks
+
+parser = argparse.ArgumentParser(description = 'register follow-up scans to the first scan')
+parser.add_argument('--jobs', type = int, default = os.cpu_count())
+args = parser.parse_args()
+
+os.chdir(NU_TBI_DIR)
+
+## load data
+# scans in the modeling cohort with their order within the patient and the paths of their images and blast-ct outputs
+tbi_data_all = read_table('tbi_data_all_scans', columns = ['unique_study_id', 'id', 'scan_number'])
+predictions = read_table('prepped_predictions', columns = ['id', 'image', 'prediction'])
+scans = pd.merge(tbi_data_all.astype({'id': 'str'}),
+                 predictions.astype('object').drop_duplicates('id').astype({'id': 'str'}),
+                 on = 'id',
+                 how = 'inner')
+print('Number of patients with follow-up scans:', (scans.groupby('unique_study_id').size() > 1).sum())
+print('Number of follow-up scans:', (scans.groupby('unique_study_id').cumcount() > 0).sum())
+
+## register
+start = time.time()
+registered, maps = register_cohort(scans, jobs = args.jobs)
+print(f"registered {(~registered['cached'].astype(bool) & registered['error'].isnull()).sum()} scans, "
+      f"{registered['cached'].astype(bool).sum()} transforms cached, in {(time.time() - start) / 60:.2f} minutes")
+
+errors = registered[registered['error'].notnull()]
+print('Number of scans that could not be registered:', len(errors))
+if len(errors):
+    print(errors[['id', 'error']].head(20).to_string(index = False))
+
+registered = pd.merge(scans[['unique_study_id', 'id']], registered, on = 'id', how = 'inner')
+
+### Save
+registered.to_csv('data/modeling/registered_expansion_v1.csv', index = False)
+write_table(registered, 'registered_expansion')
+save_masks(maps, os.path.join(REGISTRATION_DIR, 'maps.npz'))
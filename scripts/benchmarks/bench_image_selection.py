@@ -0,0 +1,158 @@
+# Date: 10-19-2026
+# Objective: Benchmark best-image selection in scripts/09_filter_predictions.py.
+# Compares the previous tilt/non-tilt split-merge-concat approach with nu_tbi.selection.select_best
+# on synthetic predictions at 10x our current prediction count (~13,000 blast-ct predictions across 13 batches).
+# Run from NU_TBI/scripts: python benchmarks/bench_image_selection.py --n-rows 130000
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nu_tbi.selection import select_best, prefer_ids, prefer_pattern, superseded_by, TILT_PATTERNS
+
+
+# create a synthetic predictions dataframe with the columns used for image selection
+# each folder (imaging session) holds a few image types (image_name), some of which have a tilt corrected copy
+def make_predictions(n_rows, seed = 1300):
+    rng = np.random.default_rng(seed)
+
+    images_per_folder = 3
+    n_folders = max(1, -(-n_rows // images_per_folder))
+    n_patients = max(1, n_folders // 4)
+
+    folder = np.repeat(np.arange(n_folders), images_per_folder)[:n_rows]
+    unique_study_id = folder % n_patients
+    scan_number = folder // n_patients + 1
+    image_name = rng.choice(['2_Head_Routine', '3_Head_Routine', '4_Head_Thin'], size = n_rows)
+    tilt = rng.random(n_rows) < 0.3
+    suffix = np.where(tilt, '_Tilt_1', '')
+
+    predictions = pd.DataFrame({
+        'unique_study_id': unique_study_id,
+        'report_num_temp': 'CT' + folder.astype('str'),
+        'id': ['scan_' + str(i + 1) for i in range(n_rows)],
+        'scan_number': scan_number,
+        'folder': 'folder_' + folder.astype('str'),
+        'image_name': image_name,
+        'slice_num': rng.integers(30, 100, size = n_rows),
+        'quality_control_metric': rng.random(n_rows),
+    })
+    predictions['image'] = ('nifti_images/' + predictions['folder'] + '/random/' + predictions['image_name'] +
+                            '/' + predictions['image_name'] + suffix + '.nii')
+    return predictions
+
+
+# the approach previously used in scripts/09_filter_predictions.py
+def legacy_select(predictions_filtered, reviewed_scans):
+    tilt_predictions = predictions_filtered[predictions_filtered['image'].str.contains('|'.join(['tilt', '_Eq']), case = False)].drop_duplicates()
+    non_tilt_predictions = predictions_filtered[~(predictions_filtered['image'].str.contains('|'.join(['tilt', '_Eq']), case = False))].drop_duplicates()
+
+    tilt_scan_counts = tilt_predictions.groupby(['unique_study_id', 'image_name', 'scan_number'])['image_name'].count().reset_index(name = 'count')
+    non_tilt_scan_counts = non_tilt_predictions.groupby(['unique_study_id', 'image_name', 'scan_number'])['image_name'].count().reset_index(name = 'count')
+
+    tilt_predictions_multiple = pd.merge(tilt_predictions, tilt_scan_counts[tilt_scan_counts['count'] > 1], how = 'inner')
+    tilt_predictions_one = pd.merge(tilt_predictions, tilt_scan_counts[tilt_scan_counts['count'] == 1], how = 'inner')
+    non_tilt_predictions_multiple = pd.merge(non_tilt_predictions, non_tilt_scan_counts[non_tilt_scan_counts['count'] > 1], how = 'inner')
+    non_tilt_predictions_one = pd.merge(non_tilt_predictions, non_tilt_scan_counts[non_tilt_scan_counts['count'] == 1], how = 'inner')
+
+    tilt_predictions_multiple_filtered = tilt_predictions_multiple.loc[tilt_predictions_multiple.groupby(['unique_study_id', 'image_name', 'scan_number'])['quality_control_metric'].idxmin()]
+    non_tilt_predictions_multiple_filtered = non_tilt_predictions_multiple.loc[non_tilt_predictions_multiple.groupby(['unique_study_id', 'image_name', 'scan_number'])['quality_control_metric'].idxmin()]
+
+    tilt_predictions_filtered = pd.concat([tilt_predictions_one, tilt_predictions_multiple_filtered])
+    non_tilt_predictions_filtered = pd.concat([non_tilt_predictions_one, non_tilt_predictions_multiple_filtered])
+
+    keys = ['unique_study_id', 'report_num_temp', 'scan_number', 'folder', 'image_name']
+    non_tilt_predictions_to_filter = pd.merge(non_tilt_predictions_filtered[keys], tilt_predictions_filtered[keys], how = 'outer', indicator = True)
+    non_tilt_predictions_filtered_keep = non_tilt_predictions_to_filter[(non_tilt_predictions_to_filter['_merge'] == "left_only")]
+    del non_tilt_predictions_filtered_keep['_merge']
+    non_tilt_predictions_filtered2 = pd.merge(non_tilt_predictions_filtered_keep, non_tilt_predictions_filtered, how = 'inner')
+
+    tbi_predictions = pd.concat([tilt_predictions_filtered, non_tilt_predictions_filtered2])
+
+    counts = tbi_predictions.groupby(['unique_study_id', 'folder', 'scan_number'])['folder'].count().reset_index(name = 'count')
+    to_eval = pd.merge(tbi_predictions, counts[counts['count'] >= 2], on = ['unique_study_id', 'folder', 'scan_number'], how = 'inner')
+    to_eval = to_eval[['unique_study_id', 'report_num_temp', 'scan_number', 'folder', 'image_name', 'id', 'quality_control_metric']]
+
+    reviewed_ids = pd.merge(to_eval, reviewed_scans[['unique_study_id', 'id_to_keep']],
+                            left_on = ['unique_study_id', 'id'], right_on = ['unique_study_id', 'id_to_keep'], how = 'inner')
+    to_eval_filtered = to_eval[~to_eval['report_num_temp'].isin(reviewed_ids['report_num_temp'])]
+    to_eval_filtered = to_eval_filtered.loc[to_eval_filtered.groupby(['unique_study_id', 'report_num_temp'])['quality_control_metric'].idxmin()]
+    del reviewed_ids['id_to_keep']
+    to_eval_filtered_combined = pd.concat([to_eval_filtered, reviewed_ids])
+
+    tbi_predictions_outer = pd.merge(tbi_predictions, to_eval_filtered_combined[['unique_study_id', 'report_num_temp', 'folder']], how = 'outer', indicator = True)
+    tbi_predictions_outer = tbi_predictions_outer[tbi_predictions_outer['_merge'] == "left_only"]
+    tbi_predictions_right = pd.merge(tbi_predictions, to_eval_filtered_combined[['unique_study_id', 'report_num_temp', 'folder', 'id']], how = 'right', indicator = True)
+
+    tbi_predictions_clean = pd.concat([tbi_predictions_outer, tbi_predictions_right])
+    del tbi_predictions_clean['_merge']
+    tbi_predictions_clean = tbi_predictions_clean.sort_values(['unique_study_id', 'scan_number'], ascending = True)
+    return tbi_predictions_clean.groupby(['unique_study_id', 'folder']).first().reset_index(drop = False)
+
+
+# the single-pass approach now used in scripts/09_filter_predictions.py
+def single_pass_select(predictions_filtered, reviewed_scans):
+    predictions_filtered = predictions_filtered.drop_duplicates()
+    reviewed_rank = prefer_ids(predictions_filtered['id'], reviewed_scans['id_to_keep'])
+    tilt_rank = prefer_pattern(predictions_filtered['image'], TILT_PATTERNS)
+    superseded_rank = superseded_by(predictions_filtered, ['unique_study_id', 'image_name', 'scan_number'], tilt_rank == 0)
+    return select_best(predictions_filtered,
+                       group_cols = ['unique_study_id', 'folder'],
+                       rank_by = [('scan_number', True),
+                                  (superseded_rank, True),
+                                  (reviewed_rank, True),
+                                  ('quality_control_metric', True),
+                                  (tilt_rank, True),
+                                  ('slice_num', False)])
+
+
+def time_function(function, repeats, *args):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'benchmark best-image selection')
+    parser.add_argument('--n-rows', type = int, default = 130000, help = 'number of synthetic predictions (default: 10x current count)')
+    parser.add_argument('--repeats', type = int, default = 3)
+    args = parser.parse_args()
+
+    predictions = make_predictions(args.n_rows)
+    # pretend we manually reviewed 1% of the folders that still had multiple image types after the tilt/QC selection
+    # reviewers chose `id_to_keep` from these candidates, so we keep the candidate with the worst quality_control_metric
+    tilt_rank = prefer_pattern(predictions['image'], TILT_PATTERNS)
+    candidates = select_best(predictions,
+                             group_cols = ['unique_study_id', 'image_name', 'scan_number'],
+                             rank_by = [(superseded_by(predictions, ['unique_study_id', 'image_name', 'scan_number'], tilt_rank == 0), True),
+                                        ('quality_control_metric', True)])
+    candidates = candidates[candidates.groupby('folder')['id'].transform('count') > 1]
+    reviewed_scans = select_best(candidates, group_cols = ['folder'], rank_by = [('quality_control_metric', False)])
+    reviewed_scans = reviewed_scans.sample(frac = 0.01, random_state = 1148)[['unique_study_id', 'id']]
+    # the review sheet also names some non-tilt images that have a tilt/eq corrected counterpart; the tilt step removes
+    # these before manual review is applied, so they must not be selected
+    superseded = predictions[superseded_by(predictions, ['unique_study_id', 'image_name', 'scan_number'], tilt_rank == 0) == 1]
+    reviewed_scans = pd.concat([reviewed_scans, superseded.sample(frac = 0.01, random_state = 1148)[['unique_study_id', 'id']]])
+    reviewed_scans = reviewed_scans.rename(columns = {'id': 'id_to_keep'})
+    print('number of reviewed ids (of which superseded by a tilt/eq corrected image)', len(reviewed_scans),
+          reviewed_scans['id_to_keep'].isin(superseded['id']).sum())
+
+    print('number of synthetic predictions', len(predictions))
+
+    legacy_time, legacy = time_function(legacy_select, args.repeats, predictions, reviewed_scans)
+    print('split-merge-concat selection:', round(legacy_time, 3), 'seconds')
+
+    single_pass_time, single_pass = time_function(single_pass_select, args.repeats, predictions, reviewed_scans)
+    print('single-pass selection:', round(single_pass_time, 3), 'seconds')
+
+    print('speed-up:', round(legacy_time / single_pass_time, 1), 'x')
+    print('same images selected:', set(legacy['id']) == set(single_pass['id']))
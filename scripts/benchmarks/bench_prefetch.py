@@ -0,0 +1,73 @@
+# Date: 10-19-2026
+# Objective: Benchmark nu_tbi.prefetch on synthetic volumes: a loop that reads a volume and then runs the model on it
+# takes read + compute per volume; with prefetching the reads of the next volumes overlap the model, so the loop should
+# take about max(read, compute). Reads from the network share are simulated by a fixed latency on top of loading a
+# real nifti file from a temporary folder; the model is simulated by a fixed delay.
+# Run from NU_TBI/scripts: python benchmarks/bench_prefetch.py --n-volumes 40 --read-latency 0.2 --compute 0.3
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import nibabel as nib
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nu_tbi.prefetch import format_metrics, prefetch, read_volume
+
+
+# write synthetic CT volumes (int16 HU) as nifti files
+def make_volumes(directory, n_volumes, shape, seed = 1300):
+    rng = np.random.default_rng(seed)
+    paths = []
+    for i in range(n_volumes):
+        path = os.path.join(directory, f'scan_{i + 1}.nii.gz')
+        nib.save(nib.Nifti1Image(rng.integers(-1000, 1000, size = shape, dtype = 'int16'), np.eye(4)), path)
+        paths.append(path)
+    return paths
+
+
+# run the simulated model over all volumes; depth 0 reads each volume just before it is used
+def run(paths, read_latency, compute_seconds, depth):
+    def load(path):
+        time.sleep(read_latency)
+        return read_volume(path)
+
+    start = time.perf_counter()
+    if depth == 0:
+        read = 0.0
+        for path in paths:
+            read_start = time.perf_counter()
+            image = load(path)
+            read += time.perf_counter() - read_start
+            time.sleep(compute_seconds)
+        return time.perf_counter() - start, read, None
+
+    metrics = {}
+    for _, image, error in prefetch(paths, load, depth = depth, metrics = metrics):
+        if error is not None:
+            raise RuntimeError(error)
+        time.sleep(compute_seconds)
+    return time.perf_counter() - start, metrics['load_seconds'], metrics
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--n-volumes', type = int, default = 40)
+parser.add_argument('--shape', type = int, nargs = 3, default = [256, 256, 40])
+parser.add_argument('--read-latency', type = float, default = 0.2, help = 'simulated network share latency per volume (s)')
+parser.add_argument('--compute', type = float, default = 0.3, help = 'simulated model time per volume (s)')
+parser.add_argument('--depths', type = int, nargs = '+', default = [0, 1, 2, 4])
+args = parser.parse_args()
+
+with tempfile.TemporaryDirectory() as directory:
+    paths = make_volumes(directory, args.n_volumes, tuple(args.shape))
+    compute_total = args.compute * args.n_volumes
+    for depth in args.depths:
+        wall, read, metrics = run(paths, args.read_latency, args.compute, depth)
+        print(f'depth {depth}: wall {wall:.1f} s, read {read:.1f} s, compute {compute_total:.1f} s, '
+              f'sum {read + compute_total:.1f} s, max {max(read, compute_total):.1f} s')
+        if metrics is not None:
+            print(f'    {format_metrics(metrics)}')
@@ -0,0 +1,63 @@
+# Date: 10-19-2026
+# Objective: Benchmark report tagging.
+# Compares one str.contains scan per keyword (how the flags and the portable/8-slice checks in 11 were computed)
+# with nu_tbi.report_tags.tag_reports, which scans each report once for all keywords, on synthetic radiology reports.
+# The str.contains cost grows with the number of keywords; the tagger's does not (try --extra-terms 100).
+# Run from NU_TBI/scripts: python benchmarks/bench_report_tagger.py --n-reports 300000 --extra-terms 100 --jobs 8
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nu_tbi.report_tags import tag_reports, KEYWORDS, DERIVED
+from nu_tbi.synthetic import make_studies, make_reports
+
+
+# one str.contains scan over all reports per keyword
+def contains_tags(reports, keywords = KEYWORDS):
+    text = reports.str.lower()
+    return pd.DataFrame({flag: text.str.contains('|'.join(terms), regex = False if len(terms) == 1 else True).fillna(False)
+                         for flag, terms in keywords.items()})
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'benchmark report tagging')
+    parser.add_argument('--n-reports', type = int, default = 300000)
+    parser.add_argument('--jobs', type = int, default = 1)
+    parser.add_argument('--extra-terms', type = int, default = 0, help = 'number of additional (random) keyword flags')
+    args = parser.parse_args()
+
+    reports = make_reports(make_studies(args.n_reports))['report']
+    print('number of synthetic reports', len(reports))
+
+    # extra flags stand in for new search terms; half of them are words that occur in the reports
+    rng = np.random.default_rng(0)
+    words = sorted(set(' '.join(reports.iloc[:1000]).lower().split()))
+    keywords = dict(KEYWORDS)
+    for i in range(args.extra_terms):
+        keywords[f'term_{i}'] = [words[i % len(words)] if i % 2 == 0 else ''.join(rng.choice(list('abcdefghijklmnopqrstuvwxyz'), 7))]
+    print('number of keyword flags', len(keywords))
+
+    start = time.perf_counter()
+    contains = contains_tags(reports, keywords)
+    contains_time = time.perf_counter() - start
+    print('str.contains per keyword:', round(contains_time, 3), 'seconds')
+
+    # without negation cues the tagger reproduces the substring flags exactly
+    start = time.perf_counter()
+    tags = tag_reports(reports, keywords = keywords, negations = [], derived = {}, jobs = args.jobs)
+    tagger_time = time.perf_counter() - start
+    print('single-pass tagger:', round(tagger_time, 3), 'seconds')
+    print('same flags:', bool(np.array_equal(tags[list(keywords)].to_numpy(), contains.to_numpy())))
+
+    start = time.perf_counter()
+    tags = tag_reports(reports, keywords = keywords, jobs = args.jobs)
+    print('single-pass tagger with negation and derived flags:', round(time.perf_counter() - start, 3), 'seconds')
+    print('flag counts:')
+    print(tags[list(KEYWORDS) + list(DERIVED)].sum().to_string())
@@ -0,0 +1,113 @@
+# Date: 10-19-2026
+# Objective: Benchmark the outcome threshold sweep.
+# Compares filtering and grouping the scans once per definition (how the 6/8/10 mL outcomes in 11 and the 5/8/9 mL
+# cutoffs in 10 were explored) with nu_tbi.thresholds.sweep_outcomes, which counts every definition in one pass,
+# on synthetic scans. The pandas loop is only timed on a subset of the grid and checked against the sweep.
+# The labels of the sweep are also checked against expansion_outcome (the outcome_{n}ml columns of 11) on scans with
+# 3-decimal volumes whose changes land exactly on the expansion thresholds.
+# Run from NU_TBI/scripts: python benchmarks/bench_threshold_sweep.py --n-patients 10000
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nu_tbi.thresholds import expansion_outcome, prepare_sweep, sweep_outcomes, outcome_labels, OUTCOME_COMPARTMENTS
+from nu_tbi.trajectory import compute_trajectories, COMPARTMENTS
+
+
+# synthetic scans: 1-6 scans per patient over ~5 days, volumes drifting from a skewed first-scan volume
+def make_scans(n_patients, seed = 1148):
+    rng = np.random.default_rng(seed)
+    n_scans = rng.integers(1, 7, size = n_patients)
+    patient = np.repeat(np.arange(n_patients), n_scans)
+    first = np.repeat(np.arange(n_scans.sum())[np.r_[0, np.cumsum(n_scans)[:-1]]], n_scans) == np.arange(n_scans.sum())
+    hours = np.where(first, 0, rng.uniform(1, 120, size = len(patient)))
+    base = rng.lognormal(0, 1.5, size = (n_patients, 2))[patient]
+    volumes = np.where(first[:, None], base, base + rng.normal(0, 4, size = base.shape))
+    volumes[rng.random(volumes.shape) < 0.3] = 0
+    return pd.DataFrame({'unique_study_id': patient,
+                         'StudyDate_Time_format': pd.Timestamp('2020-01-01') + pd.to_timedelta((patient % 2000) * 24 + hours, unit = 'h'),
+                         'iph_predicted_volume_ml': np.clip(volumes[:, 0], 0, None),
+                         'eah_predicted_volume_ml': np.clip(volumes[:, 1], 0, None),
+                         'second_scan_post_surgery_trauma': (rng.random(n_patients) < 0.05).astype(int)[patient]})
+
+
+# synthetic scans whose IPH or EAH changes from the first scan are often exactly 6, 8 or 10 mL (blast-ct volumes have
+# 3 decimals), so a running maximum that is off by float error gives a different label than expansion_outcome
+def make_tie_scans(n_patients, seed = 1148):
+    scans = make_scans(n_patients, seed)
+    rng = np.random.default_rng(seed + 1)
+    for col in ['iph_predicted_volume_ml', 'eah_predicted_volume_ml']:
+        first = scans.groupby('unique_study_id')[col].transform('first').round(3)
+        tie = rng.random(len(scans)) < 0.5
+        step = rng.choice([6.0, 8.0, 10.0, 5.999, 6.001], size = len(scans))
+        scans[col] = np.where(tie, first + step, scans[col]).round(3)
+        scans.loc[~scans['unique_study_id'].duplicated(), col] = first[~scans['unique_study_id'].duplicated()]
+    return scans
+
+
+# per patient labels of the sweep and of expansion_outcome on the same scans (every patient included, one window
+# covering every scan); returns the number of patients whose labels differ
+def tie_disagreements(scans, expansion_ml):
+    sweep = prepare_sweep(scans, censor_col = 'second_scan_post_surgery_trauma')
+    labels = outcome_labels(sweep, -np.inf, expansion_ml, window_hours = 10 ** 6)
+    cohort = compute_trajectories(scans, compartments = {c: COMPARTMENTS[c] for c in OUTCOME_COMPARTMENTS})
+    expected = pd.Series(expansion_outcome(cohort, expansion_ml)).groupby(cohort['unique_study_id']).max()
+    return int((labels.sort_index().to_numpy() != expected.sort_index().to_numpy()).sum())
+
+
+# one definition with pandas: filter to the window, take the first scan, and the max change per patient
+def pandas_outcome(scans, inclusion_ml, expansion_ml, window_hours):
+    scans = scans.sort_values(['unique_study_id', 'StudyDate_Time_format'])
+    first_time = scans.groupby('unique_study_id')['StudyDate_Time_format'].transform('first')
+    scans = scans[(scans['StudyDate_Time_format'] - first_time) / pd.Timedelta('1 hour') <= window_hours]
+    first = scans.groupby('unique_study_id').first()
+    included = first[(first['iph_predicted_volume_ml'] >= inclusion_ml) | (first['eah_predicted_volume_ml'] >= inclusion_ml)].index
+    scans = scans[scans['unique_study_id'].isin(included)]
+    change = pd.DataFrame({c: scans[c] - scans.groupby('unique_study_id')[c].transform('first')
+                           for c in ['iph_predicted_volume_ml', 'eah_predicted_volume_ml']})
+    grew = (change >= expansion_ml).any(axis = 1) & (scans['second_scan_post_surgery_trauma'] == 0)
+    return grew.groupby(scans['unique_study_id']).any().astype('int8')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'benchmark the outcome threshold sweep')
+    parser.add_argument('--n-patients', type = int, default = 10000)
+    args = parser.parse_args()
+
+    scans = make_scans(args.n_patients)
+    print('number of patients and scans', args.n_patients, len(scans))
+
+    inclusion = np.arange(0, 10.5, 0.5)
+    expansion = np.arange(2, 20.5, 0.5)
+    windows = [24, 48, 72, 96, 120, 168]
+
+    start = time.perf_counter()
+    sweep = prepare_sweep(scans, censor_col = 'second_scan_post_surgery_trauma')
+    summary = sweep_outcomes(sweep, inclusion, expansion, windows)
+    sweep_time = time.perf_counter() - start
+    print(f'sweep: {len(summary)} definitions in {sweep_time:.3f} seconds')
+
+    # time the pandas loop on a few definitions and extrapolate to the grid
+    subset = [(2, 6, 72), (2, 8, 72), (2, 10, 72), (5, 8, 48), (0.5, 2, 168)]
+    start = time.perf_counter()
+    same = True
+    for inc, exp, window in subset:
+        expected = pandas_outcome(scans, inc, exp, window)
+        labels = outcome_labels(sweep, inc, exp, window)
+        row = summary[(summary['inclusion_ml'] == inc) & (summary['expansion_ml'] == exp) & (summary['window_hours'] == window)].iloc[0]
+        same &= expected.sort_index().equals(labels.sort_index().rename(None).rename_axis(expected.index.name))
+        same &= (row['n_patients'] == len(expected)) and (row['n_cases'] == expected.sum())
+    loop_time = (time.perf_counter() - start) / len(subset)
+    print(f'pandas per definition: {loop_time:.3f} seconds, {loop_time * len(summary):.1f} seconds for the grid (estimated)')
+    print('same cohorts and outcomes:', bool(same))
+
+    ties = make_tie_scans(args.n_patients)
+    different = {ml: tie_disagreements(ties, ml) for ml in [6, 8, 10]}
+    print('labels different from expansion_outcome on threshold ties (6, 8, 10 mL):', different)
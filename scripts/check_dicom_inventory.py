@@ -0,0 +1,36 @@
+# Date: 10-19-2026
+# Objective: Check that the DICOM series recorded in the inventory written by scripts/05_abstract_dicom_header.py are
+# still on the share unchanged (same number of CT files, bytes, first/last file and modification time), e.g. before
+# converting them to nifti or after a transfer. Only the recorded series folders are listed (concurrently), not the
+# whole share.
+# Output: data/processed/dicom_inventory_changes.csv (series that changed or are missing)
+#
+# Usage (from NU_TBI/):
+#   python scripts/check_dicom_inventory.py --threads 64
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from nu_tbi.cohort_store import read_table
+from nu_tbi.dicom_inventory import check_inventory
+from nu_tbi.paths import NU_TBI_DIR
+
+parser = argparse.ArgumentParser(description = 'check the DICOM inventory against the share')
+parser.add_argument('--threads', type = int, default = 32)
+args = parser.parse_args()
+
+os.chdir(NU_TBI_DIR)
+
+inventory = read_table('dicom_inventory')
+print('Number of series in the inventory:', inventory['error'].isnull().sum())
+
+changes = check_inventory(inventory, threads = args.threads)
+print('Number of series changed:', (changes['status'] == 'changed').sum())
+print('Number of series missing:', (changes['status'] == 'missing').sum())
+if len(changes):
+    print(changes[['series_dir', 'status', 'n_files', 'total_bytes']].head(20).to_string(index = False))
+
+changes.to_csv('data/processed/dicom_inventory_changes.csv', index = False)
@@ -0,0 +1,67 @@
+# Date: 10-19-2026
+# Objective: Convert the nifti CT volumes (nifti_images/) and blast-ct predictions to the compressed, slice-chunked
+# volume store (see scripts/nu_tbi/volume_store.py) and report the space saved and the read throughput.
+# Stored copies mirror the source paths under data/processed/volume_store/ (e.g. nifti_images/S1/.../P1_2.vol) and are
+# only rewritten when the source file changes. Every stored volume is checked against its source (--no-verify to
+# skip); the source files are not removed.
+# Output: data/processed/volume_store/index.csv (source, stored copy, bytes before/after)
+#
+# Usage (from NU_TBI/):
+#   python scripts/compress_volumes.py --jobs 8
+#   python scripts/compress_volumes.py data/processed/blast_ct_predictions --level 9 --bench 50
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from nu_tbi.paths import NU_TBI_DIR
+from nu_tbi.volume_store import STORE_DIR, CHUNK_SLICES, convert_files, read_throughput
+
+parser = argparse.ArgumentParser(description = 'convert nifti volumes to the compressed volume store')
+parser.add_argument('folders', nargs = '*', default = ['nifti_images', 'data/processed/blast_ct_predictions'],
+                    help = 'folders (relative to NU_TBI/) searched for .nii and .nii.gz files')
+parser.add_argument('--chunk-slices', type = int, default = CHUNK_SLICES, help = 'slices per compressed chunk')
+parser.add_argument('--codec', default = 'zstd', help = 'pyarrow compression codec (zstd, lz4, gzip, brotli)')
+parser.add_argument('--level', type = int, default = 3, help = 'compression level')
+parser.add_argument('--no-verify', action = 'store_true', help = 'do not compare stored volumes with their source')
+parser.add_argument('--bench', type = int, default = 20, help = 'number of files used to measure read throughput (0: skip)')
+parser.add_argument('--jobs', type = int, default = os.cpu_count())
+args = parser.parse_args()
+
+os.chdir(NU_TBI_DIR)
+
+paths = sorted(path for folder in args.folders for pattern in ['*.nii', '*.nii.gz']
+               for path in glob.glob(os.path.join(folder, '**', pattern), recursive = True))
+print('Number of nifti files:', len(paths))
+
+start = time.time()
+index = convert_files(paths, chunk_slices = args.chunk_slices, codec = args.codec, level = args.level,
+                      verify = not args.no_verify, jobs = args.jobs)
+print(f"converted {index['converted'].sum()} files, {(~index['converted'] & index['error'].isnull()).sum()} already "
+      f"up to date, in {(time.time() - start) / 60:.2f} minutes")
+
+errors = index[index['error'].notnull()]
+print('Number of files that could not be converted:', len(errors))
+if len(errors):
+    print(errors[['source', 'error']].head(20).to_string(index = False))
+
+os.makedirs(STORE_DIR, exist_ok = True)
+index.to_csv(os.path.join(STORE_DIR, 'index.csv'), index = False)
+
+## space
+done = index[index['error'].isnull()].copy()
+done['folder'] = done['source'].str.split('/').str[0].where(~done['source'].str.startswith('data/'),
+                                                             done['source'].str.split('/').str[:3].str.join('/'))
+sizes = done.groupby('folder')[['source_bytes', 'stored_bytes']].sum()
+sizes.loc['total'] = sizes.sum()
+sizes['ratio'] = sizes['source_bytes'] / sizes['stored_bytes']
+sizes[['source_GB', 'stored_GB']] = sizes[['source_bytes', 'stored_bytes']] / 1e9
+print(sizes[['source_GB', 'stored_GB', 'ratio']].round(3).to_string())
+
+## read throughput
+if args.bench:
+    print(read_throughput(done, n_files = args.bench).round(1).to_string(index = False))
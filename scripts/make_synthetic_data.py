@@ -0,0 +1,44 @@
+# Date: 10-19-2026
+# Objective: Create a synthetic NU_TBI tree (reports, dicom series, nifti images, blast-ct predictions, manual review
+# workbooks) so the pipeline can be run and profiled without access to /share/hemorrhage_project.
+# See scripts/nu_tbi/synthetic.py for what is generated.
+#
+# Usage:
+#   python scripts/make_synthetic_data.py /tmp/nu_tbi_synthetic --n-studies 1000 --jobs 8
+#   export NU_TBI_DIR=/tmp/nu_tbi_synthetic HEMORRHAGE_PROJECT_DIR=/tmp/nu_tbi_synthetic/hemorrhage_project
+#   cd /tmp/nu_tbi_synthetic && python scripts/run_pipeline.py 01 04 05 06 07 08 09 10 11 12
+#
+# Tables only (no images) scale to 100k studies in about a minute; dicom series take ~1 MB per series at --image-size 64.
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from nu_tbi.synthetic import generate
+
+parser = argparse.ArgumentParser(description = 'generate a synthetic NU_TBI tree')
+parser.add_argument('out_dir', help = 'output directory (used as NU_TBI_DIR)')
+parser.add_argument('--n-studies', type = int, default = 1000, help = 'number of CT studies (1k-100k)')
+parser.add_argument('--seed', type = int, default = 0)
+parser.add_argument('--image-size', type = int, default = 64, help = 'in-plane matrix size of the synthetic images')
+parser.add_argument('--no-dicom', action = 'store_true', help = 'skip writing dicom series')
+parser.add_argument('--no-nifti', action = 'store_true', help = 'skip writing nifti images and label maps')
+parser.add_argument('--jobs', type = int, default = os.cpu_count(), help = 'number of processes writing images')
+args = parser.parse_args()
+
+start = time.time()
+summary = generate(args.out_dir, n_studies = args.n_studies, seed = args.seed, image_size = args.image_size,
+                   dicom = not args.no_dicom, nifti = not args.no_nifti, jobs = args.jobs)
+
+# link the scripts into the synthetic tree so scripts/run_pipeline.py can be run from it
+scripts_link = os.path.join(args.out_dir, 'scripts')
+if not os.path.exists(scripts_link):
+    os.symlink(os.path.dirname(os.path.abspath(__file__)), scripts_link)
+
+for key, value in summary.items():
+    print(f'{key}: {value}')
+print(f'synthetic tree written to {os.path.abspath(args.out_dir)} in {(time.time() - start) / 60:.2f} minutes')
+print(f'export NU_TBI_DIR={os.path.abspath(args.out_dir)} HEMORRHAGE_PROJECT_DIR={os.path.join(os.path.abspath(args.out_dir), "hemorrhage_project")}')
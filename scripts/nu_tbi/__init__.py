@@ -0,0 +1,3 @@
+# Shared helpers for the numbered NU_TBI pipeline scripts in scripts/
+# The numbered scripts cannot be imported (their names start with a digit),
+# so any logic reused across scripts lives in this package.
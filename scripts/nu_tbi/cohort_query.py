@@ -0,0 +1,316 @@
+# Date: 10-19-2026
+# Objective: Answer filter/sort/aggregate queries on the TBI cohort from memory, for interactive review.
+# The cohort (blast-ct volumes, manual review columns and report text, as loaded in scripts/10_tbi_cohort_inclusion.py)
+# is loaded once. Every column except the report text gets a sorted index: the row order that sorts the column and the
+# sorted values (text columns are sorted by their category codes). A range or equality filter is two np.searchsorted
+# calls on the sorted values, and sorting by an indexed column reuses its row order.
+# serve() exposes the queries over a local HTTP/JSON server (scripts/serve_cohort.py).
+#
+# A query is a dict (JSON):
+#   {"filters": [{"column": "change_eah_volume_first_scan", "op": "<=", "value": -10},
+#                {"column": "exclude", "op": "isnull"},
+#                {"column": "report", "op": "contains", "value": "portable"}],
+#    "columns": ["unique_study_id", "id", "eah_predicted_volume_ml", "change_eah_volume_first_scan"],
+#    "sort": [{"column": "change_eah_volume_first_scan", "ascending": true}],
+#    "limit": 100}
+# and, to aggregate the filtered rows (e.g. the per patient maximum volumes, `max_vols` in 10):
+#    "group_by": ["unique_study_id"], "aggregate": {"iph_predicted_volume_ml": "max", "eah_predicted_volume_ml": "max"},
+#    "having": [{"column": "iph_predicted_volume_ml", "op": "==", "value": 0}]
+# ops: ==, !=, <, <=, >, >=, between (value: [low, high], inclusive), in (value: list), isnull, notnull,
+#      contains (case insensitive substring, for text columns)
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+import pandas as pd
+
+from nu_tbi.cohort_store import read_table
+from nu_tbi.workbooks import read_sheet
+
+MANUAL_REVIEW = 'data/processed/manual_review/02_initial_tbi_patient_list_inclusion.xlsx'
+
+# free text columns are filtered with `contains` and are not indexed
+TEXT_COLUMNS = ['report', 'notes', 'radiology_report_exercepts']
+
+OPS = ['==', '!=', '<', '<=', '>', '>=', 'between', 'in', 'isnull', 'notnull', 'contains']
+
+DEFAULT_LIMIT = 1000
+
+
+# load the cohort as in scripts/10_tbi_cohort_inclusion.py (paths relative to NU_TBI/)
+def load_cohort():
+    cohort = read_table('initial_tbi_scans_volumes')
+    reviewed_scans = read_sheet(MANUAL_REVIEW, '02_initial_tbi_patient_list_inc')
+    suid_rad_reports = pd.read_csv('data/processed/suid_rad_reports.csv', usecols = ['unique_study_id', 'report_num_temp', 'report'])
+    cohort = pd.merge(cohort, reviewed_scans, on = 'unique_study_id', how = 'left')
+    cohort = pd.merge(cohort, suid_rad_reports, how = 'left')
+
+    # scans removed during review (`scans_to_exclude`) are kept and flagged so they can be queried
+    scans_to_exclude = read_sheet(MANUAL_REVIEW, 'scans_to_exclude')
+    cohort['scan_excluded'] = cohort['id'].isin(scans_to_exclude['id_to_remove']).astype('int8')
+    return cohort.reset_index(drop = True)
+
+
+# sorted index of one column: (row order, sorted keys, number of non-missing rows, key of each category or None)
+# numbers and datetimes are sorted by value, text/categories by their (sorted) category codes; missing values sort last
+def build_column_index(series):
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        keys = series.to_numpy(dtype = 'float64', na_value = np.nan)
+        categories = None
+    elif pd.api.types.is_datetime64_any_dtype(series):
+        keys = series.to_numpy(dtype = 'datetime64[ns]').astype('int64').astype('float64')
+        keys[series.isna().to_numpy()] = np.nan
+        categories = None
+    else:
+        try:
+            codes, uniques = pd.factorize(series.astype('object'), sort = True)
+        except TypeError:
+            # mixed types (e.g. numbers and text) are ordered as text
+            codes, uniques = pd.factorize(series.astype('object').where(series.isna(), series.astype('str')), sort = True)
+        keys = np.where(codes < 0, np.nan, codes).astype('float64')
+        categories = {value: i for i, value in enumerate(uniques)}
+    order = np.argsort(keys, kind = 'stable')
+    return {'order': order, 'keys': keys[order], 'n_valid': int((~np.isnan(keys)).sum()), 'categories': categories}
+
+
+# load the cohort and index its columns
+def load_state(loader = load_cohort):
+    start = time.perf_counter()
+    cohort = loader()
+    indexes = {col: build_column_index(cohort[col]) for col in cohort.columns if col not in TEXT_COLUMNS}
+    return {'cohort': cohort, 'indexes': indexes, 'loaded': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'load_seconds': round(time.perf_counter() - start, 3)}
+
+
+# convert a query value to the key space of a column index (category code, datetime ns, or number)
+def _key(index, series, value):
+    if index['categories'] is not None:
+        return index['categories'].get(value, index['categories'].get(str(value)))
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return float(pd.Timestamp(value).value)
+    if pd.api.types.is_float_dtype(series):
+        # round to the column's precision first, so 0.1 finds a float32 0.1 (integer columns keep 2.5 as 2.5)
+        return float(series.dtype.type(value))
+    return float(value)
+
+
+# rows (positions) whose key lies in [low, high] (either bound may be None); text keys compare by category order
+def _key_range(index, low, high, low_inclusive = True, high_inclusive = True):
+    keys = index['keys'][:index['n_valid']]
+    start = 0 if low is None else np.searchsorted(keys, low, side = 'left' if low_inclusive else 'right')
+    stop = len(keys) if high is None else np.searchsorted(keys, high, side = 'right' if high_inclusive else 'left')
+    return index['order'][start:max(start, stop)]
+
+
+# category bounds for text ranges: first/last code >= or <= the value in sorted order
+def _category_bound(index, value, side):
+    uniques = list(index['categories'])
+    position = np.searchsorted(np.array(uniques, dtype = 'object'), value, side = side)
+    return float(position)
+
+
+# boolean mask of the rows matching one filter, using the column's sorted index when it has one
+def filter_mask(state, column, op, value = None):
+    cohort = state['cohort']
+    if column not in cohort.columns:
+        raise KeyError(f'unknown column {column!r}')
+    if op not in OPS:
+        raise ValueError(f'unknown op {op!r}, expected one of {OPS}')
+
+    index = state['indexes'].get(column)
+    if index is None or op == 'contains':
+        return series_mask(cohort[column], op, value)
+
+    mask = np.zeros(len(cohort), dtype = bool)
+    if op in ['isnull', 'notnull']:
+        mask[index['order'][index['n_valid']:]] = True
+        return mask if op == 'isnull' else ~mask
+    if op in ['==', '!=', 'in']:
+        for v in (value if op == 'in' else [value]):
+            key = _key(index, cohort[column], v)
+            if key is not None:
+                mask[_key_range(index, key, key)] = True
+        if op != '!=':
+            return mask
+        # missing values never match a comparison (filter them with isnull)
+        mask = ~mask
+        mask[index['order'][index['n_valid']:]] = False
+        return mask
+
+    text = index['categories'] is not None
+    if op == 'between':
+        low, high = value
+        if text:
+            low, high = _category_bound(index, low, 'left'), _category_bound(index, high, 'right') - 1
+        else:
+            low, high = _key(index, cohort[column], low), _key(index, cohort[column], high)
+        mask[_key_range(index, low, high)] = True
+        return mask
+    if text:
+        bound = _category_bound(index, value, 'left' if op in ['>=', '<'] else 'right')
+        if op in ['<', '<=']:
+            mask[_key_range(index, None, bound, high_inclusive = False)] = True
+        else:
+            mask[_key_range(index, bound, None)] = True
+        return mask
+    key = _key(index, cohort[column], value)
+    if op in ['<', '<=']:
+        mask[_key_range(index, None, key, high_inclusive = op == '<=')] = True
+    else:
+        mask[_key_range(index, key, None, low_inclusive = op == '>=')] = True
+    return mask
+
+
+# boolean mask of one filter evaluated directly on a series (text columns, aggregated columns)
+def series_mask(series, op, value = None):
+    if op == 'contains':
+        return series.astype('string').str.contains(str(value), case = False, regex = False).fillna(False).to_numpy(dtype = bool)
+    if op == 'isnull':
+        return series.isna().to_numpy()
+    if op == 'notnull':
+        return series.notna().to_numpy()
+    if op == 'in':
+        return series.isin(value).to_numpy()
+    if op == 'between':
+        return series.between(value[0], value[1]).to_numpy(dtype = bool)
+    compare = {'==': series.eq, '!=': series.ne, '<': series.lt, '<=': series.le, '>': series.gt, '>=': series.ge}[op]
+    return (compare(value).fillna(False) & series.notna()).to_numpy(dtype = bool)
+
+
+# run a query; returns a dict with the matching row count, the (limited) rows as records and the elapsed milliseconds
+def run_query(state, query):
+    start = time.perf_counter()
+    cohort = state['cohort']
+
+    mask = np.ones(len(cohort), dtype = bool)
+    # text filters are evaluated last, on the rows left by the indexed filters
+    filters = sorted(query.get('filters', []), key = lambda f: f['column'] in TEXT_COLUMNS or f['op'] == 'contains')
+    for f in filters:
+        if f['column'] in TEXT_COLUMNS or f['op'] == 'contains':
+            if f['column'] not in cohort.columns:
+                raise KeyError(f"unknown column {f['column']!r}")
+            rows = np.flatnonzero(mask)
+            mask[rows] = series_mask(cohort[f['column']].iloc[rows], f['op'], f.get('value'))
+        else:
+            mask &= filter_mask(state, f['column'], f['op'], f.get('value'))
+
+    sort = query.get('sort', [])
+    if isinstance(sort, dict):
+        sort = [sort]
+
+    if query.get('group_by'):
+        group_by = query['group_by'] if isinstance(query['group_by'], list) else [query['group_by']]
+        aggregate = query.get('aggregate', {'id': 'count'})
+        result = cohort.loc[mask].groupby(group_by, observed = True, dropna = False).agg(aggregate).reset_index()
+        for f in query.get('having', []):
+            result = result[series_mask(result[f['column']], f['op'], f.get('value'))]
+        if sort:
+            result = result.sort_values([s['column'] for s in sort], ascending = [s.get('ascending', True) for s in sort],
+                                        na_position = 'last')
+    elif len(sort) == 1 and sort[0]['column'] in state['indexes']:
+        # rows in the order of the column index, missing values last
+        index = state['indexes'][sort[0]['column']]
+        order = index['order'][mask[index['order']]]
+        if not sort[0].get('ascending', True):
+            valid = int(mask[index['order'][:index['n_valid']]].sum())
+            order = np.concatenate([order[:valid][::-1], order[valid:]])
+        result = cohort.iloc[order]
+    else:
+        result = cohort.loc[mask]
+        if sort:
+            result = result.sort_values([s['column'] for s in sort], ascending = [s.get('ascending', True) for s in sort],
+                                        na_position = 'last', kind = 'stable')
+
+    if query.get('columns'):
+        result = result[query['columns']]
+    n_rows = len(result)
+    limit = query.get('limit', DEFAULT_LIMIT)
+    if limit is not None:
+        result = result.iloc[:limit]
+    return {'n_rows': n_rows,
+            'rows': json.loads(result.to_json(orient = 'records', date_format = 'iso')),
+            'elapsed_ms': round((time.perf_counter() - start) * 1000, 3)}
+
+
+# column names, types and number of missing values
+def describe_columns(state):
+    cohort = state['cohort']
+    return [{'column': col, 'dtype': str(cohort[col].dtype), 'n_missing': int(cohort[col].isna().sum()),
+             'indexed': col in state['indexes']} for col in cohort.columns]
+
+
+# serve queries on host:port until interrupted
+#   GET  /columns          column names and types
+#   GET  /status           number of rows and when the cohort was loaded
+#   POST /query            query in the request body; GET /query?q=<json> also works
+#   POST /reload           reload the cohort from disk (e.g. after updating the manual review workbook)
+# bind to localhost only: the cohort includes report text
+def serve(host = '127.0.0.1', port = 8050, loader = load_cohort):
+    state = {'current': load_state(loader)}
+    reload_lock = threading.Lock()
+    print(f"loaded {len(state['current']['cohort'])} rows in {state['current']['load_seconds']} seconds")
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def _send(self, status, body):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _handle(self, path, query):
+            current = state['current']
+            if path == '/columns':
+                return describe_columns(current)
+            if path == '/status':
+                return {'n_rows': len(current['cohort']), 'loaded': current['loaded'], 'load_seconds': current['load_seconds']}
+            if path == '/query':
+                return run_query(current, query)
+            if path == '/reload':
+                with reload_lock:
+                    state['current'] = load_state(loader)
+                return {'n_rows': len(state['current']['cohort']), 'load_seconds': state['current']['load_seconds']}
+            raise LookupError(path)
+
+        def _dispatch(self, query):
+            path = urlparse(self.path).path
+            try:
+                self._send(200, self._handle(path, query))
+            except LookupError as e:
+                self._send(404 if str(e) == path else 400, {'error': f'{type(e).__name__}: {e}'})
+            except (ValueError, TypeError) as e:
+                self._send(400, {'error': f'{type(e).__name__}: {e}'})
+            except Exception as e:
+                # any other failure still gets a JSON reply instead of a dropped connection
+                self._send(500, {'error': f'{type(e).__name__}: {e}'})
+
+        def do_GET(self):
+            params = parse_qs(urlparse(self.path).query)
+            try:
+                query = json.loads(params['q'][0]) if 'q' in params else {}
+            except json.JSONDecodeError as e:
+                return self._send(400, {'error': f'invalid query: {e}'})
+            self._dispatch(query)
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            try:
+                query = json.loads(self.rfile.read(length) or b'{}')
+            except json.JSONDecodeError as e:
+                return self._send(400, {'error': f'invalid query: {e}'})
+            self._dispatch(query)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    print(f'serving cohort queries on http://{host}:{port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
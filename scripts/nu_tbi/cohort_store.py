@@ -0,0 +1,74 @@
+# Date: 10-19-2026
+# Objective: Typed, columnar (parquet) storage for the intermediate tables passed between scripts 08 -> 09 -> 10/11 -> 12.
+# Each table is registered with its path and column types: identifiers/paths are stored as categories and scan times as
+# native timestamps, so the next script does not need to re-parse csv text or dates. blast-ct volumes and volume changes
+# stay float64: they are compared with outcome thresholds and written back to csv, where float32 rounding would show.
+# Readers can request only the columns they use (column projection).
+# Note: requires pyarrow (pip install pyarrow)
+
+import pandas as pd
+
+# identifiers and file paths with many repeated values
+CATEGORY_COLUMNS = ['id', 'report_num_temp', 'folder', 'image_name', 'image', 'prediction',
+                    'atlas_in_native_space', 'brain_mask_native_space', 'compartment', 'region',
+                    'surgery_type', 'injury']
+
+DATETIME_COLUMNS = ['StudyDate_Time_format', 'first_scan_time']
+
+# table name -> path (relative to NU_TBI/) and column types
+SCHEMAS = {}
+
+
+# add a table to the registry
+def register_table(name, path, category = CATEGORY_COLUMNS, datetime = DATETIME_COLUMNS):
+    SCHEMAS[name] = {'path': path,
+                     'category': list(category),
+                     'datetime': list(datetime)}
+
+
+register_table('dicom_inventory', 'data/processed/dicom_inventory.parquet', category = ['root'])
+register_table('prepped_predictions', 'data/processed/prepped_predictions.parquet')
+register_table('initial_tbi_scans_volumes', 'data/processed/tbi_cohort/0_initial_tbi_scans_volumes_v3.parquet')
+register_table('initial_tbi_scans_regional_volumes', 'data/processed/tbi_cohort/0_initial_tbi_scans_regional_volumes_v3.parquet')
+register_table('tbi_data_first_scan', 'data/modeling/tbi_data_first_scan_v3.parquet')
+register_table('tbi_data_all_scans', 'data/modeling/tbi_data_all_scans_v3.parquet')
+register_table('tbi_data_all_scans_regional', 'data/modeling/tbi_data_all_scans_regional_v3.parquet')
+register_table('lesion_features', 'data/modeling/lesion_features_v1.parquet')
+register_table('registered_expansion', 'data/modeling/registered_expansion_v1.parquet')
+for split in ['X_train', 'y_train', 'X_test', 'y_test']:
+    register_table(split + '_id', 'data/modeling/model1_structured_radiographic/' + split + '_id_v4.parquet')
+    register_table(split, 'data/modeling/model1_structured_radiographic/' + split + '_v4.parquet')
+
+
+# return the registered path of a table
+def table_path(name):
+    if name not in SCHEMAS:
+        raise KeyError(f'{name} is not a registered table. Registered tables: {sorted(SCHEMAS)}')
+    return SCHEMAS[name]['path']
+
+
+# convert the columns of dataframe to the types registered for the table
+# columns that are not in the schema keep their current type
+def apply_schema(dataframe, name):
+    schema = SCHEMAS[name]
+    dataframe = dataframe.copy()
+
+    for col in dataframe.columns:
+        if col in schema['datetime']:
+            dataframe[col] = pd.to_datetime(dataframe[col])
+        elif col in schema['category']:
+            dataframe[col] = dataframe[col].astype('category')
+    return dataframe
+
+
+# write a registered table to parquet (the index is kept, e.g. for the X/y splits)
+def write_table(dataframe, name, path = None):
+    path = path or table_path(name)
+    apply_schema(dataframe, name).to_parquet(path, engine = 'pyarrow', compression = 'zstd')
+    return path
+
+
+# read a registered table; `columns` restricts the read to the listed columns
+def read_table(name, columns = None, path = None):
+    path = path or table_path(name)
+    return pd.read_parquet(path, engine = 'pyarrow', columns = columns)
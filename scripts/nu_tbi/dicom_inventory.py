@@ -0,0 +1,91 @@
+# Date: 10-19-2026
+# Objective: Inventory of the DICOM series (folders with CT.* files) under each scan folder of the TBI cohort.
+# The scan folders are on a network share where every directory listing waits on the server, so directories are
+# listed with os.scandir (one call per directory, file sizes from the same listing) by a thread pool that keeps many
+# listings in flight; subdirectories are queued as soon as their parent has been listed.
+# Each series is one row: series_dir, scan folder (root), number of CT.* files, total bytes, first and last file name
+# (sorted) and the latest modification time. The inventory is saved by scripts/05_abstract_dicom_header.py to
+# INVENTORY_PATH (and a typed parquet copy, table 'dicom_inventory') and reused instead of listing the share again;
+# check_inventory re-lists the recorded series to find ones that changed or disappeared.
+#
+#   inventory = crawl(tbi_scan_list['file_path'], threads = 32)
+
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+# relative to NU_TBI/
+INVENTORY_PATH = 'data/processed/dicom_inventory.csv'
+
+PREFIX = 'CT.'
+
+COLUMNS = ['root', 'series_dir', 'n_files', 'total_bytes', 'first_file', 'last_file', 'latest_mtime', 'error']
+
+
+# list one directory; returns (series row or None, subdirectories)
+# the row describes the CT.* files directly in the directory (None if there are none)
+def scan_directory(path, root):
+    names, total, latest, subdirs = [], 0, 0.0, []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks = False):
+                    subdirs.append(entry.path)
+                elif entry.name.startswith(PREFIX) and entry.is_file():
+                    stat = entry.stat()
+                    names.append(entry.name)
+                    total += stat.st_size
+                    latest = max(latest, stat.st_mtime)
+    except OSError as e:
+        return {'root': root, 'series_dir': path, 'n_files': 0, 'total_bytes': 0, 'first_file': None, 'last_file': None,
+                'latest_mtime': np.nan, 'error': f'{type(e).__name__}: {e}'}, []
+
+    if not names:
+        return None, subdirs
+    names.sort()
+    return {'root': root, 'series_dir': path, 'n_files': len(names), 'total_bytes': total, 'first_file': names[0],
+            'last_file': names[-1], 'latest_mtime': latest, 'error': None}, subdirs
+
+
+# every series under the given scan folders; folders are listed by `threads` threads
+# a folder that cannot be listed (e.g. missing) is a row with an error and no files
+def crawl(roots, threads = 32):
+    rows = []
+    with ThreadPoolExecutor(max_workers = threads) as pool:
+        # future -> scan folder it belongs to
+        pending = {pool.submit(scan_directory, root, root): root for root in dict.fromkeys(roots)}
+        while pending:
+            done, _ = wait(pending, return_when = FIRST_COMPLETED)
+            for future in done:
+                root = pending.pop(future)
+                row, subdirs = future.result()
+                if row is not None:
+                    rows.append(row)
+                for subdir in subdirs:
+                    pending[pool.submit(scan_directory, subdir, root)] = root
+    return pd.DataFrame(rows, columns = COLUMNS).sort_values('series_dir', ignore_index = True)
+
+
+# re-list the series of an inventory (not their subdirectories); returns the rows whose file count, bytes, first/last
+# file or modification time differ from the inventory, with a `status` column ('changed' or 'missing')
+def check_inventory(inventory, threads = 32):
+    series = inventory[inventory['error'].isnull()]
+    with ThreadPoolExecutor(max_workers = threads) as pool:
+        current = list(pool.map(lambda row: scan_directory(row[1], row[0])[0], zip(series['root'], series['series_dir'])))
+
+    changed = []
+    fields = ['n_files', 'total_bytes', 'first_file', 'last_file', 'latest_mtime']
+    for old, new in zip(series.to_dict('records'), current):
+        if new is None or new['error'] is not None:
+            changed.append(dict(old, status = 'missing'))
+        elif any(old[field] != new[field] for field in fields):
+            changed.append(dict(new, status = 'changed'))
+    return pd.DataFrame(changed, columns = COLUMNS + ['status'])
+
+
+# paths of the first CT file of every series (the file whose header is read for the series)
+def first_files(inventory):
+    series = inventory[inventory['error'].isnull() & (inventory['n_files'] > 0)]
+    return (series['series_dir'] + '/' + series['first_file']).tolist()
@@ -0,0 +1,117 @@
+# Date: 10-19-2026
+# Objective: Read a DICOM series into an int16 volume and nifti affine in memory, without converting it with dcm2niix
+# and reading the .nii back.
+# Slices are read with pydicom (a thread pool hides the latency of the network share), sorted along the slice normal
+# (ImagePositionPatient projected on the cross product of the ImageOrientationPatient row and column directions), and
+# converted to HU with RescaleSlope/RescaleIntercept. The volume is indexed (column, row, slice) like dcm2niix output,
+# and the affine maps it to RAS+ world coordinates (DICOM patient coordinates are LPS+). The slice axis of the affine
+# is the step between consecutive ImagePositionPatient, so gantry tilted series keep their true geometry (a sheared
+# affine) instead of being resliced.
+#
+#   image = series_image('hemorrhage_project/.../2_Head_Routine_5.0_H41s')   # nibabel image, nothing written
+#   data, affine, info = read_series(directory)
+#   save_nifti(image, 'nifti_images/.../P1_2.nii')                          # optional, for archiving
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import nibabel as nib
+import numpy as np
+import pydicom
+
+from nu_tbi.staging import stage
+
+PREFIX = 'CT.'
+
+# relative difference between slice gaps above which a series is reported as irregularly spaced
+SPACING_TOLERANCE = 0.01
+
+LPS_TO_RAS = np.diag([-1.0, -1.0, 1.0, 1.0])
+
+
+# CT.* files of a series folder
+def series_files(directory):
+    with os.scandir(directory) as entries:
+        return sorted(entry.path for entry in entries if entry.name.startswith(PREFIX) and entry.is_file())
+
+
+# read the slices of a series (through the local staging cache) and sort them along the slice normal
+def read_slices(files, threads = 8):
+    with ThreadPoolExecutor(max_workers = threads) as pool:
+        slices = list(pool.map(lambda path: pydicom.dcmread(stage(path)), files))
+    if not slices:
+        raise ValueError('no slices')
+
+    orientation = np.array(slices[0].ImageOrientationPatient, dtype = 'float64')
+    for ds in slices:
+        if not np.allclose(np.array(ds.ImageOrientationPatient, dtype = 'float64'), orientation, atol = 1e-4):
+            raise ValueError('slices have different orientations')
+        if (ds.Rows, ds.Columns) != (slices[0].Rows, slices[0].Columns):
+            raise ValueError('slices have different sizes')
+
+    normal = np.cross(orientation[:3], orientation[3:])
+    position = np.array([ds.ImagePositionPatient for ds in slices], dtype = 'float64')
+    distance = position @ normal
+    order = np.argsort(distance, kind = 'stable')
+    if len(order) > 1 and np.any(np.diff(distance[order]) < 1e-3):
+        raise ValueError('slices with the same position (more than one acquisition in the folder?)')
+    return [slices[i] for i in order], position[order], orientation
+
+
+# volume (int16 HU, indexed column, row, slice), affine (RAS+) and series information of a DICOM series
+# `files` defaults to the CT.* files in `directory`
+def read_series(directory = None, files = None, threads = 8):
+    files = files if files is not None else series_files(directory)
+    slices, position, orientation = read_slices(files, threads = threads)
+    first = slices[0]
+
+    data = np.empty((first.Columns, first.Rows, len(slices)), dtype = 'int16')
+    for k, ds in enumerate(slices):
+        hu = ds.pixel_array.astype('float32') * float(getattr(ds, 'RescaleSlope', 1)) + float(getattr(ds, 'RescaleIntercept', 0))
+        data[:, :, k] = np.clip(np.rint(hu), -32768, 32767).T
+
+    # LPS affine: columns of the array step along the row direction, rows along the column direction
+    row_spacing, column_spacing = (float(s) for s in first.PixelSpacing)
+    normal = np.cross(orientation[:3], orientation[3:])
+    affine = np.eye(4)
+    affine[:3, 0] = orientation[:3] * column_spacing
+    affine[:3, 1] = orientation[3:] * row_spacing
+    if len(slices) > 1:
+        steps = np.diff(position, axis = 0)
+        affine[:3, 2] = (position[-1] - position[0]) / (len(slices) - 1)
+        gaps = np.linalg.norm(steps, axis = 1)
+        irregular = bool(np.ptp(gaps) > SPACING_TOLERANCE * gaps.mean())
+    else:
+        affine[:3, 2] = normal * float(getattr(first, 'SliceThickness', 1) or 1)
+        irregular = False
+    affine[:3, 3] = position[0]
+
+    # the slices of a gantry tilted series are not stacked along their normal
+    slice_step = float(np.linalg.norm(affine[:3, 2]))
+    info = {'n_slices': len(slices), 'shape': data.shape,
+            'spacing': [column_spacing, row_spacing, slice_step],
+            'irregular_spacing': irregular,
+            'tilted': bool(abs(affine[:3, 2] @ normal) < (1 - 1e-4) * slice_step),
+            'PatientID': str(getattr(first, 'PatientID', '')),
+            'SeriesNumber': getattr(first, 'SeriesNumber', None),
+            'SeriesDescription': str(getattr(first, 'SeriesDescription', ''))}
+    return data, LPS_TO_RAS @ affine, info
+
+
+# nibabel image of a DICOM series, built in memory
+def series_image(directory = None, files = None, threads = 8):
+    data, affine, _ = read_series(directory, files = files, threads = threads)
+    return nib.Nifti1Image(data, affine)
+
+
+# nifti file name dcm2niix would use in scripts/process_nifti.sh (-f %i_%s: patient id and series number)
+def nifti_name(info):
+    return f"{info['PatientID']}_{info['SeriesNumber']}.nii"
+
+
+# save an image as nifti (only needed for archiving; readers can use series_image directly)
+def save_nifti(image, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok = True)
+    tmp = path.replace('.nii', '.tmp.nii')
+    nib.save(image, tmp)
+    os.replace(tmp, path)
@@ -0,0 +1,190 @@
+# Date: 10-19-2026
+# Objective: Find CT series that are copies or near copies of each other (the same series transferred twice, the same
+# scan listed under two reports or folders) before they are sent to blast-ct, so each is segmented once.
+# The fingerprint of a volume is its geometry (shape, voxel axes of the affine, rounded) and a signature of GRID blocks:
+# the mean and the standard deviation of the HU values (clipped to HU_RANGE) in each block, quantized to one byte each.
+# The standard deviations keep reconstructions of the same acquisition with a different kernel (e.g. H41s vs H60s,
+# similar means but different noise) apart; tilt corrected copies have a different affine and so a different geometry.
+# Volumes with the same geometry whose block means and block standard deviations all agree within MEAN_TOLERANCE and
+# STD_TOLERANCE HU are candidates. A candidate pair is a duplicate when the digests of their voxel values (clipped to
+# HU_RANGE) are equal, or otherwise when at most DIFFERENT_VOXELS of their clipped voxels differ by more than
+# VOXEL_TOLERANCE HU (both volumes are read again). The block signature alone would not separate a follow-up scan from
+# its first scan when the only change is a small lesion. Clusters are the connected groups of duplicates.
+#
+# scripts/07_prepare_blast_ct.py fingerprints every nifti image (the same pass finds the 4D images it removes), writes
+# only the first image of each cluster to the blast-ct batches and saves DUPLICATES_PATH (id, image -> representative
+# id and image). scripts/08_prepare_predictions.py gives each duplicate a copy of its representative's prediction row.
+#
+#   fingerprints = fingerprint_files(ct_df, jobs = 8)
+#   clusters = find_duplicates(fingerprints)
+
+import base64
+import functools
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from sklearn.neighbors import NearestNeighbors
+
+from nu_tbi.volume_store import load_image
+
+# relative to NU_TBI/
+FINGERPRINT_PATH = 'data/processed/series_fingerprints.csv'
+DUPLICATES_PATH = 'data/processed/duplicate_series.csv'
+
+GRID = (8, 8, 8)
+HU_RANGE = (-100, 300)
+# HU per quantization step of the block standard deviations
+STD_STEP = 1.0
+
+MEAN_TOLERANCE = 2.0
+STD_TOLERANCE = 2.0
+VOXEL_TOLERANCE = 1.0
+DIFFERENT_VOXELS = 0
+
+COLUMNS = ['id', 'image', 'source_size', 'source_mtime_ns', 'shape', 'geometry', 'signature', 'digest', 'error']
+
+
+# block means and standard deviations of a volume over GRID (blocks of nearly equal size)
+def block_stats(data, grid = GRID):
+    data = np.clip(np.asarray(data, dtype = 'float32'), *HU_RANGE).astype('float64')
+    sums, squares, lengths = data, data * data, []
+    for axis, n in enumerate(grid):
+        edges = np.linspace(0, data.shape[axis], min(n, data.shape[axis]) + 1).astype('int64')
+        sums = np.add.reduceat(sums, edges[:-1], axis = axis)
+        squares = np.add.reduceat(squares, edges[:-1], axis = axis)
+        lengths.append(np.diff(edges))
+    counts = functools.reduce(np.multiply.outer, lengths)
+    means = sums / counts
+    stds = np.sqrt(np.maximum(squares / counts - means * means, 0))
+    return means, stds
+
+
+# voxel values clipped to HU_RANGE and rounded
+def _clipped(data):
+    return np.rint(np.clip(np.asarray(data, dtype = 'float32'), *HU_RANGE)).astype('int16')
+
+
+# True if two images have at most DIFFERENT_VOXELS clipped voxels differing by more than VOXEL_TOLERANCE HU
+def same_voxels(path_a, path_b, tolerance = VOXEL_TOLERANCE, different = DIFFERENT_VOXELS):
+    a, b = (_clipped(np.asanyarray(load_image(path).dataobj)) for path in [path_a, path_b])
+    return a.shape == b.shape and int((np.abs(a.astype('int32') - b) > tolerance).sum()) <= different
+
+
+# quantize block statistics to one byte each (means over HU_RANGE, standard deviations in STD_STEP HU)
+def quantize(means, stds):
+    low, high = HU_RANGE
+    q_means = np.rint((means - low) / (high - low) * 255)
+    q_stds = np.rint(stds / STD_STEP)
+    return np.clip(np.concatenate([q_means.ravel(), q_stds.ravel()]), 0, 255).astype('uint8')
+
+
+# fingerprint of one volume; 4D images and unreadable files get no signature
+def fingerprint(task):
+    result = {'id': task['id'], 'image': task['image'], 'source_size': None, 'source_mtime_ns': None, 'shape': None,
+              'geometry': None, 'signature': None, 'digest': None, 'error': None}
+    try:
+        stat = os.stat(task['image'])
+        result.update({'source_size': stat.st_size, 'source_mtime_ns': stat.st_mtime_ns})
+        image = load_image(task['image'])
+        result['shape'] = 'x'.join(str(n) for n in image.shape)
+        if len(image.shape) != 3:
+            return result
+        axes = np.round(image.affine[:3, :3], 2) + 0.0
+        result['geometry'] = result['shape'] + '|' + ','.join(f'{v:g}' for v in axes.ravel())
+        data = np.asanyarray(image.dataobj)
+        signature = quantize(*block_stats(data))
+        result['signature'] = base64.b64encode(signature.tobytes()).decode()
+        result['digest'] = hashlib.sha1(result['geometry'].encode() + _clipped(data).tobytes()).hexdigest()
+    except Exception as e:
+        result['error'] = f'{type(e).__name__}: {e}'
+    return result
+
+
+# fingerprints of the images of `scans` (id, image) in a process pool
+# rows of `previous` (an earlier result) are reused for images whose size and modification time are unchanged
+def fingerprint_files(scans, previous = None, jobs = 1):
+    reuse = {}
+    if previous is not None and len(previous):
+        for row in previous[previous['error'].isnull()].to_dict('records'):
+            reuse[row['image']] = row
+
+    results, tasks = {}, []
+    for row in scans[['id', 'image']].to_dict('records'):
+        old = reuse.get(row['image'])
+        if old is not None:
+            try:
+                stat = os.stat(row['image'])
+                if old['source_size'] == stat.st_size and old['source_mtime_ns'] == stat.st_mtime_ns:
+                    results[row['id']] = dict(old, id = row['id'])
+                    continue
+            except OSError:
+                pass
+        tasks.append(row)
+
+    if jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers = jobs) as pool:
+            computed = list(pool.map(fingerprint, tasks, chunksize = max(1, len(tasks) // (jobs * 8))))
+    else:
+        computed = [fingerprint(task) for task in tasks]
+    results.update({row['id']: row for row in computed})
+    return pd.DataFrame([results[i] for i in scans['id']], columns = COLUMNS)
+
+
+# decoded signatures (rows) as block means and standard deviations in HU
+def _signatures(encoded):
+    raw = np.stack([np.frombuffer(base64.b64decode(s), dtype = 'uint8') for s in encoded]).astype('float64')
+    half = raw.shape[1] // 2
+    low, high = HU_RANGE
+    return raw[:, :half] * (high - low) / 255 + low, raw[:, half:] * STD_STEP
+
+
+# cluster near duplicate volumes; returns fingerprints with cluster, representative (id and image of the first row of
+# its cluster) and cluster_size. Volumes without a signature are their own cluster
+def find_duplicates(fingerprints, mean_tolerance = MEAN_TOLERANCE, std_tolerance = STD_TOLERANCE):
+    n = len(fingerprints)
+    rows, cols = [], []
+    valid = fingerprints['signature'].notnull().to_numpy()
+    for _, group in fingerprints[valid].groupby('geometry', sort = False):
+        if len(group) < 2:
+            continue
+        positions = fingerprints.index.get_indexer(group.index)
+        means, stds = _signatures(group['signature'])
+        # candidates by block means (largest block difference), then checked on block standard deviations
+        neighbors = NearestNeighbors(radius = mean_tolerance, metric = 'chebyshev', algorithm = 'brute').fit(means)
+        for i, found in enumerate(neighbors.radius_neighbors(means, return_distance = False)):
+            found = found[found > i]
+            close = found[np.abs(stds[found] - stds[i]).max(axis = 1) <= std_tolerance]
+            for j in close:
+                a, b = group.iloc[i], group.iloc[j]
+                if a['digest'] == b['digest'] or same_voxels(a['image'], b['image']):
+                    rows.append(positions[i])
+                    cols.append(positions[j])
+
+    graph = coo_matrix((np.ones(len(rows)), (rows, cols)), shape = (n, n))
+    _, labels = connected_components(graph, directed = False)
+    # number clusters by their first row, whose image is the representative
+    first = pd.Series(np.arange(n)).groupby(labels).transform('min').to_numpy()
+    clusters = fingerprints.copy()
+    clusters['cluster'] = pd.factorize(first)[0]
+    clusters['representative_id'] = fingerprints['id'].to_numpy()[first]
+    clusters['representative_image'] = fingerprints['image'].to_numpy()[first]
+    clusters['cluster_size'] = np.bincount(labels)[labels]
+    return clusters
+
+
+# prediction rows for duplicate images: a copy of the representative's row with the duplicate's id and image
+# `duplicates` has id, image and representative_id (DUPLICATES_PATH)
+def expand_predictions(predictions, duplicates):
+    if duplicates is None or not len(duplicates):
+        return predictions
+    by_id = predictions.drop_duplicates('id').set_index('id', drop = False)
+    duplicates = duplicates[duplicates['representative_id'].isin(by_id.index) & ~duplicates['id'].isin(by_id.index)]
+    copies = by_id.loc[duplicates['representative_id']].reset_index(drop = True)
+    copies['id'] = duplicates['id'].to_numpy()
+    copies['image'] = duplicates['image'].to_numpy()
+    return pd.concat([predictions, copies], ignore_index = True)
@@ -0,0 +1,49 @@
+# Date: 10-19-2026
+# Objective: Content hashes of files and folders, shared by the pipeline runner (nu_tbi/runner.py, which skips stages
+# whose inputs are unchanged) and the caches keyed by the files they were built from (workbook snapshots, resampled
+# volumes, registrations). `cache` (path -> [size, mtime_ns, digest]) avoids re-reading unchanged files.
+
+import hashlib
+import os
+
+
+# hash a file's content; `cache` maps path -> [size, mtime_ns, digest] so unchanged files are not re-read
+def file_digest(path, cache):
+    stat = os.stat(path)
+    cached = cache.get(path)
+    if cached is not None and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+        return cached[2]
+    digest = hashlib.blake2b(digest_size = 16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    cache[path] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+    return cache[path][2]
+
+
+# hash a folder from the relative path, size and modification time of every file in it
+# (folders such as nifti_images/ are too large to hash by content)
+def folder_digest(path):
+    digest = hashlib.blake2b(digest_size = 16)
+    stack = [path]
+    entries = []
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks = False):
+                    stack.append(entry.path)
+                else:
+                    stat = entry.stat()
+                    entries.append(f'{os.path.relpath(entry.path, path)}|{stat.st_size}|{stat.st_mtime_ns}')
+    for line in sorted(entries):
+        digest.update(line.encode())
+    return digest.hexdigest()
+
+
+# hash a file or folder; missing paths hash to None
+def path_digest(path, cache):
+    if os.path.isdir(path):
+        return folder_digest(path)
+    if os.path.isfile(path):
+        return file_digest(path, cache)
+    return None
@@ -0,0 +1,152 @@
+# Date: 10-19-2026
+# Objective: Record timing, memory and throughput for pipeline stages and their inner loops.
+# Wrap a stage or loop with `span` (context manager) or `timed` (decorator). Each span records wall time, CPU time,
+# peak resident memory, number of items processed (items/sec) and bytes read, prints a one-line summary, and appends a
+# JSON line to RUN_LOG. scripts/summarize_runs.py compares spans across runs.
+#
+#   with span('05 abstract dicom header') as s:
+#       for path in paths:
+#           ...
+#           s.add(items = 1, bytes_read = os.path.getsize(path))
+
+import functools
+import json
+import os
+import resource
+import socket
+import sys
+import time
+from datetime import datetime
+
+RUN_LOG = 'data/processed/pipeline_logs/run_log.jsonl'
+
+# all spans written by one pipeline run share a run id (scripts/run_pipeline.py sets NU_TBI_RUN_ID for every stage)
+RUN_ID = os.environ.get('NU_TBI_RUN_ID') or datetime.now().strftime('%Y%m%d_%H%M%S') + f'_{os.getpid()}'
+
+_open_spans = []
+
+
+# peak resident memory of this process in MB (ru_maxrss is in KB on Linux and bytes on macOS)
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+# bytes read from storage by this process so far (Linux only; None elsewhere)
+def process_read_bytes():
+    try:
+        with open('/proc/self/io') as f:
+            for line in f:
+                if line.startswith('read_bytes:'):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+class Span:
+    def __init__(self, name, items = None, bytes_read = None, log_path = RUN_LOG, quiet = False):
+        self.name = name
+        self.items = items
+        self.bytes_read = bytes_read
+        self.log_path = log_path
+        self.quiet = quiet
+        self.record = None
+
+    # count items processed (e.g. files, series, scans) and bytes read inside the span
+    def add(self, items = 0, bytes_read = 0):
+        self.items = (self.items or 0) + items
+        self.bytes_read = (self.bytes_read or 0) + bytes_read
+
+    def __enter__(self):
+        self.parent = _open_spans[-1].name if _open_spans else None
+        _open_spans.append(self)
+        self.start_wall = time.perf_counter()
+        self.start_cpu = time.process_time()
+        self.start_io = process_read_bytes()
+        self.started = datetime.now().isoformat(timespec = 'seconds')
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self.start_wall
+        cpu = time.process_time() - self.start_cpu
+        end_io = process_read_bytes()
+        _open_spans.remove(self)
+
+        self.record = {
+            'run_id': RUN_ID,
+            'script': os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else None,
+            'span': self.name,
+            'parent': self.parent,
+            'host': socket.gethostname(),
+            'started': self.started,
+            'wall_seconds': round(wall, 4),
+            'cpu_seconds': round(cpu, 4),
+            'peak_rss_mb': round(peak_rss_mb(), 1),
+            'items': self.items,
+            'items_per_second': round(self.items / wall, 2) if self.items and wall > 0 else None,
+            'bytes_read': self.bytes_read,
+            'storage_bytes_read': end_io - self.start_io if end_io is not None and self.start_io is not None else None,
+            'status': 'error' if exc_type is not None else 'ok',
+        }
+
+        if not self.quiet:
+            message = f"{self.name} completed in {wall / 60:.2f} minutes (cpu {cpu / 60:.2f} minutes, peak memory {self.record['peak_rss_mb']} MB"
+            if self.record['items_per_second'] is not None:
+                message += f", {self.record['items_per_second']} items/sec"
+            print(message + ')')
+
+        if self.log_path:
+            os.makedirs(os.path.dirname(self.log_path) or '.', exist_ok = True)
+            with open(self.log_path, 'a') as f:
+                f.write(json.dumps(self.record) + '\n')
+        return False
+
+
+# context manager for timing a block of code
+def span(name, items = None, bytes_read = None, log_path = RUN_LOG, quiet = False):
+    return Span(name, items = items, bytes_read = bytes_read, log_path = log_path, quiet = quiet)
+
+
+# decorator for timing every call to a function
+def timed(name = None, log_path = RUN_LOG):
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name or function.__name__, log_path = log_path, quiet = True):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# load the run log as a dataframe
+def load_run_log(log_path = RUN_LOG):
+    import pandas as pd
+    return pd.read_json(log_path, lines = True)
+
+
+# compare spans across runs: one row per span, one column per run and metric
+# repeated spans within a run (e.g. a timed function) are summed; items/sec is recomputed from the totals
+# by default the two most recent runs are compared
+def compare_runs(log = None, run_ids = None):
+    import pandas as pd
+    log = load_run_log() if log is None else log
+    if run_ids is None:
+        run_ids = list(log.groupby('run_id')['started'].min().sort_values().index[-2:])
+    log = log[log['run_id'].isin(run_ids)]
+
+    grouped = log.groupby(['span', 'run_id'])
+    summary = pd.DataFrame({'calls': grouped.size(),
+                            'wall_seconds': grouped['wall_seconds'].sum(),
+                            'cpu_seconds': grouped['cpu_seconds'].sum(),
+                            'peak_rss_mb': grouped['peak_rss_mb'].max(),
+                            'items': grouped['items'].sum(min_count = 1),
+                            'bytes_read': grouped['bytes_read'].sum(min_count = 1)})
+    summary['items_per_second'] = summary['items'] / summary['wall_seconds']
+    summary = summary.unstack('run_id')
+    summary = summary.reindex(columns = pd.MultiIndex.from_product([list(summary.columns.levels[0]), run_ids]))
+
+    if len(run_ids) == 2:
+        before, after = run_ids
+        summary[('wall_seconds', 'ratio')] = summary[('wall_seconds', after)] / summary[('wall_seconds', before)]
+    return summary.sort_index(axis = 1, level = 0, sort_remaining = False)
@@ -0,0 +1,139 @@
+# Date: 10-19-2026
+# Objective: Joins with a declared cardinality, used by scripts 01, 04 and 08 in place of pd.merge followed by
+# drop_duplicates (09 checks the result with check_unique instead of dropping duplicate rows). A join states how many
+# rows of each side may share a key ('1:1', 'm:1', '1:m'; 'm:m' when a fan-out is expected and resolved later) and fails
+# before building the result when the data does not agree, naming the duplicated keys, instead of silently multiplying
+# rows that a later drop_duplicates has to undo. Like pd.merge, a join also fails when a key column is text on one side
+# and numbers or dates on the other, which would otherwise match nothing.
+# `key_index` hashes the key columns of a table once (factorized keys with the rows of every key); joins that probe the
+# same table on the same columns reuse it. `lookup` indexes the distinct rows of a few columns of a table, which is how
+# a small mapping table (e.g. folder -> unique_study_id) is taken out of a larger one.
+#
+#   batches = key_index(batch_all, 'accession_temp')
+#   found = join(tbi_scans, batches, on = 'accession_temp', cardinality = '1:m')
+#   missing = unmatched(tbi_scans, batches, on = 'accession_temp')
+
+import numpy as np
+import pandas as pd
+
+CARDINALITIES = ['1:1', 'm:1', '1:m', 'm:m']
+
+
+def _columns(on):
+    return [on] if isinstance(on, str) else list(on)
+
+
+# key values of the rows of a table (Index for one column, MultiIndex for several)
+def _keys(frame, on):
+    return pd.MultiIndex.from_frame(frame[on]) if len(on) > 1 else pd.Index(frame[on[0]])
+
+
+# hash index of the key columns `on` of a table; rows of key k are order[starts[k]:starts[k + 1]] (in table order)
+def key_index(frame, on):
+    on = _columns(on)
+    codes, uniques = _keys(frame, on).factorize(use_na_sentinel = False)
+    counts = np.bincount(codes, minlength = len(uniques))
+    return {'frame': frame, 'on': on, 'uniques': uniques, 'order': np.argsort(codes, kind = 'stable'),
+            'starts': np.concatenate([[0], np.cumsum(counts)]), 'max_count': int(counts.max()) if len(counts) else 0}
+
+
+# index of the distinct rows of frame[on + columns] (a mapping table taken out of a larger table)
+def lookup(frame, on, columns = ()):
+    on = _columns(on)
+    return key_index(frame[on + [c for c in columns if c not in on]].drop_duplicates(ignore_index = True), on)
+
+
+# (probe row, table row) pairs of every match of the probe keys in an index, in probe order
+def probe(index, keys):
+    code = index['uniques'].get_indexer(keys)
+    hit = np.flatnonzero(code >= 0)
+    starts = index['starts'][code[hit]]
+    counts = index['starts'][code[hit] + 1] - starts
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(hit, counts), index['order'][np.repeat(starts, counts) + offsets]
+
+
+# kind of a key column for the dtype check: 'number', 'datetime', 'bool' or 'text' (strings, objects)
+def _kind(series):
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        dtype = dtype.categories.dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        return 'bool'
+    if pd.api.types.is_numeric_dtype(dtype):
+        return 'number'
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return 'datetime'
+    return 'text'
+
+
+# raise if a left key column and its right key column hold values that can never be equal (e.g. int64 and str)
+def _check_dtypes(left, left_on, right, right_on):
+    for l, r in zip(left_on, right_on):
+        if _kind(left[l]) != _kind(right[r]):
+            raise ValueError(f'cannot join {l} ({left[l].dtype}) with {r} ({right[r].dtype}): '
+                             'convert the key columns to the same type first')
+
+
+# raise if a key appears on more than one row (`what` names the table in the message)
+def _check_unique(keys, on, what):
+    duplicated = keys[keys.duplicated()].unique()
+    if len(duplicated):
+        raise ValueError(f'{what}: {len(duplicated)} keys on {on} appear on more than one row, e.g. {list(duplicated[:5])}')
+
+
+# raise if any key appears on more than one row of a table
+def check_unique(frame, on, what = 'table'):
+    on = _columns(on)
+    _check_unique(_keys(frame, on), on, what)
+
+
+# join two tables on key columns, checking the declared cardinality first
+# `right` can be a key_index/lookup (reused across joins); how is 'inner' or 'left'. Rows are in left order, as with
+# pd.merge; key columns with the same name on both sides appear once and other shared names get `suffixes`
+def join(left, right, on = None, left_on = None, right_on = None, cardinality = 'm:1', how = 'inner', suffixes = ('_x', '_y')):
+    if cardinality not in CARDINALITIES:
+        raise ValueError(f'unknown cardinality {cardinality!r}, expected one of {CARDINALITIES}')
+    if how not in ['inner', 'left']:
+        raise ValueError(f"how must be 'inner' or 'left', got {how!r}")
+    left_on, right_on = _columns(left_on or on), _columns(right_on or on)
+    if isinstance(right, dict):
+        if right['on'] != right_on:
+            raise ValueError(f"index is on {right['on']}, not {right_on}")
+        index = right
+    else:
+        index = key_index(right, right_on)
+    right = index['frame']
+    _check_dtypes(left, left_on, right, right_on)
+
+    left_keys = _keys(left, left_on)
+    if cardinality[0] == '1':
+        _check_unique(left_keys, left_on, f'{cardinality} join, left table')
+    if cardinality[2] == '1' and index['max_count'] > 1:
+        _check_unique(_keys(right, right_on), right_on, f'{cardinality} join, right table')
+
+    left_pos, right_pos = probe(index, left_keys)
+    if how == 'left':
+        missing = np.setdiff1d(np.arange(len(left)), left_pos)
+        left_pos = np.concatenate([left_pos, missing])
+        right_pos = np.concatenate([right_pos, np.full(len(missing), -1)])
+        order = np.argsort(left_pos, kind = 'stable')
+        left_pos, right_pos = left_pos[order], right_pos[order]
+
+    shared_keys = [r for l, r in zip(left_on, right_on) if l == r]
+    right_columns = [c for c in right.columns if c not in shared_keys]
+    overlap = set(right_columns) & set(left.columns)
+    left_part = left.iloc[left_pos].reset_index(drop = True)
+    # position -1 (no match in a left join) becomes a row of missing values
+    right_part = right[right_columns].reset_index(drop = True).reindex(right_pos).reset_index(drop = True)
+    left_part = left_part.rename(columns = {c: c + suffixes[0] for c in overlap})
+    right_part = right_part.rename(columns = {c: c + suffixes[1] for c in overlap})
+    return pd.concat([left_part, right_part], axis = 1)
+
+
+# rows of `left` whose key has no match in `right` (a table or an index)
+def unmatched(left, right, on = None, left_on = None, right_on = None):
+    left_on, right_on = _columns(left_on or on), _columns(right_on or on)
+    index = right if isinstance(right, dict) else key_index(right, right_on)
+    _check_dtypes(left, left_on, index['frame'], right_on)
+    return left[index['uniques'].get_indexer(_keys(left, left_on)) < 0]
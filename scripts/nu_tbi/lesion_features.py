@@ -0,0 +1,177 @@
+# Date: 10-19-2026
+# Objective: Lesion level shape, density and location features for every hemorrhage compartment of a blast-ct prediction.
+# Each scan's CT and label map are read once; the features of all compartments are computed together from per-label sums
+# (np.bincount over the label map), so the cost is a few passes over the volume regardless of the number of compartments.
+# Scans are processed in a process pool by scripts/13_extract_lesion_features.py.
+#
+# For each compartment c (iph, eah, oedema, ivh) the following columns are computed:
+#   {c}_voxels, {c}_volume_ml               voxel count and volume
+#   {c}_hu_mean, {c}_hu_std, {c}_hu_p10 ... {c}_hu_p90   CT density (HU) of the lesion voxels
+#   {c}_surface_mm2                         area of the voxel faces between the lesion and other labels
+#   {c}_sphericity                          pi^(1/3) (6 V)^(2/3) / surface (1 for a sphere, smaller for irregular lesions)
+#   {c}_extent                              lesion volume / volume of its bounding box
+#   {c}_centroid_x/y/z                      centroid in scanner coordinates (mm, from the nifti affine)
+#   {c}_centroid_rel_x/y/z                  centroid relative to the brain mask's bounding box (0-1 along each voxel axis)
+#   {c}_atlas_label                         most frequent label of blast-ct's atlas_in_native_space within the lesion
+#   {c}_components, {c}_largest_component_ml   connected components (26-connected) and the volume of the largest
+# Location features that need the brain mask or atlas are NaN when blast-ct did not write those files.
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import ndimage
+
+from nu_tbi.volume_store import load_image
+
+# blast-ct label values
+LABELS = {'iph': 1, 'eah': 2, 'oedema': 3, 'ivh': 4}
+
+PERCENTILES = [10, 25, 50, 75, 90]
+
+STRUCTURE = np.ones((3, 3, 3), dtype = bool)
+
+
+# load a nifti or volume store (.vol) file as an array (scaled values for images, integers for label maps)
+def load_volume(path, dtype = 'float32'):
+    image = load_image(path)
+    return np.asarray(image.dataobj, dtype = dtype), image
+
+
+# number of voxel faces of each label that touch a different label (or the edge of the volume), per axis
+# returns an (n_labels x 3) array
+def boundary_faces(labels, n_labels):
+    faces = np.zeros((n_labels, 3), dtype = 'int64')
+    padded = np.pad(labels, 1)
+    for axis in range(3):
+        lower = np.take(padded, np.arange(padded.shape[axis] - 1), axis = axis)
+        upper = np.take(padded, np.arange(1, padded.shape[axis]), axis = axis)
+        differ = lower != upper
+        faces[:, axis] = (np.bincount(lower[differ], minlength = n_labels)[:n_labels] +
+                          np.bincount(upper[differ], minlength = n_labels)[:n_labels])
+    return faces
+
+
+# features of every compartment for one label map (and its CT, brain mask and atlas when given)
+def compartment_features(labels, hu, zooms, affine, brain_mask = None, atlas = None, compartments = LABELS):
+    n_labels = max(compartments.values()) + 1
+    labels = np.where(labels < n_labels, labels, 0).astype('int64')
+    voxel_ml = float(np.prod(zooms)) / 1000
+    features = {}
+
+    flat = labels.ravel()
+    counts = np.bincount(flat, minlength = n_labels)
+
+    # lesion voxels sorted by (label, HU): each compartment's percentiles are index lookups
+    lesion = np.flatnonzero(flat)
+    lesion_labels = flat[lesion]
+    lesion_hu = hu.ravel()[lesion] if hu is not None else None
+    if lesion_hu is not None:
+        order = np.lexsort((lesion_hu, lesion_labels))
+        sorted_hu = lesion_hu[order]
+        starts = np.concatenate([[0], np.cumsum(counts[1:])])
+        hu_sum = np.bincount(lesion_labels, weights = lesion_hu, minlength = n_labels)
+        hu_sq = np.bincount(lesion_labels, weights = lesion_hu.astype('float64') ** 2, minlength = n_labels)
+
+    coords = np.unravel_index(lesion, labels.shape)
+    coord_sum = np.stack([np.bincount(lesion_labels, weights = c, minlength = n_labels) for c in coords], axis = 1)
+
+    # per-label bounding boxes from the lesion coordinates sorted by label
+    sorted_coords = np.stack(coords, axis = 1)[np.argsort(lesion_labels, kind = 'stable')] if len(lesion) else np.zeros((0, 3), dtype = 'int64')
+
+    # face areas along each voxel axis
+    face_area = np.array([zooms[1] * zooms[2], zooms[0] * zooms[2], zooms[0] * zooms[1]])
+    surface = boundary_faces(labels, n_labels) @ face_area
+
+    if brain_mask is not None and brain_mask.any():
+        nonzero = np.nonzero(brain_mask)
+        brain_low = np.array([c.min() for c in nonzero], dtype = 'float64')
+        brain_size = np.array([c.max() for c in nonzero], dtype = 'float64') - brain_low + 1
+    else:
+        brain_low = brain_size = None
+
+    for name, value in compartments.items():
+        n = int(counts[value])
+        features[f'{name}_voxels'] = n
+        features[f'{name}_volume_ml'] = n * voxel_ml
+        empty = n == 0
+
+        if lesion_hu is not None and not empty:
+            start = starts[value - 1]
+            mean = hu_sum[value] / n
+            features[f'{name}_hu_mean'] = mean
+            features[f'{name}_hu_std'] = np.sqrt(max(hu_sq[value] / n - mean ** 2, 0))
+            for p, v in zip(PERCENTILES, np.percentile(sorted_hu[start:start + n], PERCENTILES)):
+                features[f'{name}_hu_p{p}'] = v
+        else:
+            features[f'{name}_hu_mean'] = features[f'{name}_hu_std'] = np.nan
+            for p in PERCENTILES:
+                features[f'{name}_hu_p{p}'] = np.nan
+
+        features[f'{name}_surface_mm2'] = np.nan if empty else surface[value]
+        features[f'{name}_sphericity'] = np.nan if empty else np.pi ** (1 / 3) * (6 * n * voxel_ml * 1000) ** (2 / 3) / surface[value]
+
+        if empty:
+            features[f'{name}_extent'] = np.nan
+            centroid = np.full(3, np.nan)
+        else:
+            start = int(counts[1:value].sum())
+            box = sorted_coords[start:start + n]
+            features[f'{name}_extent'] = n / np.prod(box.max(axis = 0) - box.min(axis = 0) + 1)
+            centroid = coord_sum[value] / n
+        world = affine[:3, :3] @ centroid + affine[:3, 3]
+        for axis, coordinate in zip('xyz', world):
+            features[f'{name}_centroid_{axis}'] = coordinate
+        relative = (centroid - brain_low) / brain_size if brain_low is not None else np.full(3, np.nan)
+        for axis, coordinate in zip('xyz', relative):
+            features[f'{name}_centroid_rel_{axis}'] = coordinate
+
+        if atlas is not None and not empty:
+            atlas_values = atlas.ravel()[lesion[lesion_labels == value]]
+            features[f'{name}_atlas_label'] = int(np.bincount(atlas_values).argmax())
+        else:
+            features[f'{name}_atlas_label'] = np.nan
+
+        if empty:
+            features[f'{name}_components'] = 0
+            features[f'{name}_largest_component_ml'] = 0.0
+        else:
+            components, n_components = ndimage.label(labels == value, structure = STRUCTURE)
+            features[f'{name}_components'] = n_components
+            features[f'{name}_largest_component_ml'] = np.bincount(components.ravel())[1:].max() * voxel_ml
+    return features
+
+
+# features of one scan (row with id, image, prediction and optionally atlas_in_native_space / brain_mask_native_space)
+# paths are relative to the working directory (NU_TBI/); errors are recorded in the `error` column
+def scan_features(row):
+    features = {'id': row['id']}
+    try:
+        labels, label_image = load_volume(row['prediction'], dtype = 'int16')
+        hu = load_volume(row['image'])[0] if row.get('image') and os.path.exists(row['image']) else None
+        if hu is not None and hu.shape != labels.shape:
+            raise ValueError(f'image shape {hu.shape} does not match prediction shape {labels.shape}')
+
+        optional = {}
+        for key, dtype in [('brain_mask_native_space', 'uint8'), ('atlas_in_native_space', 'int64')]:
+            path = row.get(key)
+            optional[key] = load_volume(path, dtype = dtype)[0] if isinstance(path, str) and os.path.exists(path) else None
+
+        features.update(compartment_features(labels, hu, label_image.header.get_zooms()[:3], label_image.affine,
+                                             brain_mask = optional['brain_mask_native_space'], atlas = optional['atlas_in_native_space']))
+        features['error'] = None
+    except Exception as e:
+        features['error'] = f'{type(e).__name__}: {e}'
+    return features
+
+
+# features of every scan; rows are processed in a process pool when jobs > 1
+def extract_features(scans, jobs = 1):
+    rows = scans.to_dict('records')
+    if jobs > 1 and len(rows) > 1:
+        with ProcessPoolExecutor(max_workers = jobs) as pool:
+            results = list(pool.map(scan_features, rows, chunksize = max(1, len(rows) // (jobs * 8))))
+    else:
+        results = [scan_features(row) for row in rows]
+    return pd.DataFrame(results)
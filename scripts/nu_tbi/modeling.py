@@ -0,0 +1,227 @@
+# Date: 10-19-2026
+# Objective: Repeated patient-grouped, outcome-stratified splits for estimating how stable model performance is,
+# instead of the single train_test_split in scripts/12_prepare_training_test.py.
+# For each outcome (outcome_6ml/8ml/10ml), `make_splits` creates n_repeats x n_splits cross-validation folds
+# (StratifiedGroupKFold: all scans of a patient are in the same fold, folds keep the outcome prevalence) or n_repeats
+# holdout splits (the first fold of a shuffled StratifiedGroupKFold with n_splits = 1 / test_size). Fold indices are
+# cached in SPLIT_DIR, keyed by a hash of the patient ids, labels and split settings.
+# Every (outcome, model, fold) is fitted in a process pool; out-of-fold predictions are averaged over repeats per row
+# and bootstrapped (vectorized over all bootstrap samples) for confidence intervals of AUROC, average precision and
+# Brier score. The spread of the per-repeat metrics is reported next to the bootstrap intervals.
+#
+#   results, metrics, predictions = run_study(tbi_data, outcomes = OUTCOMES, models = ['logistic'], jobs = 8)
+
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.stats import rankdata
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import average_precision_score, brier_score_loss, roc_auc_score
+from sklearn.model_selection import StratifiedGroupKFold
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+OUTCOMES = ['outcome_6ml', 'outcome_8ml', 'outcome_10ml']
+
+# blast-ct volumes on the first scan
+FEATURES = ['iph_predicted_volume_ml', 'eah_predicted_volume_ml', 'oedema_predicted_volume_ml', 'ivh_predicted_volume_ml']
+
+# model name -> function returning a new (unfitted) estimator
+MODELS = {
+    'logistic': lambda seed: make_pipeline(StandardScaler(), LogisticRegression(max_iter = 1000, class_weight = 'balanced')),
+    'random_forest': lambda seed: RandomForestClassifier(n_estimators = 300, min_samples_leaf = 3, class_weight = 'balanced',
+                                                         random_state = seed, n_jobs = 1),
+}
+
+# relative to NU_TBI/
+SPLIT_DIR = 'data/modeling/split_study/splits'
+
+
+# hash of the rows, labels and settings a set of splits depends on
+def split_key(groups, y, settings):
+    digest = hashlib.blake2b(digest_size = 16)
+    digest.update(pd.util.hash_array(np.asarray(groups, dtype = 'object')).tobytes())
+    digest.update(np.asarray(y, dtype = 'int8').tobytes())
+    digest.update(json.dumps(settings, sort_keys = True).encode())
+    return digest.hexdigest()
+
+
+# test row indices of every split; returns a list of dicts (repeat, fold, test)
+# mode 'cv': n_splits folds per repeat; mode 'holdout': one test set of about test_size per repeat
+# the training rows of a split are all other rows
+def make_splits(groups, y, n_repeats = 20, n_splits = 5, mode = 'cv', test_size = 0.3, seed = 1300, cache_dir = SPLIT_DIR):
+    settings = {'n_repeats': n_repeats, 'n_splits': n_splits, 'mode': mode, 'test_size': test_size, 'seed': seed}
+    path = None
+    if cache_dir is not None:
+        path = os.path.join(cache_dir, f'{split_key(groups, y, settings)}.npz')
+        if os.path.exists(path):
+            cached = np.load(path)
+            return [{'repeat': int(r), 'fold': int(f), 'test': cached[f'test_{i}']}
+                    for i, (r, f) in enumerate(cached['repeat_fold'])]
+
+    folds_per_repeat = n_splits if mode == 'cv' else max(2, int(round(1 / test_size)))
+    splits = []
+    for repeat in range(n_repeats):
+        kfold = StratifiedGroupKFold(n_splits = folds_per_repeat, shuffle = True, random_state = seed + repeat)
+        for fold, (_, test) in enumerate(kfold.split(np.zeros(len(y)), y, groups)):
+            splits.append({'repeat': repeat, 'fold': fold, 'test': test})
+            if mode == 'holdout':
+                break
+
+    if path is not None:
+        os.makedirs(cache_dir, exist_ok = True)
+        tmp = path + '.tmp.npz'
+        np.savez(tmp, repeat_fold = np.array([[s['repeat'], s['fold']] for s in splits]),
+                 **{f'test_{i}': s['test'] for i, s in enumerate(splits)})
+        os.replace(tmp, path)
+    return splits
+
+
+# data shared by the worker processes (set once per process, not sent with every fold)
+_DATA = {}
+
+
+def _init_worker(data):
+    _DATA.update(data)
+
+
+# fit one model on one split; returns the test rows, their predicted probabilities and the fold metrics
+def fit_fold(task):
+    X, y = _DATA['X'], _DATA[task['outcome']]
+    test = task['test']
+    train = np.setdiff1d(np.arange(len(y)), test, assume_unique = True)
+
+    result = {key: task[key] for key in ['outcome', 'model', 'repeat', 'fold']}
+    result['test'] = test
+    if len(np.unique(y[train])) < 2:
+        # nothing to learn from; predict the training prevalence
+        result['score'] = np.full(len(test), y[train].mean() if len(train) else 0.0)
+    else:
+        model = MODELS[task['model']](task['seed'])
+        model.fit(X[train], y[train])
+        result['score'] = model.predict_proba(X[test])[:, 1]
+    result.update(fold_metrics(y[test], result['score']))
+    return result
+
+
+# AUROC, average precision and Brier score of one set of predictions (NaN if the test set has one class)
+def fold_metrics(y_true, y_score):
+    both = len(np.unique(y_true)) == 2
+    return {'n': len(y_true),
+            'n_cases': int(np.sum(y_true)),
+            'auroc': roc_auc_score(y_true, y_score) if both else np.nan,
+            'average_precision': average_precision_score(y_true, y_score) if both else np.nan,
+            'brier': brier_score_loss(y_true, y_score) if len(y_true) else np.nan}
+
+
+# AUROC, average precision and Brier score for every row of (samples x n) label and score matrices
+# AUROC from the mid-ranks of the scores (Mann-Whitney U); average precision as in sklearn (tied scores are one threshold)
+def batch_metrics(y_true, y_score):
+    y_true = y_true.astype('float64')
+    n_pos = y_true.sum(axis = 1)
+    n_neg = y_true.shape[1] - n_pos
+
+    ranks = rankdata(y_score, axis = 1)
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        auroc = ((ranks * y_true).sum(axis = 1) - n_pos * (n_pos + 1) / 2) / (n_pos * n_neg)
+
+        order = np.argsort(-y_score, axis = 1, kind = 'stable')
+        score = np.take_along_axis(y_score, order, axis = 1)
+        label = np.take_along_axis(y_true, order, axis = 1)
+        precision = np.cumsum(label, axis = 1) / np.arange(1, label.shape[1] + 1)
+
+        # every row's precision is taken at the end of its group of tied scores
+        n = score.shape[1]
+        group_end = np.ones(score.shape, dtype = bool)
+        group_end[:, :-1] = score[:, :-1] != score[:, 1:]
+        end_index = np.where(group_end, np.arange(n), n - 1)
+        end_index = np.minimum.accumulate(end_index[:, ::-1], axis = 1)[:, ::-1]
+        average_precision = (label * np.take_along_axis(precision, end_index, axis = 1)).sum(axis = 1) / n_pos
+
+    brier = ((y_score - y_true) ** 2).mean(axis = 1)
+    valid = (n_pos > 0) & (n_neg > 0)
+    return {'auroc': np.where(valid, auroc, np.nan),
+            'average_precision': np.where(valid, average_precision, np.nan),
+            'brier': brier}
+
+
+# percentile bootstrap intervals of the metrics; all n_boot resamples are scored at once (in batches of `batch` rows)
+def bootstrap_ci(y_true, y_score, n_boot = 2000, alpha = 0.05, seed = 1300, batch = 500):
+    y_true, y_score = np.asarray(y_true), np.asarray(y_score, dtype = 'float64')
+    rng = np.random.default_rng(seed)
+    samples = {name: [] for name in ['auroc', 'average_precision', 'brier']}
+    for start in range(0, n_boot, batch):
+        index = rng.integers(0, len(y_true), size = (min(batch, n_boot - start), len(y_true)))
+        for name, values in batch_metrics(y_true[index], y_score[index]).items():
+            samples[name].append(values)
+
+    point = batch_metrics(y_true[None, :], y_score[None, :])
+    ci = {}
+    for name, values in samples.items():
+        values = np.concatenate(values)
+        ci[name] = point[name][0]
+        ci[name + '_low'], ci[name + '_high'] = np.nanquantile(values, [alpha / 2, 1 - alpha / 2]) if np.isfinite(values).any() else (np.nan, np.nan)
+    return ci
+
+
+# fit every (outcome, model, split) in a process pool and summarize
+# returns (summary per outcome and model, metrics per split, averaged out-of-fold predictions per row)
+def run_study(data, outcomes = OUTCOMES, models = list(MODELS), features = FEATURES, group_col = 'unique_study_id',
+              n_repeats = 20, n_splits = 5, mode = 'cv', test_size = 0.3, seed = 1300, n_boot = 2000, jobs = 1,
+              cache_dir = SPLIT_DIR):
+    data = data.reset_index(drop = True)
+    shared = {'X': data[features].to_numpy(dtype = 'float64')}
+    tasks = []
+    for outcome in outcomes:
+        shared[outcome] = data[outcome].fillna(0).to_numpy(dtype = 'int8')
+        splits = make_splits(data[group_col].to_numpy(), shared[outcome], n_repeats = n_repeats, n_splits = n_splits,
+                             mode = mode, test_size = test_size, seed = seed, cache_dir = cache_dir)
+        tasks += [dict(split, outcome = outcome, model = model, seed = seed + split['repeat']) for model in models for split in splits]
+
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers = jobs, initializer = _init_worker, initargs = (shared,)) as pool:
+            results = list(pool.map(fit_fold, tasks, chunksize = max(1, len(tasks) // (jobs * 4))))
+    else:
+        _init_worker(shared)
+        results = [fit_fold(task) for task in tasks]
+
+    metrics = pd.DataFrame([{k: v for k, v in r.items() if k not in ['test', 'score']} for r in results])
+
+    summary, predictions = [], []
+    for outcome in outcomes:
+        y = shared[outcome]
+        for model in models:
+            runs = [r for r in results if r['outcome'] == outcome and r['model'] == model]
+
+            # average the out-of-fold scores of each row over the repeats it was tested in
+            total, count = np.zeros(len(y)), np.zeros(len(y))
+            for r in runs:
+                np.add.at(total, r['test'], r['score'])
+                np.add.at(count, r['test'], 1)
+            tested = count > 0
+            score = np.where(tested, total / np.maximum(count, 1), np.nan)
+            predictions.append(pd.DataFrame({group_col: data[group_col], 'outcome': outcome, 'model': model,
+                                             'y_true': y, 'score': score, 'n_tested': count.astype('int64')}))
+
+            # per repeat metrics: pooled out-of-fold predictions of the repeat
+            repeat_metrics = []
+            for repeat in sorted({r['repeat'] for r in runs}):
+                rows = [r for r in runs if r['repeat'] == repeat]
+                test = np.concatenate([r['test'] for r in rows])
+                repeat_metrics.append(fold_metrics(y[test], np.concatenate([r['score'] for r in rows])))
+            repeat_metrics = pd.DataFrame(repeat_metrics)
+
+            row = {'outcome': outcome, 'model': model, 'n': int(tested.sum()), 'n_cases': int(y[tested].sum()),
+                   'n_repeats': n_repeats, 'mode': mode}
+            row.update(bootstrap_ci(y[tested], score[tested], n_boot = n_boot, seed = seed))
+            for name in ['auroc', 'average_precision', 'brier']:
+                row[name + '_repeat_mean'] = repeat_metrics[name].mean()
+                row[name + '_repeat_low'], row[name + '_repeat_high'] = repeat_metrics[name].quantile([0.025, 0.975])
+            summary.append(row)
+
+    return pd.DataFrame(summary), metrics, pd.concat(predictions, ignore_index = True)
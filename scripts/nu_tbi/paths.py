@@ -0,0 +1,16 @@
+# Date: 10-19-2026
+# Objective: Root directories used by the numbered scripts.
+# The defaults are the locations on our server. Set NU_TBI_DIR and HEMORRHAGE_PROJECT_DIR to run the pipeline
+# somewhere else, e.g. on a synthetic tree created by scripts/make_synthetic_data.py.
+
+import os
+
+# project directory (NU_TBI/); scripts 08-12 change into this directory
+NU_TBI_DIR = os.environ.get('NU_TBI_DIR', '/share/nubar/Neurotrauma/hematoma_expansion/NU_TBI')
+
+# directory holding the transferred dicom images (Transfer20211010/images/, HemorrhageTransfer20231128/images/)
+HEMORRHAGE_PROJECT_DIR = os.environ.get('HEMORRHAGE_PROJECT_DIR', '/share/hemorrhage_project')
+
+# local disk used to stage copies of files read from the share (nu_tbi.staging); NU_TBI_SCRATCH_GB = 0 turns it off
+SCRATCH_DIR = os.environ.get('NU_TBI_SCRATCH_DIR', '/tmp/nu_tbi_scratch')
+SCRATCH_BYTES = int(float(os.environ.get('NU_TBI_SCRATCH_GB', '20')) * 1e9)
@@ -0,0 +1,93 @@
+# Date: 10-19-2026
+# Objective: Bounded prefetching of volumes: the next `depth` items are read, decoded and preprocessed by a thread pool
+# while the caller works on the current one, so a loop over volumes on the network share takes about
+# max(I/O, compute) instead of their sum. Items are yielded in order.
+# `metrics` (a dict, filled while iterating) records how long the caller waited for items (stall time), how many items
+# were ready when the caller asked for the next one (queue depth) and the time spent loading:
+#   n, load_seconds, stall_seconds, mean_queue_depth, max_queue_depth, zero_depth_fraction (share of items the caller
+#   had to wait for)
+#
+#   metrics = {}
+#   for path, image, error in prefetch(paths, read_volume, depth = 4, metrics = metrics):
+#       segment(image)
+#   print(format_metrics(metrics))
+
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import nibabel as nib
+import numpy as np
+
+from nu_tbi.volume_store import load_image
+
+
+# load one item and time it; errors are returned so one bad file does not stop the loop
+def _timed(load, item):
+    start = time.perf_counter()
+    try:
+        return load(item), None, time.perf_counter() - start
+    except Exception as e:
+        return None, f'{type(e).__name__}: {e}', time.perf_counter() - start
+
+
+# yield (item, loaded value, error) in order while up to `depth` items are loaded ahead by `workers` threads
+def prefetch(items, load, depth = 4, workers = None, metrics = None):
+    metrics = metrics if metrics is not None else {}
+    metrics.update({'n': 0, 'load_seconds': 0.0, 'stall_seconds': 0.0, 'queue_depth_sum': 0, 'max_queue_depth': 0,
+                    'zero_depth': 0})
+    items = iter(items)
+    window = deque()
+    with ThreadPoolExecutor(max_workers = workers or max(1, depth)) as pool:
+        def submit():
+            for item in items:
+                window.append((item, pool.submit(_timed, load, item)))
+                return True
+            return False
+
+        try:
+            for _ in range(max(1, depth)):
+                if not submit():
+                    break
+            while window:
+                item, future = window.popleft()
+                # items already loaded when the caller asks for the next one (including this one)
+                ready = int(future.done()) + sum(f.done() for _, f in window)
+                start = time.perf_counter()
+                value, error, load_seconds = future.result()
+                metrics['stall_seconds'] += time.perf_counter() - start
+                metrics['load_seconds'] += load_seconds
+                metrics['queue_depth_sum'] += ready
+                metrics['max_queue_depth'] = max(metrics['max_queue_depth'], ready)
+                metrics['zero_depth'] += ready == 0
+                metrics['n'] += 1
+                submit()
+                yield item, value, error
+        finally:
+            # the caller stopped early: do not start the loads still queued
+            for _, future in window:
+                future.cancel()
+            n = max(metrics['n'], 1)
+            metrics['mean_queue_depth'] = metrics['queue_depth_sum'] / n
+            metrics['zero_depth_fraction'] = metrics['zero_depth'] / n
+
+
+# read a volume fully into memory (nifti, .vol or DICOM folder) so that no file I/O is left for the model
+# `preprocess(data, image)` can transform the array (e.g. windowing) on the prefetch thread
+def read_volume(path, preprocess = None):
+    image = load_image(path)
+    data = np.asanyarray(image.dataobj)
+    if preprocess is not None:
+        data = preprocess(data, image)
+    return nib.Nifti1Image(data, image.affine, image.header)
+
+
+# one-line summary of prefetch metrics and the caller's compute time
+def format_metrics(metrics, wall_seconds = None, compute_seconds = None):
+    text = (f"{metrics['n']} volumes, load {metrics['load_seconds']:.1f} s, stalled {metrics['stall_seconds']:.1f} s, "
+            f"queue depth mean {metrics.get('mean_queue_depth', 0):.1f} (max {metrics['max_queue_depth']}, "
+            f"empty {metrics.get('zero_depth_fraction', 0):.0%})")
+    if wall_seconds is not None and compute_seconds is not None:
+        text += (f", compute {compute_seconds:.1f} s, wall {wall_seconds:.1f} s "
+                 f"(sum {metrics['load_seconds'] + compute_seconds:.1f} s, max {max(metrics['load_seconds'], compute_seconds):.1f} s)")
+    return text
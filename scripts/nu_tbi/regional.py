@@ -0,0 +1,129 @@
+# Date: 10-19-2026
+# Objective: Store blast-ct regional hemorrhage volumes (prediction_{compartment}_{region}_ml) in a compact long format.
+# blast-ct reports ~120 regional volumes per scan, most of which are 0 mL. Rather than carrying these columns through every
+# merge and csv, scripts/09_filter_predictions.py and scripts/11_prepare_cohort.py split them off into a long table
+# (one row per scan, compartment and region with a non-zero volume) that can be joined back on the scan `id` when needed.
+# Roll-ups (left/right, lobe, compartment totals) are computed on demand from the long table.
+
+import re
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+REGIONAL_COLUMN = re.compile(r'^prediction_(?P<compartment>iph|eah|oedema|ivh)_(?P<region>.+)_ml$')
+
+COMPARTMENT_ORDER = ['iph', 'eah', 'oedema', 'ivh']
+
+# map each atlas structure (region name without the Left/Right prefix and '-' sub-region) to its lobe
+LOBES = {
+    'frontallobe': 'frontal',
+    'temporallobe': 'temporal',
+    'hippocampus': 'temporal',
+    'parietallobe': 'parietal',
+    'occipitallobe': 'occipital',
+    'insula': 'insula',
+    'basalganglia': 'deep_grey_matter',
+    'caudate': 'deep_grey_matter',
+    'thalamusproper': 'deep_grey_matter',
+    'basalforebrain': 'deep_grey_matter',
+    'cerebellum': 'cerebellum',
+    'brainstem': 'brainstem',
+    'ventricle': 'ventricle',
+}
+
+
+# return the (compartment, region) of a regional volume column, or None if it is not one
+def parse_regional_column(col):
+    match = REGIONAL_COLUMN.match(col)
+    if match is None:
+        return None
+    return match.group('compartment'), match.group('region')
+
+
+# return the regional volume columns in dataframe
+def regional_columns(dataframe):
+    return [col for col in dataframe.columns if parse_regional_column(col) is not None]
+
+
+# return the region dictionary: side (Left/Right/Midline) and lobe for each region name
+def region_table(regions):
+    regions = pd.Series(pd.unique(pd.Series(regions, dtype = 'object')), dtype = 'object')
+    side = np.select([regions.str.startswith('Left'), regions.str.startswith('Right')], ['left', 'right'], default = 'midline')
+    structure = regions.str.replace(r'^(Left|Right)', '', regex = True).str.split('-').str[0].str.lower()
+    return pd.DataFrame({'region': regions,
+                         'side': side,
+                         'lobe': structure.map(LOBES).fillna('other')})
+
+
+# convert the wide regional columns into a long table of non-zero volumes: id_col, compartment, region, ml
+def to_long(dataframe, id_col = 'id'):
+    cols = regional_columns(dataframe)
+    parsed = [parse_regional_column(col) for col in cols]
+
+    values = dataframe[cols].to_numpy(dtype = 'float64')
+    rows, col_index = np.nonzero(np.nan_to_num(values, nan = 0.0))
+
+    compartments = np.array([compartment for compartment, _ in parsed], dtype = 'object')
+    regions = np.array([region for _, region in parsed], dtype = 'object')
+
+    long = pd.DataFrame({
+        id_col: dataframe[id_col].to_numpy()[rows],
+        'compartment': pd.Categorical(compartments[col_index], categories = COMPARTMENT_ORDER),
+        'region': pd.Categorical(regions[col_index], categories = list(pd.unique(regions))),
+        'ml': values[rows, col_index],
+    })
+
+    # a scan can appear more than once in the wide table (e.g. two report numbers for the same scan)
+    return long.drop_duplicates([id_col, 'compartment', 'region']).reset_index(drop = True)
+
+
+# remove the regional columns from dataframe and return them separately in long format
+def split_regional(dataframe, id_col = 'id'):
+    long = to_long(dataframe, id_col = id_col)
+    return dataframe.drop(columns = regional_columns(dataframe)), long
+
+
+# convert the long table back to the original wide prediction_{compartment}_{region}_ml columns (0 where missing)
+# if scan_ids is given, the result has one row per scan id in that order
+def to_wide(long, id_col = 'id', scan_ids = None):
+    wide = long.pivot_table(index = id_col, columns = ['compartment', 'region'], values = 'ml',
+                            aggfunc = 'sum', fill_value = 0.0, observed = True)
+    wide.columns = ['prediction_' + str(compartment) + '_' + str(region) + '_ml' for compartment, region in wide.columns]
+    if scan_ids is not None:
+        wide = wide.reindex(pd.Index(scan_ids, name = id_col), fill_value = 0.0)
+    return wide.reset_index()
+
+
+# convert the long table into a scipy sparse matrix (scans x compartment/region)
+# returns the matrix, the scan ids for each row, and the compartment/region dictionary for each column
+def to_sparse(long, id_col = 'id', scan_ids = None):
+    if scan_ids is None:
+        scan_ids = pd.unique(long[id_col])
+    scan_index = pd.Index(scan_ids)
+
+    columns = long[['compartment', 'region']].drop_duplicates().sort_values(['compartment', 'region']).reset_index(drop = True)
+    column_index = pd.MultiIndex.from_frame(columns)
+
+    rows = scan_index.get_indexer(long[id_col])
+    cols = column_index.get_indexer(pd.MultiIndex.from_frame(long[['compartment', 'region']]))
+    keep = rows >= 0
+
+    matrix = sparse.csr_matrix((long['ml'].to_numpy()[keep], (rows[keep], cols[keep])),
+                               shape = (len(scan_index), len(column_index)))
+    return matrix, scan_index, columns
+
+
+# sum regional volumes to a coarser level for each scan
+# level: 'side' (left/right/midline), 'lobe', or 'compartment' (compartment totals)
+def rollup(long, level, id_col = 'id'):
+    if level == 'compartment':
+        keys = [id_col, 'compartment']
+        rolled = long
+    elif level in ['side', 'lobe']:
+        regions = region_table(long['region'].cat.categories if hasattr(long['region'], 'cat') else long['region'])
+        rolled = long.assign(**{level: long['region'].astype('object').map(regions.set_index('region')[level])})
+        keys = [id_col, 'compartment', level]
+    else:
+        raise ValueError("level must be one of 'side', 'lobe', or 'compartment'")
+    return rolled.groupby(keys, observed = True, sort = True)['ml'].sum().reset_index()
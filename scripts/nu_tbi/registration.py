@@ -0,0 +1,219 @@
+# Date: 10-19-2026
+# Objective: Rigid registration of each follow-up scan to the patient's first scan, and voxel-wise new / resolved
+# hemorrhage between them.
+# Expansion is otherwise defined from differences of total volumes (change_iph_volume_first_scan etc. in 11), which
+# cannot tell a growing lesion from one lesion resolving while another appears. Here the follow-up's blast-ct label map
+# is moved onto the first scan's grid with a rigid (rotation + translation) transform, and voxels labelled only on the
+# follow-up (new) or only on the first scan (resolved) are counted per compartment.
+#
+# Registration is intensity based on the CT: the head is sampled at a fixed number of points, HU are clipped to
+# HU_RANGE (so bone and brain drive the alignment, not air or metal) and the mean squared difference is minimized with
+# Powell's method, coarse to fine over LEVELS (mm). The translation starts at the difference of the heads' centres.
+# Transforms are cached in REGISTRATION_DIR/transforms/ under a hash of both CT files and the settings; patients are
+# processed in a process pool by scripts/16_register_follow_up_scans.py.
+
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import nibabel as nib
+import nibabel.processing
+import numpy as np
+import pandas as pd
+from scipy import ndimage, optimize
+from scipy.spatial.transform import Rotation
+
+from nu_tbi.hashing import file_digest
+from nu_tbi.lesion_features import LABELS
+from nu_tbi.resample import resample_array
+from nu_tbi.sparse_masks import encode_mask
+from nu_tbi.volume_store import load_image
+
+# relative to NU_TBI/
+REGISTRATION_DIR = 'data/processed/registration'
+
+# increase when the registration changes, so cached transforms are not reused
+VERSION = 1
+
+# grid spacing (mm) of each resolution level, coarse to fine
+LEVELS = [6.0, 3.0]
+
+# HU are clipped to this range before comparing images; voxels above HEAD_HU are head
+HU_RANGE = (-100, 1000)
+HEAD_HU = -300
+
+# number of head points sampled at each level
+N_POINTS = 20000
+
+
+# rigid transform (4 x 4, fixed world -> moving world) from rotations in degrees about `center` and a translation in mm
+def rigid_matrix(params, center):
+    matrix = np.eye(4)
+    matrix[:3, :3] = Rotation.from_euler('xyz', params[:3], degrees = True).as_matrix()
+    matrix[:3, 3] = center - matrix[:3, :3] @ center + params[3:]
+    return matrix
+
+
+# CT clipped to HU_RANGE on an isotropic grid of `spacing` mm; returns (data, affine)
+def _level(data, affine, spacing):
+    shape, level_affine = nib.processing.vox2out_vox((data.shape, affine), [spacing] * 3)
+    resampled = resample_array(data, affine, shape, level_affine, 1, HU_RANGE[0])
+    return np.clip(resampled, *HU_RANGE), level_affine
+
+
+# world coordinates and values of up to n_points head voxels of a level, and the head's centre
+def _head_points(data, affine, n_points, seed = 1300):
+    head = np.argwhere(data > HEAD_HU)
+    if not len(head):
+        raise ValueError('no head voxels found')
+    center = affine[:3, :3] @ head.mean(axis = 0) + affine[:3, 3]
+    if len(head) > n_points:
+        head = head[np.random.default_rng(seed).choice(len(head), n_points, replace = False)]
+    return head @ affine[:3, :3].T + affine[:3, 3], data[tuple(head.T)], center
+
+
+# mean squared HU difference between the fixed points and the moving image under the transform
+def _cost(params, points, values, moving, moving_inverse, center):
+    matrix = moving_inverse @ rigid_matrix(params, center)
+    coords = points @ matrix[:3, :3].T + matrix[:3, 3]
+    sampled = ndimage.map_coordinates(moving, coords.T, order = 1, mode = 'constant', cval = HU_RANGE[0])
+    return np.mean((sampled - values) ** 2)
+
+
+# register `moving` (follow-up CT) to `fixed` (first CT); images are nibabel images in HU
+# returns the 4 x 4 transform from fixed to moving world coordinates, the parameters and the cost before and after
+def register(fixed, moving, levels = LEVELS, n_points = N_POINTS):
+    fixed_data = np.asarray(fixed.dataobj, dtype = 'float32')
+    moving_data = np.asarray(moving.dataobj, dtype = 'float32')
+    params, center, costs = None, None, []
+    for spacing in levels:
+        fixed_level, fixed_affine = _level(fixed_data, fixed.affine, spacing)
+        moving_level, moving_affine = _level(moving_data, moving.affine, spacing)
+        points, values, level_center = _head_points(fixed_level, fixed_affine, n_points)
+        if params is None:
+            # rotate about the centre of the fixed head (kept for all levels); start from the translation between the
+            # centres of the heads
+            center = level_center
+            params = np.concatenate([np.zeros(3), _head_points(moving_level, moving_affine, n_points)[2] - center])
+        args = (points, values, moving_level, np.linalg.inv(moving_affine), center)
+        costs.append(_cost(params, *args))
+        params = optimize.minimize(_cost, params, args = args, method = 'Powell',
+                                   options = {'xtol': 0.05, 'ftol': 1e-4, 'maxfev': 2000}).x
+    return {'matrix': rigid_matrix(params, center).tolist(), 'params': params.tolist(), 'center': center.tolist(),
+            'cost_before': float(costs[0]), 'cost_after': float(_cost(params, *args))}
+
+
+# follow-up label map moved onto the first scan's grid (nearest neighbour)
+def transfer_labels(labels, labels_affine, fixed_shape, fixed_affine, matrix):
+    voxel = np.linalg.inv(labels_affine) @ np.asarray(matrix) @ fixed_affine
+    return ndimage.affine_transform(labels, voxel[:3, :3], offset = voxel[:3, 3], output_shape = tuple(fixed_shape[:3]),
+                                    order = 0, mode = 'constant', cval = 0)
+
+
+# new and resolved voxels between the first scan's labels and the transferred follow-up labels
+# returns (new label map, resolved label map, volumes in mL per compartment)
+def expansion_maps(first, follow_up, voxel_ml, compartments = LABELS):
+    new = np.where((follow_up != first) & (follow_up > 0), follow_up, 0).astype('uint8')
+    resolved = np.where((follow_up != first) & (first > 0), first, 0).astype('uint8')
+    new_counts = np.bincount(new.ravel(), minlength = max(compartments.values()) + 1)
+    resolved_counts = np.bincount(resolved.ravel(), minlength = max(compartments.values()) + 1)
+    volumes = {}
+    for name, value in compartments.items():
+        volumes[f'new_{name}_volume_ml'] = new_counts[value] * voxel_ml
+        volumes[f'resolved_{name}_volume_ml'] = resolved_counts[value] * voxel_ml
+    return new, resolved, volumes
+
+
+# cache key of a transform: content hashes of both CTs and the registration settings
+def cache_key(fixed_digest, moving_digest):
+    digest = hashlib.blake2b(digest_size = 16)
+    digest.update(json.dumps([fixed_digest, moving_digest, VERSION, LEVELS, HU_RANGE, HEAD_HU, N_POINTS]).encode())
+    return digest.hexdigest()
+
+
+# register every follow-up scan of one patient to the first scan; returns (rows, sparse maps, digests)
+# task: scans (rows with id, scan_number, image, prediction; sorted by scan_number), transform folder and digests
+def register_patient(task):
+    scans, folder, digests = task['scans'], task['folder'], task['digests']
+    first = scans[0]
+    rows, maps = [], {}
+    try:
+        fixed = load_image(first['image'])
+        first_labels = load_image(first['prediction'])
+        first_label_data = np.asarray(first_labels.dataobj, dtype = 'uint8')
+        voxel_ml = float(np.prod(first_labels.header.get_zooms()[:3])) / 1000
+        fixed_digest = file_digest(first['image'], digests)
+    except Exception as e:
+        error = f'first scan: {type(e).__name__}: {e}'
+        return [{'id': scan['id'], 'first_id': first['id'], 'scan_number': scan['scan_number'], 'error': error}
+                for scan in scans[1:]], maps, digests
+
+    for scan in scans[1:]:
+        row = {'id': scan['id'], 'first_id': first['id'], 'scan_number': scan['scan_number'], 'cached': False, 'error': None}
+        try:
+            path = os.path.join(folder, f"{cache_key(fixed_digest, file_digest(scan['image'], digests))}.json")
+            if os.path.exists(path):
+                with open(path) as f:
+                    transform = json.load(f)
+                row['cached'] = True
+            else:
+                transform = register(fixed, load_image(scan['image']))
+                with open(path + '.tmp', 'w') as f:
+                    json.dump(transform, f)
+                os.replace(path + '.tmp', path)
+
+            labels = load_image(scan['prediction'])
+            moved = transfer_labels(np.asarray(labels.dataobj, dtype = 'uint8'), labels.affine, first_label_data.shape,
+                                    first_labels.affine, transform['matrix'])
+            new, resolved, volumes = expansion_maps(first_label_data, moved, voxel_ml)
+            maps[f"{scan['id']}_new"] = encode_mask(new, first_labels.affine)
+            maps[f"{scan['id']}_resolved"] = encode_mask(resolved, first_labels.affine)
+
+            row.update({f'rotation_{axis}_deg': value for axis, value in zip('xyz', transform['params'][:3])})
+            row.update({f'translation_{axis}_mm': value for axis, value in zip('xyz', transform['params'][3:])})
+            row.update({'cost_before': transform['cost_before'], 'cost_after': transform['cost_after']})
+            row.update(volumes)
+        except Exception as e:
+            row['error'] = f'{type(e).__name__}: {e}'
+        rows.append(row)
+    return rows, maps, digests
+
+
+# register the follow-up scans of every patient with more than one scan, patients in a process pool
+# scans: rows with unique_study_id, id, scan_number, image and prediction
+# returns (one row per follow-up scan, {'<id>_new' / '<id>_resolved': sparse mask})
+def register_cohort(scans, jobs = 1, registration_dir = REGISTRATION_DIR):
+    folder = os.path.join(registration_dir, 'transforms')
+    os.makedirs(folder, exist_ok = True)
+
+    # content hashes of the CTs are kept with their size and modification time, so unchanged files are not re-read
+    digest_path = os.path.join(registration_dir, 'digests.json')
+    digests = {}
+    if os.path.exists(digest_path):
+        with open(digest_path) as f:
+            digests = json.load(f)
+
+    tasks = []
+    for _, patient in scans.sort_values(['unique_study_id', 'scan_number', 'id']).groupby('unique_study_id', sort = False):
+        if len(patient) < 2:
+            continue
+        rows = patient.to_dict('records')
+        tasks.append({'scans': rows, 'folder': folder,
+                      'digests': {row['image']: digests[row['image']] for row in rows if row['image'] in digests}})
+
+    if jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers = jobs) as pool:
+            results = list(pool.map(register_patient, tasks, chunksize = max(1, len(tasks) // (jobs * 8))))
+    else:
+        results = [register_patient(task) for task in tasks]
+
+    rows, maps = [], {}
+    for patient_rows, patient_maps, patient_digests in results:
+        rows += patient_rows
+        maps.update(patient_maps)
+        digests.update(patient_digests)
+    with open(digest_path + '.tmp', 'w') as f:
+        json.dump(digests, f)
+    os.replace(digest_path + '.tmp', digest_path)
+    return pd.DataFrame(rows), maps
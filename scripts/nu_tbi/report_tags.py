@@ -0,0 +1,216 @@
+# Date: 10-19-2026
+# Objective: Tag radiology reports with keyword flags (trauma, fall, injury, ..., portable, 8-slice) in one pass.
+# All keyword terms, negation cues and sentence ends are compiled into one Aho-Corasick automaton (a byte level DFA),
+# so the reports are scanned once no matter how many terms there are. The reports of a chunk are joined into one byte
+# string that is split into lanes; numpy advances every lane by one byte per step. A negation cue (e.g. ' no ',
+# ' negative for ') suppresses negatable flags from the cue to the end of the sentence.
+# Chunks are tagged in parallel and returned as a boolean matrix with one column per flag.
+#
+#   tags = tag_reports(rad_reports['report'], jobs = 8)
+#   tags = tag_reports(reports, keywords = dict(KEYWORDS, contusion = ['contusion']))
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# flag -> terms; terms are matched as lower case substrings, as in the keyword search (str.contains)
+KEYWORDS = {
+    'trauma': ['trauma'],
+    'fall': ['fall'],
+    'injury': ['injury'],
+    'assault': ['assault'],
+    'auto': ['auto'],
+    ' hemorrhage ': [' hemorrhage '],
+    'portable': ['portable'],
+    '8-slice': ['8-slice', '8 slice'],
+}
+
+# flags computed from other flags: name -> ('any' or 'all', [flags])
+DERIVED = {
+    'any trauma': ('any', ['trauma', 'fall', 'injury', 'assault', 'auto']),
+    'posttraumatic hemorrhage': ('all', ['any trauma', ' hemorrhage ']),
+}
+
+# cues that negate the rest of the sentence, and the flags they apply to
+NEGATIONS = [' no ', ' without ', ' negative for ', ' no evidence of ', ' rule out ', ' r/o ']
+NEGATABLE = [' hemorrhage ']
+
+SENTENCE_ENDS = ['. ', '; ', '\n']
+
+# reports of a chunk are joined into one string, each preceded by this character (also a sentence end)
+REPORT_SEPARATOR = '\x00'
+
+_KEYWORD, _NEGATION, _BOUNDARY = 0, 1, 2
+
+
+# build the Aho-Corasick automaton for a list of byte strings
+# returns the transition table (states x 256) and, for each state, the terms that end there (csr: start, count, terms)
+def build_automaton(terms):
+    goto = [{}]
+    outputs = [[]]
+    for term_id, term in enumerate(terms):
+        state = 0
+        for byte in term:
+            if byte not in goto[state]:
+                goto[state][byte] = len(goto)
+                goto.append({})
+                outputs.append([])
+            state = goto[state][byte]
+        outputs[state].append(term_id)
+
+    # breadth first: a state's missing transitions are those of its failure state
+    delta = np.zeros((len(goto), 256), dtype = 'int32')
+    fail = np.zeros(len(goto), dtype = 'int32')
+    queue = deque()
+    for byte, child in goto[0].items():
+        delta[0, byte] = child
+        queue.append(child)
+    while queue:
+        state = queue.popleft()
+        delta[state] = delta[fail[state]]
+        outputs[state] = outputs[state] + outputs[fail[state]]
+        for byte, child in goto[state].items():
+            fail[child] = delta[fail[state], byte] if state else 0
+            delta[state, byte] = child
+            queue.append(child)
+
+    count = np.array([len(o) for o in outputs], dtype = 'int64')
+    start = np.concatenate([[0], np.cumsum(count)[:-1]])
+    values = np.array([t for o in outputs for t in o], dtype = 'int64')
+    return delta, (start, count, values)
+
+
+# expand csr rows: for each key, every value of its row; returns (position of the key, value)
+def _expand(csr, keys):
+    start, count, values = csr
+    counts = count[keys]
+    owner = np.repeat(np.arange(len(keys)), counts)
+    offset = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return owner, values[start[keys][owner] + offset]
+
+
+# run the automaton over data (uint8 array); returns the end position and term id of every match
+# the data is split into lanes that are scanned in lockstep; each lane starts `warmup` bytes early so matches that
+# cross into the lane are found, and only matches ending inside the lane are kept
+def scan(delta, csr, data, warmup, lanes = 4096):
+    n = len(data)
+    if n == 0:
+        return np.zeros(0, dtype = 'int64'), np.zeros(0, dtype = 'int64')
+    lanes = max(1, min(lanes, n // (4 * warmup) or 1))
+    width = -(-n // lanes)
+    padded = np.concatenate([np.zeros(warmup, dtype = 'uint8'), data, np.zeros(lanes * width - n, dtype = 'uint8')])
+    starts = np.arange(lanes, dtype = 'int64') * width
+    has_output = csr[1] > 0
+
+    state = np.zeros(lanes, dtype = 'int32')
+    positions, states = [], []
+    for step in range(warmup + width):
+        state = delta[state, padded[starts + step]]
+        if step >= warmup:
+            hits = np.flatnonzero(has_output[state])
+            if len(hits):
+                positions.append(starts[hits] + step - warmup)
+                states.append(state[hits])
+    if not positions:
+        return np.zeros(0, dtype = 'int64'), np.zeros(0, dtype = 'int64')
+
+    positions = np.concatenate(positions)
+    states = np.concatenate(states)
+    keep = positions < n
+    owner, term_ids = _expand(csr, states[keep])
+    return positions[keep][owner], term_ids
+
+
+# compile the keywords, negation cues and sentence ends into one automaton
+def compile_tagger(keywords = KEYWORDS, negations = NEGATIONS, negatable = NEGATABLE):
+    flags = list(keywords)
+    terms = {}
+    for i, flag in enumerate(flags):
+        for term in keywords[flag]:
+            terms.setdefault(term.lower(), {'kind': _KEYWORD, 'flags': []})['flags'].append(i)
+    for term in negations:
+        terms.setdefault(term.lower(), {'kind': _NEGATION, 'flags': []})
+        if term.startswith(' '):
+            terms.setdefault(REPORT_SEPARATOR + term[1:].lower(), {'kind': _NEGATION, 'flags': []})
+    for term in SENTENCE_ENDS + [REPORT_SEPARATOR]:
+        terms.setdefault(term, {'kind': _BOUNDARY, 'flags': []})
+
+    encoded = [term.encode('utf-8') for term in terms]
+    delta, csr = build_automaton(encoded)
+    flag_count = np.array([len(t['flags']) for t in terms.values()], dtype = 'int64')
+    return {'delta': delta,
+            'csr': csr,
+            'warmup': max(len(term) for term in encoded),
+            'kind': np.array([t['kind'] for t in terms.values()], dtype = 'int8'),
+            'length': np.array([len(term) for term in encoded], dtype = 'int64'),
+            'term_flags': (np.concatenate([[0], np.cumsum(flag_count)[:-1]]), flag_count,
+                           np.array([f for t in terms.values() for f in t['flags']], dtype = 'int64')),
+            'negatable': np.array([flag in negatable for flag in flags], dtype = bool),
+            'n_flags': len(flags)}
+
+
+# for each x, the largest value in sorted `values` that is before x (side = 'left': < x, 'right': <= x), else `default`
+def _last_before(values, x, side, default):
+    return np.concatenate([[default], values])[np.searchsorted(values, x, side = side)]
+
+
+# tag a list of reports; returns a boolean matrix (reports x keyword flags)
+def _tag_chunk(args):
+    reports, keywords, negations, negatable = args
+    tagger = compile_tagger(keywords, negations, negatable)
+    tags = np.zeros((len(reports), tagger['n_flags']), dtype = bool)
+
+    # every report is preceded by the separator, which stands in for the space before a cue at the start of a report
+    pieces = [report.lower().replace(REPORT_SEPARATOR, ' ').encode('utf-8') if isinstance(report, str) else b''
+              for report in reports]
+    lengths = np.array([len(piece) + 1 for piece in pieces], dtype = 'int64')
+    report_starts = np.cumsum(lengths) - lengths
+    data = np.frombuffer(b''.join(REPORT_SEPARATOR.encode() + piece for piece in pieces), dtype = 'uint8')
+
+    ends, term_ids = scan(tagger['delta'], tagger['csr'], data, tagger['warmup'])
+    kinds = tagger['kind'][term_ids]
+    term_starts = ends - tagger['length'][term_ids] + 1
+
+    # a keyword is negated when a cue starts before it and no sentence end lies between the cue and the keyword
+    keyword = kinds == _KEYWORD
+    starts = term_starts[keyword]
+    last_boundary = _last_before(np.sort(ends[kinds == _BOUNDARY]), starts, 'right', -1)
+    last_cue = _last_before(np.sort(term_starts[kinds == _NEGATION]), starts, 'left', -2)
+    negated = last_cue >= last_boundary
+
+    owner, flags = _expand(tagger['term_flags'], term_ids[keyword])
+    keep = ~(negated[owner] & tagger['negatable'][flags])
+    rows = np.searchsorted(report_starts, starts[owner][keep], side = 'right') - 1
+    tags[rows, flags[keep]] = True
+    return tags
+
+
+# tag every report with every flag; returns (boolean matrix, flag names), derived flags last
+def tag_matrix(reports, keywords = KEYWORDS, derived = DERIVED, negations = NEGATIONS, negatable = NEGATABLE,
+               jobs = 1, chunk_size = 100000):
+    reports = list(reports)
+    chunks = [(reports[i:i + chunk_size], keywords, negations, negatable) for i in range(0, len(reports), chunk_size)]
+    if jobs > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers = jobs) as pool:
+            parts = list(pool.map(_tag_chunk, chunks))
+    else:
+        parts = [_tag_chunk(chunk) for chunk in chunks]
+    tags = np.concatenate(parts) if parts else np.zeros((0, len(keywords)), dtype = bool)
+
+    flags = list(keywords)
+    for name, (how, sources) in derived.items():
+        columns = tags[:, [flags.index(source) for source in sources]]
+        tags = np.column_stack([tags, columns.any(axis = 1) if how == 'any' else columns.all(axis = 1)])
+        flags.append(name)
+    return tags, flags
+
+
+# tag every report with every flag; returns a boolean dataframe aligned to `reports`
+def tag_reports(reports, keywords = KEYWORDS, derived = DERIVED, negations = NEGATIONS, negatable = NEGATABLE,
+                jobs = 1, chunk_size = 100000):
+    index = reports.index if isinstance(reports, pd.Series) else None
+    tags, flags = tag_matrix(reports, keywords = keywords, derived = derived, negations = negations,
+                             negatable = negatable, jobs = jobs, chunk_size = chunk_size)
+    return pd.DataFrame(tags, columns = flags, index = index)
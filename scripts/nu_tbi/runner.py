@@ -0,0 +1,288 @@
+# Date: 10-19-2026
+# Objective: Run the numbered pipeline scripts in dependency order and skip stages whose inputs have not changed.
+# Each stage declares the files/folders it reads and writes (relative to NU_TBI/). A stage is rerun only if its script,
+# one of its inputs, or one of its outputs changed since the last successful run (content hashes are stored in STATE_PATH).
+# Stages that do not depend on each other run concurrently. If a rerun produces byte-identical outputs, downstream stages
+# see unchanged inputs and are skipped. The file outputs of a stage are copied before it runs; a file the stage rewrote
+# with the same content is replaced by its copy, so it keeps its modification time (caches keyed on size and mtime stay
+# valid), and a failed stage gets its previous outputs back. Folder outputs are not copied: files rewritten inside them
+# keep their new modification time.
+#
+# Stages 02/03 (traumaScanner and TBI patient identification) and blast-ct inference (README/03_run_blast_ct.md) are not
+# run here; their outputs are treated as external inputs.
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from nu_tbi.hashing import file_digest, path_digest
+from nu_tbi.paths import HEMORRHAGE_PROJECT_DIR
+
+# interpreter running the pipeline (e.g. the project's venv or conda env), used for every python stage
+PYTHON = sys.executable
+
+STATE_PATH = 'data/processed/.pipeline_state.json'
+
+MANUAL_REVIEW = 'data/processed/manual_review/02_initial_tbi_patient_list_inclusion.xlsx'
+
+# transferred DICOM series on the share, read by 05 (headers) and process_nifti (conversion to nifti)
+# folders are hashed from the size and modification time of their files, so a changed or added series reruns both
+DICOM_DIRS = [os.path.join(HEMORRHAGE_PROJECT_DIR, 'Transfer20211010/images'),
+              os.path.join(HEMORRHAGE_PROJECT_DIR, 'HemorrhageTransfer20231128/images')]
+
+STAGES = [
+    {'name': '01_prepare_radiology_reports',
+     'command': [PYTHON, 'scripts/01_prepare_radiology_reports.py'],
+     'inputs': ['data/suidDFFound.csv', 'data/post_traumatic_hemorrhage_search.xlsx', 'data/suid_reports_identifiers_master_list.csv'],
+     'outputs': ['data/processed/suid_rad_reports.csv']},
+    {'name': '04_prepare_cohort_scans',
+     'command': [PYTHON, 'scripts/04_prepare_cohort_scans.py'],
+     'inputs': ['data/processed/20240325_1136_tbi_patients_scans_to_include.csv',
+                'data/HemorrhageProject/Transfer20211010/LocalIdentifierList.txt',
+                'data/HemorrhageProject/HemorrhageTransfer20231128/LocalIdentifierList.txt'],
+     'outputs': ['data/processed/tbi_scan_file_paths.csv']},
+    {'name': '05_abstract_dicom_header',
+     'command': [PYTHON, 'scripts/05_abstract_dicom_header.py'],
+     'inputs': ['data/processed/tbi_scan_file_paths.csv'] + DICOM_DIRS,
+     'outputs': ['data/processed/dicom_header_table.csv', 'data/processed/dicom_header_table_processed.csv',
+                 'data/processed/dicom_inventory.csv', 'data/processed/dicom_inventory.parquet']},
+    {'name': '06_prepare_axial_brain_windows',
+     'command': [PYTHON, 'scripts/06_prepare_axial_brain_windows.py'],
+     'inputs': ['data/processed/tbi_scan_file_paths.csv', 'data/processed/dicom_header_table_processed.csv'],
+     'outputs': ['data/processed/axial_brain_folders.txt', 'data/processed/dicom_header_table_axial_brain_window_processed.csv']},
+    {'name': 'process_nifti',
+     'command': ['sh', 'scripts/process_nifti.sh'],
+     'inputs': ['data/processed/axial_brain_folders.txt'] + DICOM_DIRS,
+     'outputs': ['nifti_images']},
+    {'name': '07_prepare_blast_ct',
+     'command': [PYTHON, 'scripts/07_prepare_blast_ct.py'],
+     'inputs': ['nifti_images'],
+     'outputs': ['data/processed/nifti_file_paths.csv', 'data/processed/blast_ct_batches',
+                 'data/processed/series_fingerprints.csv', 'data/processed/duplicate_series.csv']},
+    {'name': '08_prepare_predictions',
+     'command': [PYTHON, 'scripts/08_prepare_predictions.py'],
+     'inputs': ['data/processed/tbi_scan_file_paths.csv', 'data/processed/blast_ct_predictions',
+                'data/processed/20240325_1136_tbi_patients_scans_to_include_all.csv', 'data/processed/duplicate_series.csv'],
+     'outputs': ['data/processed/prepped_predictions.csv', 'data/processed/prepped_predictions.parquet']},
+    {'name': '09_filter_predictions',
+     'command': [PYTHON, 'scripts/09_filter_predictions.py'],
+     'inputs': ['data/processed/prepped_predictions.parquet', MANUAL_REVIEW],
+     'outputs': ['data/processed/tbi_cohort/0_initial_tbi_scans_volumes_v3.csv',
+                 'data/processed/tbi_cohort/0_initial_tbi_scans_volumes_v3.parquet',
+                 'data/processed/tbi_cohort/0_initial_tbi_scans_regional_volumes_v3.csv',
+                 'data/processed/tbi_cohort/0_initial_tbi_scans_regional_volumes_v3.parquet']},
+    {'name': '10_tbi_cohort_inclusion',
+     'command': [PYTHON, 'scripts/10_tbi_cohort_inclusion.py'],
+     'inputs': ['data/processed/tbi_cohort/0_initial_tbi_scans_volumes_v3.parquet', 'data/processed/suid_rad_reports.csv', MANUAL_REVIEW],
+     'outputs': []},
+    {'name': '11_prepare_cohort',
+     'command': [PYTHON, 'scripts/11_prepare_cohort.py'],
+     'inputs': ['data/processed/tbi_cohort/0_initial_tbi_scans_volumes_v3.parquet',
+                'data/processed/tbi_cohort/0_initial_tbi_scans_regional_volumes_v3.parquet',
+                'data/processed/suid_rad_reports.csv', MANUAL_REVIEW,
+                'data/processed/manual_review/02_initial_tbi_patient_list_inclusion_2ml.xlsx'],
+     'outputs': ['data/modeling/tbi_data_first_scan_v3.csv', 'data/modeling/tbi_data_all_scans_v3.csv',
+                 'data/modeling/tbi_data_first_scan_v3.parquet', 'data/modeling/tbi_data_all_scans_v3.parquet',
+                 'data/modeling/tbi_data_all_scans_regional_v3.csv', 'data/modeling/tbi_data_all_scans_regional_v3.parquet',
+                 'data/modeling/outcome_threshold_sweep.csv']},
+    {'name': '13_extract_lesion_features',
+     'command': [PYTHON, 'scripts/13_extract_lesion_features.py'],
+     'inputs': ['data/modeling/tbi_data_all_scans_v3.parquet', 'data/processed/prepped_predictions.parquet',
+                'data/processed/blast_ct_predictions', 'nifti_images'],
+     'outputs': ['data/modeling/lesion_features_v1.csv', 'data/modeling/lesion_features_v1.parquet']},
+    {'name': '14_resample_volumes',
+     'command': [PYTHON, 'scripts/14_resample_volumes.py'],
+     'inputs': ['data/modeling/tbi_data_all_scans_v3.parquet', 'data/processed/prepped_predictions.parquet',
+                'data/processed/blast_ct_predictions', 'nifti_images'],
+     'outputs': ['data/processed/resampled']},
+    {'name': '15_encode_sparse_masks',
+     'command': [PYTHON, 'scripts/15_encode_sparse_masks.py'],
+     'inputs': ['data/processed/prepped_predictions.parquet', 'data/processed/blast_ct_predictions'],
+     'outputs': ['data/processed/sparse_masks/masks.npz', 'data/processed/sparse_masks/index.csv']},
+    {'name': '16_register_follow_up_scans',
+     'command': [PYTHON, 'scripts/16_register_follow_up_scans.py'],
+     'inputs': ['data/modeling/tbi_data_all_scans_v3.parquet', 'data/processed/prepped_predictions.parquet',
+                'data/processed/blast_ct_predictions', 'nifti_images'],
+     'outputs': ['data/modeling/registered_expansion_v1.csv', 'data/modeling/registered_expansion_v1.parquet',
+                 'data/processed/registration/maps.npz']},
+    {'name': '12_prepare_training_test',
+     'command': [PYTHON, 'scripts/12_prepare_training_test.py'],
+     'inputs': ['data/modeling/tbi_data_first_scan_v3.parquet', 'data/modeling/tbi_data_all_scans_v3.parquet'],
+     'outputs': ['data/modeling/model1_structured_radiographic']},
+]
+
+
+# return the script file of a stage (the last argument of its command)
+def stage_script(stage):
+    return stage['command'][-1]
+
+
+def load_state(path = STATE_PATH):
+    if not os.path.exists(path):
+        return {'stages': {}, 'files': {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(state, path = STATE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok = True)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(state, f, indent = 1, sort_keys = True)
+    os.replace(temp_path, path)
+
+
+# return a dictionary of stage name -> names of the stages that produce its inputs
+def stage_dependencies(stages):
+    producers = {}
+    for stage in stages:
+        for output in stage['outputs']:
+            producers[os.path.normpath(output)] = stage['name']
+
+    dependencies = {}
+    for stage in stages:
+        dependencies[stage['name']] = set()
+        for input_path in stage['inputs']:
+            input_path = os.path.normpath(input_path)
+            for output, producer in producers.items():
+                # an input inside an output folder also depends on the producer of that folder
+                if (input_path == output or input_path.startswith(output + os.sep)) and producer != stage['name']:
+                    dependencies[stage['name']].add(producer)
+    return dependencies
+
+
+# compute the fingerprint (script + input hashes) of a stage
+def stage_fingerprint(stage, cache):
+    return {'script': path_digest(stage_script(stage), cache),
+            'command': ' '.join(stage['command']),
+            'inputs': {path: path_digest(path, cache) for path in stage['inputs']}}
+
+
+# a stage is up to date if its fingerprint matches the last successful run and its outputs were not changed since
+def is_up_to_date(stage, fingerprint, state, cache):
+    previous = state['stages'].get(stage['name'])
+    if previous is None or previous.get('fingerprint') != fingerprint:
+        return False
+    outputs = {path: path_digest(path, cache) for path in stage['outputs']}
+    return all(digest is not None for digest in outputs.values()) and outputs == previous.get('outputs')
+
+
+# copy the file outputs of a stage (with their modification times) before it runs; returns path -> (copy, digest)
+def backup_outputs(stage, cache):
+    backups = {}
+    for path in stage['outputs']:
+        if os.path.isfile(path):
+            backup = path + '.previous'
+            shutil.copy2(path, backup)
+            backups[path] = (backup, file_digest(path, cache))
+    return backups
+
+
+# put back the copy of every output that the stage rewrote with the same content (or of every output if the stage
+# failed); the other copies are removed
+def restore_outputs(backups, failed = False):
+    for path, (backup, digest) in backups.items():
+        if failed or (os.path.isfile(path) and file_digest(path, {}) == digest):
+            os.replace(backup, path)
+        else:
+            os.remove(backup)
+
+
+def run_stage(stage, log_dir, run_id, cache):
+    os.makedirs(log_dir, exist_ok = True)
+    log_path = os.path.join(log_dir, stage['name'] + '.log')
+    start = time.time()
+    # spans recorded by nu_tbi/instrument.py in each stage share the run id of this pipeline run
+    env = dict(os.environ, NU_TBI_RUN_ID = run_id)
+    backups = backup_outputs(stage, cache)
+    try:
+        with open(log_path, 'w') as log:
+            result = subprocess.run(stage['command'], stdout = log, stderr = subprocess.STDOUT, env = env)
+    except BaseException:
+        restore_outputs(backups, failed = True)
+        raise
+    restore_outputs(backups, failed = result.returncode != 0)
+    return result.returncode, (time.time() - start) / 60, log_path
+
+
+# run the pipeline; `selected` restricts the run to the named stages (their upstream stages are not rerun)
+# `force` reruns the selected stages even if they are up to date
+def run_pipeline(stages = STAGES, selected = None, force = False, jobs = 2, dry_run = False,
+                 state_path = STATE_PATH, log_dir = 'data/processed/pipeline_logs'):
+    state = load_state(state_path)
+    cache = state.setdefault('files', {})
+    dependencies = stage_dependencies(stages)
+    by_name = {stage['name']: stage for stage in stages}
+    if selected is not None:
+        selected = [name for name in by_name if any(name.startswith(s) for s in selected)]
+    pending = [stage['name'] for stage in stages if selected is None or stage['name'] in selected]
+
+    run_id = time.strftime('%Y%m%d_%H%M%S') + '_pipeline'
+    summary = {}
+    running = {}
+    failed = set()
+
+    with ThreadPoolExecutor(max_workers = jobs) as pool:
+        while pending or running:
+            # start every pending stage whose upstream stages have finished
+            for name in list(pending):
+                upstream = dependencies[name] & set(pending + list(running.values()))
+                if upstream:
+                    continue
+                pending.remove(name)
+                stage = by_name[name]
+
+                if dependencies[name] & failed:
+                    summary[name] = 'skipped (upstream failed)'
+                    failed.add(name)
+                    continue
+
+                missing = [path for path in stage['inputs'] if not os.path.exists(path)]
+                if missing:
+                    summary[name] = 'missing inputs: ' + ', '.join(missing)
+                    failed.add(name)
+                    continue
+
+                fingerprint = stage_fingerprint(stage, cache)
+                if not force and is_up_to_date(stage, fingerprint, state, cache):
+                    summary[name] = 'up to date'
+                    continue
+                if dry_run:
+                    summary[name] = 'would run'
+                    continue
+
+                print('running', name)
+                future = pool.submit(run_stage, stage, log_dir, run_id, cache)
+                future.fingerprint = fingerprint
+                running[future] = name
+
+            if not running:
+                if pending and all(dependencies[name] & set(pending) for name in pending):
+                    raise RuntimeError('circular stage dependencies: ' + ', '.join(pending))
+                continue
+
+            done, _ = wait(list(running), return_when = FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                stage = by_name[name]
+                returncode, minutes, log_path = future.result()
+                if returncode != 0:
+                    summary[name] = f'failed (exit {returncode}, see {log_path})'
+                    failed.add(name)
+                    continue
+
+                previous_outputs = state['stages'].get(name, {}).get('outputs')
+                outputs = {path: path_digest(path, cache) for path in stage['outputs']}
+                state['stages'][name] = {'fingerprint': future.fingerprint, 'outputs': outputs, 'minutes': minutes}
+                save_state(state, state_path)
+
+                changed = 'outputs unchanged' if outputs == previous_outputs else 'outputs updated'
+                summary[name] = f'ran in {minutes:.1f} minutes ({changed})'
+
+    save_state(state, state_path)
+    return summary
+
@@ -0,0 +1,180 @@
+# Date: 10-19-2026
+# Objective: A long-lived segmentation worker: the model is loaded once, and blast-ct style batch files
+# (data/processed/blast_ct_batches/blast_ct_batch_<n>.csv: id, image) dropped into a local queue folder are segmented
+# one after another, without starting a new process (and re-importing torch / reloading weights) for every batch.
+#
+#   <queue_dir>/incoming/   batch files waiting; processed in batch number order (submit_batches copies them here)
+#   <queue_dir>/running/    the batch being segmented
+#   <queue_dir>/done/       finished batches (failed/ if the batch file itself could not be read)
+#   <queue_dir>/STOP        create this file to stop the worker after the current scan
+#
+# Results use blast-ct's layout: <output_dir>/batch_<n>/predictions/<id>_prediction.nii.gz and prediction.csv with
+# id, image, prediction and the four compartment volumes. A row is appended to prediction.csv as soon as its scan is
+# finished, so partial results can be read while a batch runs and a restarted worker skips scans already in the file.
+# The next PREFETCH images are read and decoded by a thread pool (nu_tbi.prefetch) while the model runs, so a batch
+# takes about max(read time, model time); the per-batch log line reports read, stall and model time and queue depth.
+#
+# Models: 'threshold' is a CPU stub (hemorrhage-range HU -> label 1) for testing the queue locally; 'module:function'
+# imports `function` from `module` and calls it once; it must return predict(image) -> label array with the image's
+# shape (values 1-4 as in blast-ct). The blast-ct adapter is such a function, written against the installed blast-ct.
+
+import csv
+import importlib
+import os
+import re
+import shutil
+import time
+from glob import glob
+
+import nibabel as nib
+import numpy as np
+import pandas as pd
+
+from nu_tbi.lesion_features import LABELS
+from nu_tbi.prefetch import format_metrics, prefetch as prefetch_volumes, read_volume
+
+# relative to NU_TBI/
+QUEUE_DIR = 'data/processed/segmentation_queue'
+OUTPUT_DIR = 'data/processed/blast_ct_predictions'
+
+PREFETCH = 2
+
+# HU range labelled as hemorrhage (label 1) by the threshold stub
+STUB_HU = (50, 90)
+
+PREDICTION_COLUMNS = ['id', 'image', 'prediction'] + [f'{name}_predicted_volume_ml' for name in LABELS]
+
+
+# CPU stub model: voxels in the acute blood HU range are labelled 1
+def threshold_model():
+    def predict(image):
+        data = np.asarray(image.dataobj, dtype = 'float32')
+        return ((data >= STUB_HU[0]) & (data <= STUB_HU[1])).astype('uint8')
+    return predict
+
+
+# load a model once: 'threshold' or 'module:function' (function() returns predict(image) -> labels)
+def load_model(spec):
+    if spec == 'threshold':
+        return threshold_model()
+    if ':' not in spec:
+        raise ValueError(f"unknown model '{spec}' (use 'threshold' or 'module:function')")
+    module, function = spec.split(':', 1)
+    return getattr(importlib.import_module(module), function)()
+
+
+# job folder of a batch file (blast_ct_batch_3.csv -> <output_dir>/batch_3)
+def job_dir(batch_path, output_dir = OUTPUT_DIR):
+    stem = os.path.splitext(os.path.basename(batch_path))[0]
+    return os.path.join(output_dir, stem.replace('blast_ct_', '', 1))
+
+
+# segment one loaded image and save its label map; returns its prediction.csv row
+def segment(predict, row, image, predictions_dir):
+    labels = np.asarray(predict(image), dtype = 'uint8')
+    if labels.shape != image.shape[:3]:
+        raise ValueError(f'model returned shape {labels.shape} for image shape {image.shape}')
+    path = os.path.join(predictions_dir, f"{row['id']}_prediction.nii.gz")
+    tmp = path.replace('.nii.gz', '.tmp.nii.gz')
+    nib.save(nib.Nifti1Image(labels, image.affine), tmp)
+    os.replace(tmp, path)
+
+    voxel_ml = float(np.prod(image.header.get_zooms()[:3])) / 1000
+    counts = np.bincount(labels.ravel(), minlength = max(LABELS.values()) + 1)
+    result = {'id': row['id'], 'image': row['image'], 'prediction': path}
+    result.update({f'{name}_predicted_volume_ml': counts[value] * voxel_ml for name, value in LABELS.items()})
+    return result
+
+
+# segment the scans of one batch file into its job folder, appending each finished scan to prediction.csv
+# scans already in prediction.csv are skipped; returns (number segmented, list of (id, error))
+# `metrics` (a dict) receives the prefetch metrics plus compute_seconds (model and saving) and wall_seconds
+def run_batch(predict, batch_path, output_dir = OUTPUT_DIR, prefetch = PREFETCH, stop_file = None, metrics = None):
+    metrics = metrics if metrics is not None else {}
+    start = time.perf_counter()
+    predictions_dir = os.path.join(job_dir(batch_path, output_dir), 'predictions')
+    os.makedirs(predictions_dir, exist_ok = True)
+    csv_path = os.path.join(predictions_dir, 'prediction.csv')
+    # a prediction.csv with only its header (no scan finished before a stop or failure) must not get a second one
+    has_header = os.path.exists(csv_path) and os.path.getsize(csv_path) > 0
+    finished = set(pd.read_csv(csv_path, usecols = ['id'])['id'].astype('str')) if has_header else set()
+
+    rows = [row for row in pd.read_csv(batch_path, dtype = 'str').to_dict('records') if row['id'] not in finished]
+    n_done, errors, compute = 0, [], 0.0
+    with open(csv_path, 'a', newline = '') as f:
+        writer = csv.DictWriter(f, fieldnames = PREDICTION_COLUMNS)
+        if not has_header:
+            writer.writeheader()
+        loaded = prefetch_volumes(rows, lambda row: read_volume(row['image']), depth = prefetch, metrics = metrics)
+        for row, image, error in loaded:
+            if stop_file and os.path.exists(stop_file):
+                loaded.close()
+                break
+            if error is None:
+                compute_start = time.perf_counter()
+                try:
+                    writer.writerow(segment(predict, row, image, predictions_dir))
+                    f.flush()
+                    n_done += 1
+                except Exception as e:
+                    error = f'{type(e).__name__}: {e}'
+                compute += time.perf_counter() - compute_start
+            if error is not None:
+                errors.append((row['id'], error))
+    metrics.update({'compute_seconds': compute, 'wall_seconds': time.perf_counter() - start})
+    return n_done, errors
+
+
+# batch files in numeric order (blast_ct_batch_2 before blast_ct_batch_10)
+def _batch_order(path):
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', os.path.basename(path))]
+
+
+# copy batch files into the queue
+def submit_batches(paths, queue_dir = QUEUE_DIR):
+    incoming = os.path.join(queue_dir, 'incoming')
+    os.makedirs(incoming, exist_ok = True)
+    for path in paths:
+        shutil.copy(path, os.path.join(incoming, os.path.basename(path)))
+
+
+# process queued batches with one loaded model until the queue is empty (once = True) or STOP is created
+# `log` is called with one message per batch
+def serve_queue(predict, queue_dir = QUEUE_DIR, output_dir = OUTPUT_DIR, poll_seconds = 10, once = False, prefetch = PREFETCH, log = print):
+    for name in ['incoming', 'running', 'done', 'failed']:
+        os.makedirs(os.path.join(queue_dir, name), exist_ok = True)
+    stop_file = os.path.join(queue_dir, 'STOP')
+    if os.path.exists(stop_file):
+        # left by the previous worker
+        os.remove(stop_file)
+
+    # a batch left in running/ by an interrupted worker is resumed first
+    for path in sorted(glob(os.path.join(queue_dir, 'running', '*.csv'))):
+        os.replace(path, os.path.join(queue_dir, 'incoming', os.path.basename(path)))
+
+    while not os.path.exists(stop_file):
+        waiting = sorted(glob(os.path.join(queue_dir, 'incoming', '*.csv')), key = _batch_order)
+        if not waiting:
+            if once:
+                break
+            time.sleep(poll_seconds)
+            continue
+
+        running = os.path.join(queue_dir, 'running', os.path.basename(waiting[0]))
+        os.replace(waiting[0], running)
+        start, metrics = time.time(), {}
+        try:
+            n_done, errors = run_batch(predict, running, output_dir = output_dir, prefetch = prefetch, stop_file = stop_file,
+                                       metrics = metrics)
+        except Exception as e:
+            os.replace(running, os.path.join(queue_dir, 'failed', os.path.basename(running)))
+            log(f'{os.path.basename(running)}: failed ({type(e).__name__}: {e})')
+            continue
+        if os.path.exists(stop_file):
+            log(f'{os.path.basename(running)}: stopped after {n_done} scans; it is resumed on the next start')
+            break
+        os.replace(running, os.path.join(queue_dir, 'done', os.path.basename(running)))
+        log(f'{os.path.basename(running)}: {n_done} scans segmented in {(time.time() - start) / 60:.2f} minutes, '
+            f'{len(errors)} errors' + (f' (first: {errors[0][0]}: {errors[0][1]})' if errors else ''))
+        if metrics.get('n'):
+            log(f'    {format_metrics(metrics, metrics["wall_seconds"], metrics["compute_seconds"])}')
@@ -0,0 +1,60 @@
+# Date: 10-19-2026
+# Objective: Select one image per group (e.g. one image per folder) with a single sort and a single group-first.
+# Used by scripts/09_filter_predictions.py in place of splitting tilt/non-tilt images, counting, merging and concatenating.
+
+import numpy as np
+import pandas as pd
+
+# images whose name contains one of these strings have been tilt/eq corrected by dcm2niix
+TILT_PATTERNS = ['tilt', '_Eq']
+
+
+# return a 0/1 rank for each row: 0 if the string contains any of the patterns (preferred), 1 otherwise
+def prefer_pattern(values, patterns = TILT_PATTERNS, case = False):
+    matches = pd.Series(values).astype('str').str.contains('|'.join(patterns), case = case, regex = True)
+    return np.where(matches.to_numpy(), 0, 1).astype('int8')
+
+
+# return a 0/1 rank for each row: 0 if the value is in `ids` (e.g. `id_to_keep` from manual review), 1 otherwise
+def prefer_ids(values, ids):
+    keep = pd.Series(values).isin(pd.Series(ids).dropna()).to_numpy()
+    return np.where(keep, 0, 1).astype('int8')
+
+
+# return a 0/1 rank for each row: 1 if the row is not `preferred` but another row in the same group is
+# e.g. a non-tilt image is superseded when a tilt corrected version of the same image exists
+def superseded_by(dataframe, group_cols, preferred):
+    preferred = np.asarray(preferred, dtype = bool)
+    codes = dataframe.groupby(group_cols, sort = False, dropna = False, observed = True).ngroup().to_numpy()
+    group_has_preferred = np.bincount(codes, weights = preferred, minlength = codes.max() + 1 if len(codes) else 0) > 0
+    return (group_has_preferred[codes] & ~preferred).astype('int8')
+
+
+# select the best row of each group
+# `rank_by` is a list of (key, ascending) tuples compared in order, where key is a column name or an array aligned to dataframe
+# ties keep the original row order (the sort is stable), which matches the previous `idxmin` behavior
+def select_best(dataframe, group_cols, rank_by):
+    if len(dataframe) == 0:
+        return dataframe.copy()
+
+    codes = dataframe.groupby(group_cols, sort = False, dropna = False, observed = True).ngroup().to_numpy()
+
+    # np.lexsort sorts by the last key first, so the group codes go last and the rank keys are reversed
+    sort_keys = []
+    for key, ascending in reversed(rank_by):
+        values = dataframe[key].to_numpy() if isinstance(key, str) else np.asarray(key)
+        if values.dtype.kind in 'mM':
+            values = values.astype('int64')
+        elif values.dtype.kind not in 'biuf':
+            values = pd.factorize(values, sort = True)[0]
+        sort_keys.append(values if ascending else -values.astype('float64'))
+    sort_keys.append(codes)
+
+    order = np.lexsort(sort_keys)
+    sorted_codes = codes[order]
+
+    # the first row of each group after sorting is the best candidate
+    first = np.ones(len(order), dtype = bool)
+    first[1:] = sorted_codes[1:] != sorted_codes[:-1]
+
+    return dataframe.iloc[np.sort(order[first])]
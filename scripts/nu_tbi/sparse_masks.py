@@ -0,0 +1,217 @@
+# Date: 10-19-2026
+# Objective: Sparse (run-length) encoding of blast-ct label maps.
+# Most predictions are empty or have hemorrhage in a small region, so a label map is stored as the runs of equal,
+# non-zero labels along the rows of each axial slice: (row, col, length, value), with row = z * nx + x and the run
+# covering voxels [x, col:col + length, z]. Runs are sorted by row, so one slice is a contiguous range of runs.
+# Voxel counts, bounding boxes, single slices (for overlays) and union/intersection/difference between two label maps
+# on the same grid are computed from the runs without decoding the volume. Label maps on different grids must first
+# be resampled to a common grid (scripts/14_resample_volumes.py).
+#
+#   mask = encode_mask(labels, affine)
+#   voxel_counts(mask)                  # voxels per label value
+#   slice_labels(mask, 12)              # labels[:, :, 12]
+#   union(first, second, label = 1)     # IPH on either scan, as a mask with value 1
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from nu_tbi.volume_store import load_image
+
+# relative to NU_TBI/
+SPARSE_DIR = 'data/processed/sparse_masks'
+
+RUN_COLUMNS = ['row', 'col', 'length', 'value']
+
+
+# encode a 3D label map (x, y, z); returns a dict with the shape, affine and run arrays
+def encode_mask(labels, affine = None):
+    labels = np.asarray(labels)
+    if labels.ndim != 3:
+        raise ValueError(f'expected a 3D label map, got shape {labels.shape}')
+    nx, ny, nz = labels.shape
+    rows = np.ascontiguousarray(np.moveaxis(labels, 2, 0)).reshape(nz * nx, ny)
+
+    # only rows with any label are scanned for runs
+    row_index = np.flatnonzero(rows.any(axis = 1))
+    flat = rows[row_index].ravel()
+    start = np.ones(len(flat), dtype = bool)
+    start[1:] = flat[1:] != flat[:-1]
+    start[::ny] = True
+    starts = np.flatnonzero(start)
+    lengths = np.diff(np.append(starts, len(flat)))
+    keep = flat[starts] != 0
+    starts, lengths = starts[keep], lengths[keep]
+
+    return {'shape': (nx, ny, nz),
+            'affine': np.eye(4) if affine is None else np.asarray(affine, dtype = 'float64'),
+            'row': row_index[starts // ny].astype('int32'),
+            'col': (starts % ny).astype('int32'),
+            'length': lengths.astype('int32'),
+            'value': flat[starts].astype('uint8')}
+
+
+# full label map of a mask (only for checks and consumers that need the array)
+def decode_mask(mask):
+    nx, ny, nz = mask['shape']
+    flat = np.zeros(nz * nx * ny, dtype = 'uint8')
+    if len(mask['length']):
+        # mark run starts with +value and run ends with -value, the running sum is the label
+        starts = mask['row'].astype('int64') * ny + mask['col']
+        delta = np.zeros(len(flat) + 1, dtype = 'int64')
+        np.add.at(delta, starts, mask['value'])
+        np.add.at(delta, starts + mask['length'], -mask['value'].astype('int64'))
+        flat[:] = np.cumsum(delta[:-1])
+    return np.moveaxis(flat.reshape(nz, nx, ny), 0, 2)
+
+
+# number of voxels of every label value (index = label value; background, index 0, is not counted)
+def voxel_counts(mask, minlength = 5):
+    return np.bincount(mask['value'], weights = mask['length'], minlength = minlength).astype('int64')
+
+
+# voxel bounds (low, high inclusive) of all labels or of one label along x, y, z; None if there are no such voxels
+def bounding_box(mask, label = None):
+    keep = mask['value'] > 0 if label is None else mask['value'] == label
+    if not keep.any():
+        return None
+    nx = mask['shape'][0]
+    row, col, length = mask['row'][keep], mask['col'][keep], mask['length'][keep]
+    x, z = row % nx, row // nx
+    return (np.array([x.min(), col.min(), z.min()]), np.array([x.max(), (col + length - 1).max(), z.max()]))
+
+
+# labels of one axial slice (labels[:, :, z]), decoded from that slice's runs only
+def slice_labels(mask, z):
+    nx, ny, nz = mask['shape']
+    if not 0 <= z < nz:
+        raise IndexError(f'slice {z} out of range for {nz} slices')
+    first, last = np.searchsorted(mask['row'], [z * nx, (z + 1) * nx])
+    plane = np.zeros(nx * ny, dtype = 'uint8')
+    for row, col, length, value in zip(mask['row'][first:last], mask['col'][first:last], mask['length'][first:last],
+                                       mask['value'][first:last]):
+        start = (row - z * nx) * ny + col
+        plane[start:start + length] = value
+    return plane.reshape(nx, ny)
+
+
+# runs as half-open intervals of one flat coordinate; rows are one voxel apart so runs of adjacent rows never touch
+def _intervals(mask, label):
+    keep = mask['value'] > 0 if label is None else mask['value'] == label
+    starts = mask['row'][keep].astype('int64') * (mask['shape'][1] + 1) + mask['col'][keep]
+    return starts, starts + mask['length'][keep]
+
+
+# combine the voxels of two masks on the same grid; `keep` selects the coverage values to keep
+# (coverage: 1 = first mask only, 2 = second only, 3 = both)
+def _combine(first, second, label, keep):
+    if tuple(first['shape']) != tuple(second['shape']) or not np.allclose(first['affine'], second['affine'], atol = 1e-3):
+        raise ValueError('masks are on different grids; resample them to a common grid first')
+    ny = first['shape'][1]
+    (start_1, end_1), (start_2, end_2) = _intervals(first, label), _intervals(second, label)
+
+    # sweep over the interval ends: coverage after each position is the sum of the open intervals' weights
+    position = np.concatenate([start_1, end_1, start_2, end_2])
+    weight = np.concatenate([np.full(len(start_1), 1), np.full(len(end_1), -1),
+                             np.full(len(start_2), 2), np.full(len(end_2), -2)]).astype('int64')
+    order = np.argsort(position, kind = 'stable')
+    position, coverage = position[order], np.cumsum(weight[order])
+
+    # segments between consecutive distinct positions, with the coverage after the last event at the segment start
+    last = np.append(position[1:] != position[:-1], True) if len(position) else np.zeros(0, dtype = bool)
+    seg_start, seg_coverage = position[last][:-1], coverage[last][:-1]
+    seg_end = position[last][1:]
+    selected = np.isin(seg_coverage, keep)
+    seg_start, seg_end = seg_start[selected], seg_end[selected]
+
+    # merge touching segments
+    if len(seg_start):
+        new = np.append(True, seg_start[1:] != seg_end[:-1])
+        seg_start, seg_end = seg_start[new], seg_end[np.append(new[1:], True)]
+
+    return {'shape': tuple(first['shape']), 'affine': first['affine'],
+            'row': (seg_start // (ny + 1)).astype('int32'),
+            'col': (seg_start % (ny + 1)).astype('int32'),
+            'length': (seg_end - seg_start).astype('int32'),
+            'value': np.full(len(seg_start), 1 if label is None else label, dtype = 'uint8')}
+
+
+# voxels labelled (with `label`, or any label) in either mask
+def union(first, second, label = None):
+    return _combine(first, second, label, [1, 2, 3])
+
+
+# voxels labelled in both masks
+def intersection(first, second, label = None):
+    return _combine(first, second, label, [3])
+
+
+# voxels labelled in the first mask but not the second
+def difference(first, second, label = None):
+    return _combine(first, second, label, [1])
+
+
+# encode one scan's prediction (row with id and prediction path, nifti or .vol); errors are returned instead of raised
+def encode_file(row):
+    try:
+        image = load_image(row['prediction'])
+        return row['id'], encode_mask(np.asarray(image.dataobj, dtype = 'uint8'), image.affine), None
+    except Exception as e:
+        return row['id'], None, f'{type(e).__name__}: {e}'
+
+
+# encode every prediction in a process pool; returns ({id: mask}, index with shape, runs, voxel counts, bounding box)
+def encode_predictions(predictions, jobs = 1):
+    rows = predictions[['id', 'prediction']].to_dict('records')
+    if jobs > 1 and len(rows) > 1:
+        with ProcessPoolExecutor(max_workers = jobs) as pool:
+            results = list(pool.map(encode_file, rows, chunksize = max(1, len(rows) // (jobs * 8))))
+    else:
+        results = [encode_file(row) for row in rows]
+
+    masks, index = {}, []
+    for scan_id, mask, error in results:
+        row = {'id': scan_id, 'error': error}
+        if mask is not None:
+            masks[scan_id] = mask
+            box = bounding_box(mask)
+            counts = voxel_counts(mask)
+            row.update({'shape': str(tuple(mask['shape'])), 'n_runs': len(mask['length']),
+                        'voxels_1': counts[1], 'voxels_2': counts[2], 'voxels_3': counts[3], 'voxels_4': counts[4],
+                        'bbox_low': None if box is None else str(tuple(box[0])),
+                        'bbox_high': None if box is None else str(tuple(box[1]))})
+        index.append(row)
+    return masks, pd.DataFrame(index)
+
+
+# save masks to one .npz file (runs of all scans concatenated, with per scan offsets, shapes and affines)
+def save_masks(masks, path):
+    ids = list(masks)
+    lengths = [len(masks[i]['length']) for i in ids]
+    arrays = {'ids': np.array([str(i) for i in ids]),
+              'offsets': np.concatenate([[0], np.cumsum(lengths)]).astype('int64'),
+              'shapes': np.array([masks[i]['shape'] for i in ids], dtype = 'int64').reshape(-1, 3),
+              'affines': np.array([masks[i]['affine'] for i in ids], dtype = 'float64').reshape(-1, 4, 4)}
+    for column in RUN_COLUMNS:
+        arrays[column] = np.concatenate([masks[i][column] for i in ids]) if ids else np.zeros(0, dtype = 'int32')
+    tmp = path + '.tmp.npz'
+    np.savez(tmp, **arrays)
+    os.replace(tmp, path)
+
+
+# load masks saved by save_masks; returns {id: mask} (ids as strings)
+def load_masks(path, ids = None):
+    data = np.load(path)
+    columns = {column: data[column] for column in RUN_COLUMNS}
+    offsets, shapes, affines = data['offsets'], data['shapes'], data['affines']
+    wanted = None if ids is None else {str(i) for i in ids}
+    masks = {}
+    for n, scan_id in enumerate(data['ids']):
+        if wanted is not None and scan_id not in wanted:
+            continue
+        mask = {column: values[offsets[n]:offsets[n + 1]] for column, values in columns.items()}
+        mask.update({'shape': tuple(int(s) for s in shapes[n]), 'affine': affines[n]})
+        masks[str(scan_id)] = mask
+    return masks
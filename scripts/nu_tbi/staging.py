@@ -0,0 +1,126 @@
+# Date: 10-19-2026
+# Objective: Read-through staging cache on local disk for files read from the network share.
+# Several stages read the same DICOM and nifti files (05 headers, 07 the 4D check, 08 slice counts, the volume readers
+# in nu_tbi); `stage(path)` returns a local copy of `path` in SCRATCH_DIR, copying it on the first read, so repeated
+# passes read local disk instead of the share. `open_staged` is the open() equivalent.
+#
+# A copy is named after the source path, size and modification time (keeping the extension, so nibabel recognises
+# .nii.gz), so a file changed on the share is copied again; only a stat is sent to the share on a hit. The cache holds
+# at most SCRATCH_BYTES: when a copy would exceed it, the least recently used copies are deleted (a hit updates the
+# copy's mtime, which is the LRU order). Processes sharing SCRATCH_DIR each enforce the budget on their own copies and
+# on the files they find at start, so the total can briefly exceed it while several stages run at once.
+#
+#   image = nib.load(stage(path))
+#   with open_staged(first_file) as f:
+#       ds = pydicom.dcmread(f)
+
+import hashlib
+import os
+import shutil
+import threading
+import time
+
+from nu_tbi.paths import SCRATCH_BYTES, SCRATCH_DIR
+
+# hits, misses and bytes copied by this process
+STATS = {'hits': 0, 'misses': 0, 'bytes_copied': 0, 'evicted': 0, 'too_large': 0}
+
+_lock = threading.Lock()
+# path -> (size, last use) of the copies in the cache; filled from SCRATCH_DIR on first use
+_entries = None
+
+
+# extension kept on the copy (.nii.gz counts as one)
+def _extension(path):
+    return '.nii.gz' if path.endswith('.nii.gz') else os.path.splitext(path)[1]
+
+
+# cache path of a source file with the given size and modification time
+def cache_path(path, size, mtime_ns, scratch_dir = SCRATCH_DIR):
+    key = hashlib.sha1(f'{os.path.abspath(path)}|{size}|{mtime_ns}'.encode()).hexdigest()
+    return os.path.join(scratch_dir, key[:2], key + _extension(path))
+
+
+# copies already in the cache (left by earlier runs)
+def _scan(scratch_dir):
+    entries = {}
+    if os.path.isdir(scratch_dir):
+        for folder in os.scandir(scratch_dir):
+            if folder.is_dir():
+                for entry in os.scandir(folder.path):
+                    if '.tmp' not in entry.name:
+                        stat = entry.stat()
+                        entries[entry.path] = (stat.st_size, stat.st_mtime)
+    return entries
+
+
+# delete least recently used copies until `incoming` more bytes fit in the budget (call with _lock held)
+def _evict(incoming, budget):
+    total = sum(size for size, _ in _entries.values())
+    for path, (size, _) in sorted(_entries.items(), key = lambda item: item[1][1]):
+        if total + incoming <= budget:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        del _entries[path]
+        total -= size
+        STATS['evicted'] += 1
+
+
+# local copy of `path` (copied on the first read); the source path itself if staging is off or the file is too large
+def stage(path, scratch_dir = SCRATCH_DIR, budget = SCRATCH_BYTES):
+    global _entries
+    if budget <= 0:
+        return path
+    stat = os.stat(path)
+    if stat.st_size > budget:
+        STATS['too_large'] += 1
+        return path
+    target = cache_path(path, stat.st_size, stat.st_mtime_ns, scratch_dir)
+
+    with _lock:
+        if _entries is None:
+            _entries = _scan(scratch_dir)
+        if target in _entries and os.path.exists(target):
+            now = time.time()
+            os.utime(target, (now, now))
+            _entries[target] = (stat.st_size, now)
+            STATS['hits'] += 1
+            return target
+        _evict(stat.st_size, budget)
+
+    # copy outside the lock so other threads keep reading; a unique temporary name makes concurrent copies safe
+    os.makedirs(os.path.dirname(target), exist_ok = True)
+    tmp = f'{target}.{os.getpid()}.{threading.get_ident()}.tmp'
+    shutil.copyfile(path, tmp)
+    os.replace(tmp, target)
+    with _lock:
+        _entries[target] = (stat.st_size, time.time())
+        STATS['misses'] += 1
+        STATS['bytes_copied'] += stat.st_size
+    return target
+
+
+# open() through the staging cache (read only)
+def open_staged(path, mode = 'rb', **kwargs):
+    if any(flag in mode for flag in 'wax+'):
+        raise ValueError('open_staged only reads files')
+    return open(stage(path), mode, **kwargs)
+
+
+# one-line summary of STATS
+def format_stats():
+    looked_up = STATS['hits'] + STATS['misses']
+    return (f"staging cache: {STATS['hits']} hits, {STATS['misses']} misses"
+            + (f" ({STATS['hits'] / looked_up:.0%} hit rate)" if looked_up else '')
+            + f", {STATS['bytes_copied'] / 1e6:.1f} MB copied, {STATS['evicted']} evicted")
+
+
+# delete every copy in the cache
+def clear(scratch_dir = SCRATCH_DIR):
+    global _entries
+    with _lock:
+        shutil.rmtree(scratch_dir, ignore_errors = True)
+        _entries = None
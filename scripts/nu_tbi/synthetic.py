@@ -0,0 +1,550 @@
+# Date: 10-19-2026
+# Objective: Generate a synthetic NU_TBI tree so every stage from 01 to 12 can be run and profiled without patient data.
+# The generator fabricates, under one output directory:
+#   - data/suidDFFound.csv, data/suid_reports_identifiers_master_list.csv and data/post_traumatic_hemorrhage_search.xlsx
+#   - data/processed/20240325_1136_tbi_patients_scans_to_include(_all).csv (the TBI cohort identified by scripts 02/03)
+#   - data/HemorrhageProject/<batch>/LocalIdentifierList.txt
+#   - dicom series: hemorrhage_project/<batch>/images/<folder>/DICOM/random/<series>/CT.*
+#   - nifti_images/<folder>/DICOM/random/<series>/<patient_id>_<series number>.nii (what process_nifti.sh would write)
+#   - blast-ct style label maps and data/processed/blast_ct_predictions/batch_<n>/predictions/prediction.csv
+#   - the manual review workbooks read by scripts 09, 10 and 11
+# Patients have 1-5 scans. Hemorrhage volumes are drawn per patient and grow for a subset of patients, so the
+# expansion outcomes in script 11 have both classes. Volumes in prediction.csv are measured from the label maps.
+# Run through scripts/make_synthetic_data.py.
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from nu_tbi.regional import COMPARTMENT_ORDER
+
+# transfer batches; studies dated before the cutoff are in the first batch
+BATCHES = [('Transfer20211010', '2021-10-10'), ('HemorrhageTransfer20231128', '2023-11-28')]
+
+# series acquired for each study; `probability` is the chance a study has the series and `nifti` marks the axial brain
+# window series that scripts 05/06 keep and process_nifti.sh converts (`name` contains the filter words used by 06 and 09)
+SERIES = [
+    {'name': 'Head_Routine_5.0_H41s', 'image_type': ['ORIGINAL', 'PRIMARY', 'AXIAL'], 'window': (40, 80),
+     'slices': (28, 64), 'thickness': 5.0, 'probability': 1.0, 'nifti': True},
+    {'name': 'Head_Routine_5.0_H60s', 'image_type': ['ORIGINAL', 'PRIMARY', 'AXIAL'], 'window': (40, 120),
+     'slices': (28, 64), 'thickness': 5.0, 'probability': 0.3, 'nifti': True},
+    {'name': 'Head_Thin_2.0_H41s', 'image_type': ['ORIGINAL', 'PRIMARY', 'AXIAL'], 'window': (40, 80),
+     'slices': (70, 130), 'thickness': 2.0, 'probability': 0.15, 'nifti': True},
+    {'name': 'Head_Bone_2.0_H70h', 'image_type': ['ORIGINAL', 'PRIMARY', 'AXIAL'], 'window': (600, 2800),
+     'slices': (70, 130), 'thickness': 2.0, 'probability': 0.8, 'nifti': False},
+    {'name': 'Coronal_Brain_3.0_H41s', 'image_type': ['DERIVED', 'SECONDARY', 'AXIAL'], 'window': (40, 80),
+     'slices': (40, 60), 'thickness': 3.0, 'probability': 0.7, 'nifti': False},
+    {'name': 'Sag_Brain_3.0_H41s', 'image_type': ['DERIVED', 'SECONDARY', 'AXIAL'], 'window': (40, 80),
+     'slices': (40, 60), 'thickness': 3.0, 'probability': 0.5, 'nifti': False},
+    {'name': 'Topogram_0.6_T20s', 'image_type': ['ORIGINAL', 'PRIMARY', 'LOCALIZER'], 'window': (50, 500),
+     'slices': (1, 1), 'thickness': 0.6, 'probability': 1.0, 'nifti': False},
+]
+
+# blast-ct label values and the attenuation (HU) used for each label in the synthetic images
+LABELS = {'iph': 1, 'eah': 2, 'oedema': 3, 'ivh': 4}
+LABEL_HU = {1: 65, 2: 60, 3: 20, 4: 50}
+
+# field of view (mm) and brain semi-axes (mm, left-right / anterior-posterior / inferior-superior)
+FOV_MM = 220.0
+BRAIN_AXES_MM = (70.0, 85.0, 60.0)
+
+# atlas regions reported by blast-ct (prediction_{compartment}_{region}_ml and {region}_volume_ml)
+SIDES = ['BasalForebrain', 'BasalGanglia', 'Caudate', 'Cerebellum', 'FrontalLobe-inferior-orbital', 'FrontalLobe-lateral',
+         'FrontalLobe-medial', 'Hippocampus', 'Insula', 'OccipitalLobe', 'ParietalLobe', 'TemporalLobe', 'ThalamusProper']
+REGIONS = (['BrainStem', 'Cerebellum'] + ['Left' + s for s in SIDES] + ['LeftBasalganglia-lentiform-nucleus'] +
+           ['Right' + s for s in SIDES] + ['RightBasalGanglia-lentiform-nucleus'] + ['Ventricle'])
+
+# (order reason, injury label, trauma report sentence); the report sentences carry the words flagged by the keyword search
+TRAUMA_REASONS = [('fall from standing', 'fall', 'Status post fall with head strike.'),
+                  ('motor vehicle collision', 'mvc', 'Auto versus pedestrian, head trauma.'),
+                  ('assault', 'assault', 'Assault with blunt injury to the head.'),
+                  ('head trauma', 'other', 'Trauma to the head, unknown mechanism.')]
+OTHER_REASONS = [('headache', None, 'Worst headache of life.'),
+                 ('altered mental status', None, 'Altered mental status.'),
+                 ('syncope', None, 'Syncopal episode.')]
+
+REPORT_COLUMNS = ['trauma', 'fall', 'injury', 'assault', 'auto', 'any trauma', ' hemorrhage ', 'posttraumatic hemorrhage']
+
+INCLUDE_LIST = 'data/processed/20240325_1136_tbi_patients_scans_to_include.csv'
+MANUAL_REVIEW = 'data/processed/manual_review/02_initial_tbi_patient_list_inclusion.xlsx'
+
+
+# draw patients, their scans (studies) and the true hemorrhage volumes of each scan
+def make_studies(n_studies, seed = 0, cohort_fraction = 0.8, expansion_fraction = 0.2,
+                 start = '2019-01-01', end = '2023-11-01'):
+    rng = np.random.default_rng(seed)
+
+    scans_per_patient = rng.choice([1, 2, 3, 4, 5], p = [0.15, 0.45, 0.25, 0.1, 0.05], size = n_studies)
+    n_patients = int(np.searchsorted(np.cumsum(scans_per_patient), n_studies) + 1)
+    scans_per_patient = scans_per_patient[:n_patients]
+    scans_per_patient[-1] -= scans_per_patient.sum() - n_studies
+
+    patient = np.repeat(np.arange(n_patients), scans_per_patient)
+    offsets = np.repeat(np.cumsum(scans_per_patient) - scans_per_patient, scans_per_patient)
+    scan_number = np.arange(n_studies) - offsets + 1
+
+    # patient level: cohort membership, mechanism of injury, baseline volumes (mL) and growth (mL)
+    in_cohort = rng.random(n_patients) < cohort_fraction
+    bleed = in_cohort & (rng.random(n_patients) < 0.8)
+    expander = bleed & (rng.random(n_patients) < expansion_fraction)
+    iph0 = np.where(bleed & (rng.random(n_patients) < 0.6), rng.lognormal(1.0, 1.2, n_patients), 0)
+    eah0 = np.where(bleed & (rng.random(n_patients) < 0.6), rng.lognormal(1.5, 1.1, n_patients), 0)
+    ivh0 = np.where(bleed & (rng.random(n_patients) < 0.2), rng.lognormal(0.0, 1.0, n_patients), 0)
+    iph_growth = np.where(expander, rng.uniform(4, 30, n_patients), -rng.uniform(0, 0.3, n_patients) * iph0)
+    eah_growth = np.where(expander & (rng.random(n_patients) < 0.5), rng.uniform(4, 30, n_patients), -rng.uniform(0, 0.3, n_patients) * eah0)
+    reason = np.where(in_cohort, rng.integers(0, len(TRAUMA_REASONS), n_patients), -rng.integers(1, len(OTHER_REASONS) + 1, n_patients))
+
+    # scan times: first scan at a random time, follow-ups every ~14 hours
+    start = pd.Timestamp(start)
+    first_time = start + pd.to_timedelta(rng.uniform(0, (pd.Timestamp(end) - start).total_seconds(), n_patients), unit = 's')
+    gap_hours = np.where(scan_number == 1, 0, rng.exponential(14, n_studies) + 2)
+    hours = pd.Series(gap_hours).groupby(patient).cumsum().to_numpy()
+    study_time = (first_time[patient] + pd.to_timedelta(hours, unit = 'h')).floor('s')
+
+    # volumes approach baseline + growth over the first ~day after injury
+    progress = 1 - np.exp(-hours / 12)
+    iph = np.clip(iph0[patient] + iph_growth[patient] * progress, 0, 150)
+    eah = np.clip(eah0[patient] + eah_growth[patient] * progress, 0, 150)
+    ivh = np.clip(ivh0[patient] * (1 + 0.5 * progress), 0, 60)
+    oedema = 0.4 * iph * (1 + progress)
+
+    study_index = np.arange(n_studies)
+    accession = np.array([f'CT20{t.year % 100:02d}{i:07d}' for t, i in zip(study_time, study_index)])
+    batch = np.where(study_time < pd.Timestamp(BATCHES[0][1]), BATCHES[0][0], BATCHES[1][0])
+
+    return pd.DataFrame({
+        'unique_study_id': patient + 1,
+        'patient_id': np.char.add('P', np.char.zfill((patient + 1).astype('str'), 7)),
+        'scan_number': scan_number,
+        'StudyDate_Time_format': study_time,
+        'hours_since_first_scan': hours,
+        'EDWAccession': accession,
+        'folder': np.char.add('S', np.char.zfill((study_index + 1).astype('str'), 7)),
+        'batch': batch,
+        'in_cohort': in_cohort[patient],
+        'expander': expander[patient],
+        'reason': reason[patient],
+        'iph': iph, 'eah': eah, 'oedema': oedema, 'ivh': ivh,
+    })
+
+
+# write a radiology report for each study; flags follow the keyword search in data/post_traumatic_hemorrhage/search_criteria.txt
+def make_reports(studies, seed = 0):
+    rng = np.random.default_rng(seed + 1)
+    n = len(studies)
+    portable = rng.random(n) < 0.03
+    reasons = [TRAUMA_REASONS[r] if r >= 0 else OTHER_REASONS[-r - 1] for r in studies['reason']]
+
+    reports = []
+    for (order_reason, injury, history), iph, eah, ivh, is_portable, scan_number in zip(
+            reasons, studies['iph'], studies['eah'], studies['ivh'], portable, studies['scan_number']):
+        if scan_number > 1:
+            history = 'Follow up of ' + ('known hemorrhage.' if iph + eah + ivh > 0 else 'head injury.')
+        technique = 'Portable 8-slice CT of the head was performed.' if is_portable else 'Axial images were obtained from the skull base to the vertex.'
+        findings = []
+        if iph > 0:
+            findings.append(f'There is intraparenchymal hemorrhage measuring approximately {max(iph, 0.1) ** (1 / 3) * 1.2:.1f} cm.')
+        if eah > 0:
+            findings.append('There is a subdural hemorrhage along the convexity.')
+        if ivh > 0:
+            findings.append('Small volume intraventricular hemorrhage layers in the occipital horns.')
+        if not findings:
+            findings.append('No acute intracranial hemorrhage. No midline shift.')
+        reports.append(f'CT HEAD WITHOUT CONTRAST. CLINICAL HISTORY: {history} TECHNIQUE: {technique} FINDINGS: {" ".join(findings)} IMPRESSION: See findings.')
+
+    rad_reports = pd.DataFrame({'accession': studies['EDWAccession'].to_numpy(),
+                                'order_reason': [r[0] for r in reasons],
+                                'report': reports})
+    text = rad_reports['report'].str.lower()
+    rad_reports['trauma'] = text.str.contains('trauma')
+    rad_reports['fall'] = text.str.contains('fall')
+    rad_reports['injury'] = text.str.contains('injury')
+    rad_reports['assault'] = text.str.contains('assault')
+    rad_reports['auto'] = text.str.contains('auto')
+    rad_reports['any trauma'] = rad_reports[['trauma', 'fall', 'injury', 'assault', 'auto']].any(axis = 1)
+    rad_reports[' hemorrhage '] = text.str.contains(' hemorrhage ') & ~text.str.contains('no acute intracranial hemorrhage')
+    rad_reports['posttraumatic hemorrhage'] = rad_reports['any trauma'] & rad_reports[' hemorrhage ']
+    rad_reports[REPORT_COLUMNS] = rad_reports[REPORT_COLUMNS].astype('int8')
+    return rad_reports
+
+
+# pick the series acquired for each cohort study: one row per (study, series)
+def make_series(studies, series = SERIES, seed = 0, tilt_fraction = 0.2):
+    rng = np.random.default_rng(seed + 2)
+    rows = []
+    for study in studies[studies['in_cohort']].itertuples(index = False):
+        number = 1
+        for spec in series:
+            if rng.random() >= spec['probability']:
+                continue
+            number += 1
+            rows.append({'folder': study.folder,
+                         'series_number': number,
+                         'series_dir': f"{number}_{spec['name']}",
+                         'slices': int(rng.integers(spec['slices'][0], spec['slices'][1] + 1)),
+                         'thickness': spec['thickness'],
+                         'image_type': '\\'.join(spec['image_type']),
+                         'window_center': spec['window'][0],
+                         'window_width': spec['window'][1],
+                         'nifti': spec['nifti'],
+                         'tilt': bool(spec['nifti'] and rng.random() < tilt_fraction)})
+    return pd.DataFrame(rows)
+
+
+# voxel volume (mL) of a synthetic image
+def voxel_ml(image_size, thickness):
+    return (FOV_MM / image_size) ** 2 * thickness / 1000
+
+
+# number of voxels to label for each compartment
+def label_counts(volumes, voxel_volume):
+    return {c: int(round(volumes[c] / voxel_volume)) for c in LABELS}
+
+
+# normalised distance from the centre of the brain ellipsoid for every voxel, plus the voxel coordinates (mm)
+def head_geometry(image_size, n_slices, thickness):
+    spacing = FOV_MM / image_size
+    x = (np.arange(image_size) + 0.5) * spacing - FOV_MM / 2
+    z = (np.arange(n_slices) + 0.5 - n_slices / 2) * thickness
+    x, y, z = np.meshgrid(x, x, z, indexing = 'ij')
+    r = np.sqrt((x / BRAIN_AXES_MM[0]) ** 2 + (y / BRAIN_AXES_MM[1]) ** 2 + (z / BRAIN_AXES_MM[2]) ** 2)
+    return r, x, y, z
+
+
+# label the `k` unlabelled voxels of `mask` with the lowest score; returns the number of voxels labelled
+def _take(labels, mask, score, k, value):
+    candidates = np.flatnonzero(mask.ravel() & (labels.ravel() == 0))
+    k = min(k, len(candidates))
+    if k > 0:
+        chosen = candidates[np.argpartition(score.ravel()[candidates], k - 1)[:k]]
+        labels.ravel()[chosen] = value
+    return k
+
+
+# draw a blast-ct style label map: IVH in the centre, an IPH blob with surrounding oedema, and a peripheral EAH crescent
+def make_labels(geometry, counts, rng):
+    r, x, y, z = geometry
+    brain = r <= 1
+    labels = np.zeros(r.shape, dtype = 'uint8')
+    measured = {}
+
+    measured['ivh'] = _take(labels, brain, r, counts['ivh'], LABELS['ivh'])
+
+    inner = np.flatnonzero((r <= 0.6).ravel())
+    centre = inner[rng.integers(len(inner))] if len(inner) else 0
+    distance = (x - x.ravel()[centre]) ** 2 + (y - y.ravel()[centre]) ** 2 + (z - z.ravel()[centre]) ** 2
+    measured['iph'] = _take(labels, brain, distance, counts['iph'], LABELS['iph'])
+    measured['oedema'] = _take(labels, brain, distance, counts['oedema'], LABELS['oedema'])
+
+    side = rng.choice([-1, 1])
+    measured['eah'] = _take(labels, brain, -r + (np.sign(x) != side) * 10, counts['eah'], LABELS['eah'])
+    return labels, measured
+
+
+# build the CT image (HU) from the head geometry and label map
+def make_image(geometry, labels, rng):
+    r = geometry[0]
+    image = np.full(r.shape, -1000, dtype = 'int16')
+    image[(r > 1) & (r <= 1.08)] = 1000
+    image[r <= 1] = 35
+    for value, hu in LABEL_HU.items():
+        image[labels == value] = hu
+    noise = rng.normal(0, 4, r.shape).astype('int16')
+    return np.where(image > -1000, image + noise, image).astype('int16')
+
+
+# save a dicom dataset (pydicom 2 and 3 use different keywords for writing a complete file)
+def _save_dicom(dataset, path):
+    import pydicom
+    if int(pydicom.__version__.split('.')[0]) >= 3:
+        dataset.save_as(path, enforce_file_format = True)
+    else:
+        dataset.is_little_endian = True
+        dataset.is_implicit_VR = False
+        dataset.save_as(path, write_like_original = False)
+
+
+# write one dicom series, one CT.* file per slice
+def write_dicom_series(directory, image, study, series, seed):
+    from pydicom.dataset import Dataset, FileMetaDataset
+    from pydicom.uid import ExplicitVRLittleEndian, generate_uid
+
+    os.makedirs(directory, exist_ok = True)
+    spacing = FOV_MM / image.shape[0]
+    study_uid = generate_uid(entropy_srcs = [str(seed), study['folder']])
+    series_uid = generate_uid(entropy_srcs = [str(seed), study['folder'], series['series_dir']])
+    pixels = np.clip(image.astype('int32') + 1024, 0, 4095).astype('uint16')
+
+    # series level header, built once; only the instance elements and pixel data change between slices
+    meta = FileMetaDataset()
+    meta.MediaStorageSOPClassUID = '1.2.840.10008.5.1.4.1.1.2'
+    meta.TransferSyntaxUID = ExplicitVRLittleEndian
+
+    ds = Dataset()
+    ds.file_meta = meta
+    ds.SOPClassUID = meta.MediaStorageSOPClassUID
+    ds.StudyInstanceUID = study_uid
+    ds.SeriesInstanceUID = series_uid
+    ds.Modality = 'CT'
+    ds.Manufacturer = 'SYNTHETIC'
+    ds.PatientID = study['patient_id']
+    ds.PatientName = 'SYNTHETIC^' + study['patient_id']
+    ds.AccessionNumber = study['EDWAccession']
+    ds.StudyDate = study['StudyDate_Time_format'].strftime('%Y%m%d')
+    ds.StudyTime = study['StudyDate_Time_format'].strftime('%H%M%S')
+    ds.StudyDescription = 'CT HEAD WO CONTRAST'
+    ds.SeriesDescription = series['series_dir'].split('_', 1)[1]
+    ds.SeriesNumber = series['series_number']
+    ds.ImageType = series['image_type'].split('\\')
+    ds.ConvolutionKernel = series['series_dir'].rsplit('_', 1)[1]
+    ds.GantryDetectorTilt = 15 if series['tilt'] else 0
+    ds.KVP = 120
+    ds.SliceThickness = series['thickness']
+    ds.PixelSpacing = [spacing, spacing]
+    ds.ImageOrientationPatient = [1, 0, 0, 0, 1, 0]
+    ds.WindowCenter = series['window_center']
+    ds.WindowWidth = series['window_width']
+    ds.RescaleIntercept = -1024
+    ds.RescaleSlope = 1
+    ds.SamplesPerPixel = 1
+    ds.PhotometricInterpretation = 'MONOCHROME2'
+    ds.Rows, ds.Columns = image.shape[1], image.shape[0]
+    ds.BitsAllocated = 16
+    ds.BitsStored = 12
+    ds.HighBit = 11
+    ds.PixelRepresentation = 0
+
+    for i in range(image.shape[2]):
+        sop_uid = generate_uid(entropy_srcs = [series_uid, str(i)])
+        meta.MediaStorageSOPInstanceUID = sop_uid
+        ds.SOPInstanceUID = sop_uid
+        ds.InstanceNumber = i + 1
+        ds.ImagePositionPatient = [-FOV_MM / 2, -FOV_MM / 2, i * series['thickness']]
+        ds.SliceLocation = i * series['thickness']
+        ds.PixelData = np.ascontiguousarray(pixels[:, :, i].T).tobytes()
+        _save_dicom(ds, os.path.join(directory, 'CT.' + sop_uid))
+
+
+# write the dicom series, nifti images and label maps of one study
+# returns the measured label counts of each nifti image (keyed by the blast-ct `id`)
+def write_study(task):
+    import nibabel as nib
+
+    study, series_rows, images, options = task
+    rng = np.random.default_rng([options['seed'], int(study['folder'][1:])])
+    measured = {}
+
+    for series in series_rows:
+        geometry = head_geometry(options['image_size'], series['slices'], series['thickness'])
+        counts = label_counts(study, voxel_ml(options['image_size'], series['thickness']))
+        labels, series_counts = make_labels(geometry, counts, rng)
+        image = make_image(geometry, labels, rng)
+
+        if options['dicom']:
+            directory = os.path.join(options['dicom_dir'], study['batch'], 'images', study['folder'], 'DICOM', 'random', series['series_dir'])
+            write_dicom_series(directory, image, study, series, options['seed'])
+
+        if options['nifti'] and series['nifti']:
+            spacing = FOV_MM / options['image_size']
+            affine = np.diag([spacing, spacing, series['thickness'], 1.0])
+            for row in images.get(series['series_dir'], []):
+                image_path = os.path.join(options['out_dir'], row['image'])
+                os.makedirs(os.path.dirname(image_path), exist_ok = True)
+                nib.save(nib.Nifti1Image(image, affine), image_path)
+                prediction_path = os.path.join(options['out_dir'], row['prediction'])
+                os.makedirs(os.path.dirname(prediction_path), exist_ok = True)
+                nib.save(nib.Nifti1Image(labels, affine), prediction_path)
+                measured[row['id']] = series_counts
+    return measured
+
+
+# one row per nifti image (axial brain series plus tilt corrected copies) with its blast-ct id, batch and file paths
+def make_images(studies, series_table, batch_rows = 1000):
+    images = series_table[series_table['nifti']].merge(studies[['folder', 'patient_id']], on = 'folder')
+    tilt = images[images['tilt']].assign(suffix = '_Tilt_1')
+    images = pd.concat([images.assign(suffix = ''), tilt]).sort_values(['folder', 'series_number', 'suffix'], kind = 'stable').reset_index(drop = True)
+
+    images['id'] = 'scan_' + (images.index + 1).astype('str')
+    images['batch_number'] = images.index // batch_rows + 1
+    images['image'] = ('nifti_images/' + images['folder'] + '/DICOM/random/' + images['series_dir'] + '/' +
+                       images['patient_id'] + '_' + images['series_number'].astype('str') + images['suffix'] + '.nii')
+    batch_dir = 'data/processed/blast_ct_predictions/batch_' + images['batch_number'].astype('str') + '/predictions/'
+    images['prediction'] = batch_dir + images['id'] + '_prediction.nii.gz'
+    images['atlas_in_native_space'] = batch_dir + images['id'] + '_atlas_in_native_space.nii.gz'
+    images['brain_mask_native_space'] = batch_dir + images['id'] + '_brain_mask_native_space.nii.gz'
+    return images
+
+
+# blast-ct style prediction table: compartment volumes, regional volumes and atlas region volumes
+def make_predictions(images, counts, image_size, seed = 0):
+    rng = np.random.default_rng(seed + 3)
+    n = len(images)
+    voxel = voxel_ml(image_size, images['thickness'].to_numpy())
+
+    predictions = images[['id', 'image', 'prediction', 'atlas_in_native_space', 'brain_mask_native_space']].copy()
+    predictions['quality_control_metric'] = np.round(-rng.uniform(0.01, 1.0, n), 4)
+    for c in COMPARTMENT_ORDER:
+        predictions[f'{c}_predicted_volume_ml'] = np.round(counts[c] * voxel, 4)
+
+    # spread each compartment over one or two atlas regions
+    for c in COMPARTMENT_ORDER:
+        regional = np.zeros((n, len(REGIONS)))
+        share = rng.uniform(0.5, 1.0, n)
+        np.add.at(regional, (np.arange(n), rng.integers(0, len(REGIONS), n)), share)
+        np.add.at(regional, (np.arange(n), rng.integers(0, len(REGIONS), n)), 1 - share)
+        regional = np.round(regional * predictions[f'{c}_predicted_volume_ml'].to_numpy()[:, None], 4)
+        predictions = pd.concat([predictions, pd.DataFrame(regional, columns = [f'prediction_{c}_{r}_ml' for r in REGIONS])], axis = 1)
+
+    atlas = pd.DataFrame(np.round(rng.normal(40, 8, (n, len(REGIONS))).clip(1), 3), columns = [f'{r}_volume_ml' for r in REGIONS])
+    atlas.insert(0, 'Brain_volume_ml', np.round(rng.normal(1200, 120, n), 3))
+    return pd.concat([predictions, atlas], axis = 1)
+
+
+# manual review workbooks read by scripts 09, 10 and 11
+def make_manual_review(studies, images, predictions, seed = 0):
+    rng = np.random.default_rng(seed + 4)
+    cohort = studies[studies['in_cohort'] & studies['folder'].isin(images['folder'])]
+    patients = cohort.groupby('unique_study_id').agg(reason = ('reason', 'first'), expander = ('expander', 'first')).reset_index()
+    n = len(patients)
+
+    exclude = (rng.random(n) < 0.08).astype('int8')
+    surgery = (rng.random(n) < 0.1).astype('int8')
+    review = pd.DataFrame({
+        'unique_study_id': patients['unique_study_id'],
+        'injury': [TRAUMA_REASONS[r][1] for r in patients['reason']],
+        '041224_review_5ml': np.nan, '04102024_review': np.nan, '04092024_5ml_review': np.nan, '04072024_review': np.nan,
+        'radiology_report_exercepts': np.nan, 'update_cohorted': np.nan,
+        'potential_hematoma_expansion_case': np.where(rng.random(n) < 0.02, 999, patients['expander'].astype('int16')),
+        'exclude': exclude,
+        'potential_hematoma_expansion_case_v2': patients['expander'].astype('int8'),
+        'surgery': surgery,
+        'surgery_type': np.where(surgery == 1, rng.choice(['craniotomy', 'craniectomy', 'evd'], n), None),
+        'artifact': (rng.random(n) < 0.05).astype('int8'),
+        'reason_excluded': np.where(exclude == 1, rng.choice(['not traumatic', 'prior neurosurgery', 'outside hospital scan'], n), None),
+        'notes': np.nan})
+
+    scans_to_exclude = images.loc[rng.random(len(images)) < 0.01, ['folder', 'id']].merge(studies[['folder', 'unique_study_id']], on = 'folder')
+    scans_to_exclude = scans_to_exclude[['unique_study_id', 'id']].rename(columns = {'id': 'id_to_remove'})
+
+    # folders with more than one image: pick the image to keep for some of them
+    multiple = images[images.duplicated('folder', keep = False)]
+    multiple = multiple.groupby('folder').sample(n = 1, random_state = seed)
+    multiple = multiple[rng.random(len(multiple)) < 0.3].merge(studies[['folder', 'unique_study_id']], on = 'folder')
+    multiple_image_filter = multiple[['unique_study_id', 'id']].rename(columns = {'id': 'id_to_keep'})
+
+    # chart review of patients with >= 2 mL of IPH or EAH on their first scan
+    first = predictions.merge(images[['id', 'folder', 'suffix']], on = 'id').merge(studies[['folder', 'unique_study_id', 'scan_number']], on = 'folder')
+    first = first[(first['scan_number'] == 1) & (first['suffix'] == '')]
+    two_ml_ids = first.loc[(first['iph_predicted_volume_ml'] >= 2) | (first['eah_predicted_volume_ml'] >= 2), 'unique_study_id'].unique()
+    chart = review[review['unique_study_id'].isin(two_ml_ids)].reset_index(drop = True)
+    m = len(chart)
+    chart_review = pd.DataFrame({
+        'unique_study_id': chart['unique_study_id'],
+        'exclude': (rng.random(m) < 0.1).astype('int8'),
+        'reason_excluded': None,
+        'second_scan_post_surgery_trauma': np.where(rng.random(m) < 0.05, 1, np.nan),
+        'injury': chart['injury'],
+        'surgery': chart['surgery'],
+        'surgery_type': chart['surgery_type'],
+        'first_scan_after_surgery': np.where(chart['surgery'] == 1, rng.integers(2, 4, m), np.nan),
+        'artifact': chart['artifact'],
+        'prior_neurological_surgery': (rng.random(m) < 0.03).astype('int8'),
+        'notes': np.nan})
+    chart_review.loc[chart_review['exclude'] == 1, 'reason_excluded'] = 'Not traumatic '
+
+    return review, scans_to_exclude, multiple_image_filter, chart_review
+
+
+# write every input of the pipeline under out_dir
+def generate(out_dir, n_studies = 1000, seed = 0, image_size = 64, dicom = True, nifti = True, jobs = 1,
+             series = SERIES, batch_rows = 1000):
+    out_dir = os.path.abspath(out_dir)
+    dicom_dir = os.path.join(out_dir, 'hemorrhage_project')
+    for directory in ['data/processed/manual_review', 'data/processed/blast_ct_batches', 'data/processed/tbi_cohort',
+                      'data/processed/pipeline_logs', 'data/modeling/model1_structured_radiographic', 'nifti_images']:
+        os.makedirs(os.path.join(out_dir, directory), exist_ok = True)
+
+    studies = make_studies(n_studies, seed = seed)
+    rad_reports = make_reports(studies, seed = seed)
+    series_table = make_series(studies, series = series, seed = seed)
+    images = make_images(studies, series_table, batch_rows = batch_rows)
+    cohort = studies[studies['in_cohort']]
+
+    # image metadata and identifiers (suidDFFound.csv keeps the Name/DOB columns that 01 deletes)
+    suid = pd.DataFrame({'SearchAccession': '*' + studies['EDWAccession'],
+                         'VNAAccession': studies['EDWAccession'],
+                         'StudyID': 100000 + np.arange(len(studies)),
+                         'EDWAccession': studies['EDWAccession'],
+                         'StudyDescription': 'CT HEAD WO CONTRAST',
+                         'StudyDate': studies['StudyDate_Time_format'].dt.strftime('%Y%m%d'),
+                         'StudyTime': studies['StudyDate_Time_format'].dt.strftime('%H%M%S'),
+                         'SUIDs': ['1.2.826.0.1.3680043.10.' + str(i) for i in range(len(studies))],
+                         'Name': 'SYNTHETIC^' + studies['patient_id'],
+                         'DOB': '19700101'})
+    suid.to_csv(os.path.join(out_dir, 'data/suidDFFound.csv'))
+    suid.assign(unique_study_id = studies['unique_study_id'])[['unique_study_id', 'SearchAccession', 'VNAAccession', 'EDWAccession']].to_csv(
+        os.path.join(out_dir, 'data/suid_reports_identifiers_master_list.csv'), index = False)
+    rad_reports.to_excel(os.path.join(out_dir, 'data/post_traumatic_hemorrhage_search.xlsx'), index = False, engine = 'openpyxl')
+
+    # cohort identified by scripts 02/03
+    include = suid[studies['in_cohort'].to_numpy()].assign(unique_study_id = cohort['unique_study_id'].to_numpy(),
+                                                           report_num_temp = cohort['EDWAccession'].to_numpy())
+    include = include[['unique_study_id', 'report_num_temp', 'SearchAccession', 'VNAAccession', 'EDWAccession', 'StudyID']]
+    include.to_csv(os.path.join(out_dir, INCLUDE_LIST), index = False)
+    flags = rad_reports[studies['in_cohort'].to_numpy()]['posttraumatic hemorrhage'].to_numpy()
+    include.assign(StudyDate_Time_format = cohort['StudyDate_Time_format'].to_numpy(), flag_post_trauma_hem = flags).to_csv(
+        os.path.join(out_dir, INCLUDE_LIST.replace('.csv', '_all.csv')), index = False)
+
+    for batch, _ in BATCHES:
+        directory = os.path.join(out_dir, 'data/HemorrhageProject', batch)
+        os.makedirs(directory, exist_ok = True)
+        listing = cohort[cohort['batch'] == batch]
+        listing[['patient_id', 'EDWAccession', 'folder']].to_csv(os.path.join(directory, 'LocalIdentifierList.txt'),
+                                                                   sep = '|', header = False, index = False)
+
+    # images: one task per study, written in parallel
+    # without label maps the volumes are the requested label counts (what write_study would draw)
+    volumes = images[['folder']].merge(studies[['folder'] + list(LABELS)], on = 'folder', how = 'left')
+    voxel = voxel_ml(image_size, images['thickness'].to_numpy())
+    counts = {c: np.rint(volumes[c].to_numpy() / voxel).astype('int64') for c in LABELS}
+    if dicom or nifti:
+        options = {'seed': seed, 'image_size': image_size, 'dicom': dicom, 'nifti': nifti, 'out_dir': out_dir, 'dicom_dir': dicom_dir}
+        study_records = cohort.set_index('folder', drop = False)[['folder', 'patient_id', 'EDWAccession', 'StudyDate_Time_format', 'batch'] + list(LABELS)]
+        series_by_folder = {f: g.to_dict('records') for f, g in series_table.groupby('folder', sort = False)}
+        images_by_folder = {f: {s: r.to_dict('records') for s, r in g.groupby('series_dir', sort = False)}
+                            for f, g in images.groupby('folder', sort = False)}
+        tasks = [(study, series_by_folder.get(study['folder'], []), images_by_folder.get(study['folder'], {}), options)
+                 for study in study_records.to_dict('records')]
+        if jobs > 1:
+            with ProcessPoolExecutor(max_workers = jobs) as pool:
+                results = list(pool.map(write_study, tasks, chunksize = 16))
+        else:
+            results = [write_study(task) for task in tasks]
+        if nifti:
+            measured = {k: v for result in results for k, v in result.items()}
+            counts = {c: images['id'].map(lambda i: measured[i][c]).to_numpy() for c in LABELS}
+
+    # blast-ct batches and predictions
+    predictions = make_predictions(images, counts, image_size, seed = seed)
+    for batch_number, batch in images.groupby('batch_number'):
+        batch[['id', 'image']].to_csv(os.path.join(out_dir, f'data/processed/blast_ct_batches/blast_ct_batch_{batch_number}.csv'), index = False)
+        directory = os.path.join(out_dir, f'data/processed/blast_ct_predictions/batch_{batch_number}/predictions')
+        os.makedirs(directory, exist_ok = True)
+        predictions[predictions['id'].isin(batch['id'])].to_csv(os.path.join(directory, 'prediction.csv'), index = False)
+
+    review, scans_to_exclude, multiple_image_filter, chart_review = make_manual_review(studies, images, predictions, seed = seed)
+    with pd.ExcelWriter(os.path.join(out_dir, MANUAL_REVIEW), engine = 'openpyxl') as writer:
+        review.to_excel(writer, sheet_name = '02_initial_tbi_patient_list_inc', index = False)
+        scans_to_exclude.to_excel(writer, sheet_name = 'scans_to_exclude', index = False)
+        multiple_image_filter.to_excel(writer, sheet_name = 'multiple_image_filter', index = False)
+    with pd.ExcelWriter(os.path.join(out_dir, MANUAL_REVIEW.replace('.xlsx', '_2ml.xlsx')), engine = 'openpyxl') as writer:
+        chart_review.to_excel(writer, sheet_name = 'chart_review', index = False)
+
+    return {'studies': len(studies),
+            'patients': studies['unique_study_id'].nunique(),
+            'cohort_studies': len(cohort),
+            'series': len(series_table),
+            'nifti_images': len(images),
+            'prediction_batches': int(images['batch_number'].max()) if len(images) else 0}
@@ -0,0 +1,138 @@
+# Date: 10-19-2026
+# Objective: Compute hematoma expansion cohorts and outcomes for a whole grid of definitions in one vectorized pass.
+# A definition is (inclusion mL, expansion mL, window hours): patients are included if the first scan has
+# >= inclusion mL of IPH or EAH, and are cases if IPH or EAH grows by >= expansion mL on a scan within window hours of
+# the first scan (censored patients, e.g. surgery before the second scan, are never cases).
+# scripts/11_prepare_cohort.py uses 2 mL, 6/8/10 mL and 72 hours.
+#
+# prepare_sweep sorts the scans once by patient and time and keeps, for every scan, the patient's running maximum change
+# from the first scan. For a window, np.searchsorted finds each patient's last scan within the window, so the patient's
+# maximum change within the window is one lookup. The (inclusion, expansion) counts for a window come from one 2D
+# histogram of the patients' threshold bins, cumulated from the largest thresholds down.
+#
+#   sweep = prepare_sweep(scans, censor_col = 'second_scan_post_surgery_trauma')
+#   summary = sweep_outcomes(sweep, inclusion_ml = np.arange(1, 11), expansion_ml = np.arange(2, 21), window_hours = [24, 48, 72])
+#   labels = outcome_labels(sweep, inclusion_ml = 2, expansion_ml = 8, window_hours = 72)
+
+import numpy as np
+import pandas as pd
+
+from nu_tbi.trajectory import COMPARTMENTS, group_offsets
+
+# compartments used for inclusion and expansion
+OUTCOME_COMPARTMENTS = ['iph', 'eah']
+
+
+# outcome of an already computed cohort (one row per scan, with max_change_{c}_volume_first_scan from compute_trajectories):
+# 1 if IPH or EAH grew by >= expansion_ml and the patient is not censored, else 0
+def expansion_outcome(dataframe, expansion_ml, compartments = OUTCOME_COMPARTMENTS, censor_col = 'second_scan_post_surgery_trauma'):
+    grew = np.zeros(len(dataframe), dtype = bool)
+    for c in compartments:
+        grew |= (dataframe[f'max_change_{c}_volume_first_scan'] >= expansion_ml).to_numpy()
+    if censor_col is not None:
+        grew &= (dataframe[censor_col].fillna(0) == 0).to_numpy()
+    return np.where(grew, 1, 0)
+
+
+# sort the scans by patient and time and compute what every definition needs:
+#   first_volume   per patient, the larger of the IPH and EAH volumes on the first scan
+#   keys           per scan, patient index * time_scale + hours since the first scan (sorted)
+#   running_max    per scan, the patient's largest IPH or EAH change from the first scan up to this scan
+#   censored       per patient, True if `censor_col` is 1 on any of the patient's scans
+def prepare_sweep(dataframe, compartments = OUTCOME_COMPARTMENTS, id_col = 'unique_study_id', time_col = 'StudyDate_Time_format',
+                  censor_col = None):
+    scan_time = pd.to_datetime(dataframe[time_col]).to_numpy()
+    keep = ~pd.isnull(scan_time)
+    ids = dataframe[id_col].to_numpy()[keep]
+    scan_time = scan_time[keep]
+    volumes = dataframe[[COMPARTMENTS[c] for c in compartments]].to_numpy(dtype = 'float64')[keep]
+
+    # ids may not be sortable as one type (e.g. strings and numbers), so sort by their codes
+    codes, unique_ids = pd.factorize(ids, sort = True)
+    order = np.lexsort((scan_time, codes))
+    codes, scan_time, volumes = codes[order], scan_time[order], volumes[order]
+
+    starts, group_index = group_offsets(codes)
+    first_row = starts[group_index]
+    hours = (scan_time - scan_time[first_row]) / np.timedelta64(1, 'h')
+
+    with np.errstate(invalid = 'ignore'):
+        first_volume = np.fmax.reduce(volumes[starts], axis = 1) if len(starts) else np.zeros(0)
+        change = np.fmax.reduce(volumes - volumes[first_row], axis = 1) if len(codes) else np.zeros(0)
+
+    # running maximum within each patient, computed on the changes themselves so that a change equal to a threshold
+    # stays equal to it (as in expansion_outcome); no change (NaN) is -inf
+    change = np.where(np.isnan(change), -np.inf, change)
+    running_max = pd.Series(change).groupby(group_index, sort = False).cummax().to_numpy()
+
+    censored = np.zeros(len(starts), dtype = bool)
+    if censor_col is not None:
+        censor = (dataframe[censor_col].fillna(0).to_numpy()[keep][order] == 1)
+        censored = np.logical_or.reduceat(censor, starts) if len(starts) else censored
+
+    time_scale = (hours.max() if len(hours) else 0) + 1
+    return {'ids': unique_ids[codes[starts]],
+            'starts': starts,
+            'first_volume': first_volume,
+            'keys': group_index * time_scale + hours,
+            'time_scale': time_scale,
+            'running_max': running_max,
+            'censored': censored}
+
+
+# for each patient, the largest change from the first scan within `window` hours (-inf for censored patients)
+# and the number of scans within the window
+def _window_max(sweep, window):
+    time_scale = sweep['time_scale']
+    patients = np.arange(len(sweep['starts']))
+
+    # windows longer than the longest follow-up would reach into the next patient
+    window = min(window, time_scale - 0.5)
+    last = np.searchsorted(sweep['keys'], patients * time_scale + window, side = 'right') - 1
+    max_change = np.where(sweep['censored'], -np.inf, sweep['running_max'][last])
+    return max_change, last - sweep['starts'] + 1
+
+
+# cohort size, number of cases and prevalence for every combination of the given thresholds
+# returns one row per (inclusion_ml, expansion_ml, window_hours), also with the number of included patients that have a
+# follow-up scan within the window
+def sweep_outcomes(sweep, inclusion_ml, expansion_ml, window_hours):
+    inclusion_ml = np.unique(np.asarray(inclusion_ml, dtype = 'float64'))
+    expansion_ml = np.unique(np.asarray(expansion_ml, dtype = 'float64'))
+    n_inc, n_exp = len(inclusion_ml), len(expansion_ml)
+
+    # bin k: the patient meets the k smallest thresholds
+    first_volume = np.where(np.isnan(sweep['first_volume']), -np.inf, sweep['first_volume'])
+    inc_bin = np.searchsorted(inclusion_ml, first_volume, side = 'right')
+
+    # patients meeting inclusion threshold k = patients with bin > k
+    n_patients = np.cumsum(np.bincount(inc_bin, minlength = n_inc + 1)[::-1])[::-1][1:]
+
+    rows = []
+    for window in window_hours:
+        max_change, n_scans = _window_max(sweep, window)
+        exp_bin = np.searchsorted(expansion_ml, max_change, side = 'right')
+
+        # 2D histogram of (inclusion bin, expansion bin), cumulated from the largest thresholds down
+        hist = np.bincount(inc_bin * (n_exp + 1) + exp_bin, minlength = (n_inc + 1) * (n_exp + 1)).reshape(n_inc + 1, n_exp + 1)
+        cases = hist[::-1, ::-1].cumsum(axis = 0).cumsum(axis = 1)[::-1, ::-1][1:, 1:]
+        follow_up = np.cumsum(np.bincount(inc_bin[n_scans > 1], minlength = n_inc + 1)[::-1])[::-1][1:]
+
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            prevalence = cases / n_patients[:, None]
+        rows.append(pd.DataFrame({'inclusion_ml': np.repeat(inclusion_ml, n_exp),
+                                  'expansion_ml': np.tile(expansion_ml, n_inc),
+                                  'window_hours': window,
+                                  'n_patients': np.repeat(n_patients, n_exp),
+                                  'n_follow_up': np.repeat(follow_up, n_exp),
+                                  'n_cases': cases.ravel(),
+                                  'prevalence': prevalence.ravel()}))
+    return pd.concat(rows, ignore_index = True)
+
+
+# outcome labels (0/1) of one definition for the included patients, indexed by patient id
+def outcome_labels(sweep, inclusion_ml, expansion_ml, window_hours):
+    max_change, _ = _window_max(sweep, window_hours)
+    included = sweep['first_volume'] >= inclusion_ml
+    labels = (max_change[included] >= expansion_ml).astype('int8')
+    return pd.Series(labels, index = pd.Index(sweep['ids'][included], name = 'unique_study_id'), name = 'outcome')
@@ -0,0 +1,123 @@
+# Date: 10-19-2026
+# Objective: Compute longitudinal (change from first scan) features for every hemorrhage compartment in one pass.
+# Used by scripts/09_filter_predictions.py and scripts/11_prepare_cohort.py instead of a separate groupby().transform() per compartment.
+#
+# For each compartment (e.g. 'iph') the following columns are added:
+#   {c}_volume_first                   volume on the patient's first scan (the first scan with a volume, as
+#                                      groupby().transform('first'))
+#   change_{c}_volume_first_scan       volume - volume on the first scan
+#   change_{c}_volume_previous_scan    volume - volume on the previous scan (NaN for the first scan)
+#   {c}_growth_rate_ml_per_hour        change from the first scan / hours since the first scan (NaN for the first scan)
+#   max_change_{c}_volume_first_scan   the patient's maximum change from the first scan
+
+import numpy as np
+import pandas as pd
+
+from nu_tbi.regional import regional_columns
+
+# blast-ct predicted volume for each hemorrhage compartment
+COMPARTMENTS = {
+    'iph': 'iph_predicted_volume_ml',
+    'eah': 'eah_predicted_volume_ml',
+    'ivh': 'ivh_predicted_volume_ml',
+    'oedema': 'oedema_predicted_volume_ml',
+}
+
+# blast-ct regional volumes are named prediction_{compartment}_{region}_ml (nu_tbi/regional.py)
+REGIONAL_PREFIX = 'prediction_'
+
+
+# return the start position of each group and the group index of every row for an array of sorted ids
+def group_offsets(sorted_ids):
+    sorted_ids = np.asarray(sorted_ids)
+    n = len(sorted_ids)
+    if n == 0:
+        return np.array([], dtype = 'int64'), np.array([], dtype = 'int64')
+    new_group = np.ones(n, dtype = bool)
+    new_group[1:] = sorted_ids[1:] != sorted_ids[:-1]
+    starts = np.flatnonzero(new_group)
+    group_index = np.cumsum(new_group) - 1
+    return starts, group_index
+
+
+# row of the first non-missing value of each group (len(valid) if the group has none), per column of `valid`
+# rows are sorted by group and `starts` are the group start positions (group_offsets)
+def first_valid_rows(valid, starts):
+    if len(starts) == 0:
+        return np.zeros((0,) + valid.shape[1:], dtype = 'int64')
+    rows = np.arange(len(valid)).reshape((-1,) + (1,) * (valid.ndim - 1))
+    return np.minimum.reduceat(np.where(valid, rows, len(valid)), starts, axis = 0)
+
+
+# first non-missing value of every row's group, as groupby().transform('first'); missing if the group has none
+def group_first(values, valid, starts, group_index):
+    padded = np.concatenate([values, np.full((1,) + values.shape[1:], np.nan).astype(values.dtype)])
+    rows = first_valid_rows(valid, starts)[group_index]
+    return padded[rows] if values.ndim == 1 else np.take_along_axis(padded, rows, axis = 0)
+
+
+# compute change from first/previous scan, growth rate, and max change for every compartment
+# the dataframe is sorted once by `id_col` + `order_by`; all features are then computed on the (rows x compartments) array
+# when `regional` is True, the same features are also computed for every prediction_{compartment}_{region}_ml column
+# if `time_col` is present, `first_scan_time` and `time_since_first_scan` (hours, rounded to `round_time`) are also added
+def compute_trajectories(dataframe, compartments = COMPARTMENTS, id_col = 'unique_study_id', order_by = ['StudyDate_Time_format'],
+                         time_col = 'StudyDate_Time_format', round_time = 'h', regional = False):
+
+    dataframe = dataframe.sort_values([id_col] + list(order_by), kind = 'mergesort').reset_index(drop = True)
+
+    names = {name: col for name, col in compartments.items()}
+    if regional:
+        # e.g. prediction_iph_LeftInsula_ml -> prediction_iph_LeftInsula
+        names.update({col[:-len('_ml')]: col for col in regional_columns(dataframe)})
+
+    starts, group_index = group_offsets(dataframe[id_col].to_numpy())
+    is_first = np.arange(len(dataframe)) == starts[group_index]
+
+    features = {}
+
+    hours = None
+    if time_col is not None and time_col in dataframe.columns:
+        scan_time = pd.to_datetime(dataframe[time_col])
+        times = scan_time.to_numpy()
+        first_scan_time = pd.Series(group_first(times, ~np.isnat(times), starts, group_index), index = dataframe.index)
+        time_since_first = scan_time - first_scan_time
+        hours = (time_since_first / pd.Timedelta('1 hour')).to_numpy(dtype = 'float64')
+        features['first_scan_time'] = first_scan_time
+        if round_time is not None:
+            time_since_first = time_since_first.dt.round(round_time)
+        features['time_since_first_scan'] = time_since_first / pd.Timedelta('1 hour')
+
+    if len(names) > 0:
+        values = dataframe[list(names.values())].to_numpy(dtype = 'float64')
+
+        first = group_first(values, ~np.isnan(values), starts, group_index)
+        change_first = values - first
+
+        change_previous = np.full_like(values, np.nan)
+        change_previous[1:] = values[1:] - values[:-1]
+        change_previous[is_first] = np.nan
+
+        if hours is not None:
+            with np.errstate(divide = 'ignore', invalid = 'ignore'):
+                growth_rate = change_first / hours[:, None]
+            growth_rate[~np.isfinite(growth_rate)] = np.nan
+        else:
+            growth_rate = np.full_like(values, np.nan)
+
+        # fmax ignores NaN, matching groupby().transform('max')
+        max_change_first = np.fmax.reduceat(change_first, starts, axis = 0)[group_index] if len(starts) else change_first
+
+        for i, name in enumerate(names):
+            volume = name if name.startswith(REGIONAL_PREFIX) else name + '_volume'
+            features[volume + '_first'] = first[:, i]
+            features['change_' + volume + '_first_scan'] = change_first[:, i]
+            features['change_' + volume + '_previous_scan'] = change_previous[:, i]
+            features[name + '_growth_rate_ml_per_hour'] = growth_rate[:, i]
+            features['max_change_' + volume + '_first_scan'] = max_change_first[:, i]
+
+    features = pd.DataFrame(features, index = dataframe.index)
+
+    # drop previously computed features so that recomputing after an exclusion replaces them
+    dataframe = dataframe.drop(columns = [col for col in features.columns if col in dataframe.columns])
+
+    return pd.concat([dataframe, features], axis = 1)
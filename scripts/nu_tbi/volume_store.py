@@ -0,0 +1,225 @@
+# Date: 10-19-2026
+# Objective: Compressed, slice-chunked storage of CT volumes and blast-ct label maps.
+# nifti_images/ holds uncompressed .nii files from dcm2niix and blast-ct writes full size prediction volumes, which
+# together take most of the shared filesystem. A .vol file stores one volume with its affine:
+#   8 bytes  magic b'NUVOL1\0\0'
+#   8 bytes  header length (little endian uint64)
+#   header   JSON: shape, dtype, affine, chunk_slices, codec, offsets and sizes of the chunks, source file size/mtime
+#   chunks   every `chunk_slices` slices along the last (slice) axis, byte-shuffled and compressed
+# Values are stored losslessly as uint8 (label maps, masks) or int16 (CT), whichever holds them. Byte shuffling puts
+# the high bytes of neighbouring int16 voxels next to each other, which compresses much better. Slices are read
+# without decompressing the rest of the volume (read_slices). Compression uses pyarrow's codecs (zstd by default),
+# so no extra dependency is needed.
+#
+#   write_volume('scan.vol', data, affine)
+#   data, affine = read_volume('scan.vol')
+#   axial = read_slices('scan.vol', 20, 30)     # data[:, :, 20:30]
+#   image = load_image('scan.vol')              # nibabel image, for .vol, nifti and DICOM folder paths alike
+
+import json
+import os
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import nibabel as nib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from nu_tbi.staging import stage
+
+MAGIC = b'NUVOL1\0\0'
+
+# relative to NU_TBI/
+STORE_DIR = 'data/processed/volume_store'
+
+CHUNK_SLICES = 8
+
+
+# smallest lossless storage type of a volume: uint8 for label maps and masks, int16 for CT
+def storage_dtype(data):
+    if data.size and not np.array_equal(data, np.round(data)):
+        raise ValueError('volume has non-integer values')
+    low, high = (data.min(), data.max()) if data.size else (0, 0)
+    for dtype in ['uint8', 'int16']:
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return dtype
+    raise ValueError(f'values {low} to {high} do not fit in int16')
+
+
+# group the bytes of every value by significance (all low bytes, then all high bytes)
+def _shuffle(array):
+    return array.view('uint8').reshape(-1, array.itemsize).T.tobytes()
+
+
+def _unshuffle(buffer, dtype, shape):
+    itemsize = np.dtype(dtype).itemsize
+    data = np.frombuffer(buffer, dtype = 'uint8').reshape(itemsize, -1).T
+    return np.ascontiguousarray(data).view(dtype).reshape(shape)
+
+
+# write a 3D volume (with its affine) to `path`; extra items are stored in the header
+def write_volume(path, data, affine, dtype = None, chunk_slices = CHUNK_SLICES, codec = 'zstd', level = 3, **extra):
+    data = np.asarray(data)
+    if data.ndim != 3:
+        raise ValueError(f'expected a 3D volume, got shape {data.shape}')
+    dtype = dtype or storage_dtype(data)
+    data = data.astype(dtype, copy = False)
+    compressor = pa.Codec(codec, compression_level = level)
+
+    # chunks are stored slice-major (slices, x, y) so that one chunk is one contiguous block
+    chunks = []
+    for start in range(0, data.shape[2], chunk_slices):
+        chunk = np.ascontiguousarray(np.moveaxis(data[:, :, start:start + chunk_slices], 2, 0))
+        chunks.append(compressor.compress(_shuffle(chunk), asbytes = True))
+
+    sizes = [len(c) for c in chunks]
+    header = {'shape': list(data.shape), 'dtype': str(data.dtype), 'affine': np.asarray(affine).tolist(),
+              'chunk_slices': chunk_slices, 'codec': codec, 'sizes': sizes,
+              'offsets': np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype('int64').tolist() if sizes else []}
+    header.update(extra)
+    encoded = json.dumps(header).encode()
+
+    # write to a temporary name first so a partial file is never read
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC + struct.pack('<Q', len(encoded)) + encoded)
+        for chunk in chunks:
+            f.write(chunk)
+    os.replace(tmp, path)
+    return header
+
+
+# header of a .vol file; `data_start` is the file offset of the first chunk
+def read_header(path):
+    with open(path, 'rb') as f:
+        if f.read(8) != MAGIC:
+            raise ValueError(f'{path} is not a volume store file')
+        length = struct.unpack('<Q', f.read(8))[0]
+        header = json.loads(f.read(length))
+    header['data_start'] = 16 + length
+    return header
+
+
+# slices start:stop along the last axis (data[:, :, start:stop]); only the chunks holding them are read
+def read_slices(path, start = 0, stop = None, header = None):
+    header = header or read_header(path)
+    nx, ny, nz = header['shape']
+    start, stop, _ = slice(start, stop).indices(nz)
+    if stop <= start:
+        return np.zeros((nx, ny, 0), dtype = header['dtype'])
+
+    n = header['chunk_slices']
+    codec = pa.Codec(header['codec'])
+    itemsize = np.dtype(header['dtype']).itemsize
+    parts = []
+    with open(path, 'rb') as f:
+        for i in range(start // n, (stop - 1) // n + 1):
+            f.seek(header['data_start'] + header['offsets'][i])
+            depth = min(n, nz - i * n)
+            buffer = codec.decompress(f.read(header['sizes'][i]), decompressed_size = depth * nx * ny * itemsize, asbytes = True)
+            parts.append(_unshuffle(buffer, header['dtype'], (depth, nx, ny)))
+    first = (start // n) * n
+    return np.moveaxis(np.concatenate(parts)[start - first:stop - first], 0, 2)
+
+
+# whole volume and affine
+def read_volume(path):
+    header = read_header(path)
+    return read_slices(path, header = header), np.array(header['affine'])
+
+
+# nibabel image of a .vol file, a nifti file or a DICOM series folder (stacked in memory), so callers can read any
+# files are read through the local staging cache (nu_tbi.staging)
+def load_image(path):
+    if os.path.isdir(path):
+        from nu_tbi.dicom_series import series_image
+        return series_image(path)
+    if path.endswith('.vol'):
+        data, affine = read_volume(stage(path))
+        return nib.Nifti1Image(data, affine)
+    return nib.load(stage(path))
+
+
+# path of the stored copy of a nifti file (mirrors its path under store_dir)
+def store_path(path, store_dir = STORE_DIR):
+    stem = path[:-len('.nii.gz')] if path.endswith('.nii.gz') else os.path.splitext(path)[0]
+    return os.path.join(store_dir, stem.lstrip(os.sep) + '.vol')
+
+
+# convert one nifti file unless its stored copy is up to date; returns the index row (paths, bytes, seconds, error)
+def convert_file(task):
+    source, target = task['source'], task['target']
+    result = {'source': source, 'target': target, 'source_bytes': None, 'stored_bytes': None, 'dtype': None,
+              'seconds': None, 'converted': False, 'error': None}
+    try:
+        stat = os.stat(source)
+        result['source_bytes'] = stat.st_size
+        if os.path.exists(target):
+            header = read_header(target)
+            if header.get('source_size') == stat.st_size and header.get('source_mtime_ns') == stat.st_mtime_ns:
+                result.update({'stored_bytes': os.path.getsize(target), 'dtype': header['dtype']})
+                return result
+
+        start = time.perf_counter()
+        image = nib.load(source)
+        data = np.asarray(image.dataobj)
+        if data.ndim == 4 and data.shape[3] == 1:
+            data = data[..., 0]
+        os.makedirs(os.path.dirname(target) or '.', exist_ok = True)
+        header = write_volume(target, data, image.affine, chunk_slices = task['chunk_slices'], codec = task['codec'],
+                              level = task['level'], source_size = stat.st_size, source_mtime_ns = stat.st_mtime_ns)
+        if task['verify'] and not np.array_equal(read_volume(target)[0], data):
+            os.remove(target)
+            raise ValueError('stored volume differs from the source')
+        result.update({'stored_bytes': os.path.getsize(target), 'dtype': header['dtype'],
+                       'seconds': time.perf_counter() - start, 'converted': True})
+    except Exception as e:
+        result['error'] = f'{type(e).__name__}: {e}'
+    return result
+
+
+# convert nifti files to the store in a process pool; returns the index (source, target, bytes before/after, errors)
+def convert_files(paths, store_dir = STORE_DIR, chunk_slices = CHUNK_SLICES, codec = 'zstd', level = 3, verify = True, jobs = 1):
+    tasks = [{'source': path, 'target': store_path(path, store_dir), 'chunk_slices': chunk_slices, 'codec': codec,
+              'level': level, 'verify': verify} for path in paths]
+    if jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers = jobs) as pool:
+            results = list(pool.map(convert_file, tasks, chunksize = max(1, len(tasks) // (jobs * 8))))
+    else:
+        results = [convert_file(task) for task in tasks]
+    return pd.DataFrame(results)
+
+
+# read throughput of the store vs the nifti files: full volume reads (MB/s of voxel data) and random single slice reads
+def read_throughput(index, n_files = 20, n_slices = 20, seed = 1300):
+    rng = np.random.default_rng(seed)
+    done = index[index['error'].isnull()]
+    sample = done.sample(min(n_files, len(done)), random_state = seed) if len(done) else done
+    timing = {'nifti_volume': 0.0, 'store_volume': 0.0, 'nifti_slice': 0.0, 'store_slice': 0.0}
+    voxel_bytes, slices = 0, 0
+    for row in sample.itertuples():
+        start = time.perf_counter()
+        data = np.asarray(nib.load(row.source).dataobj)
+        timing['nifti_volume'] += time.perf_counter() - start
+        start = time.perf_counter()
+        stored = read_volume(row.target)[0]
+        timing['store_volume'] += time.perf_counter() - start
+        voxel_bytes += stored.nbytes
+
+        for z in rng.integers(0, data.shape[2], size = n_slices):
+            start = time.perf_counter()
+            np.asarray(nib.load(row.source).dataobj[:, :, z])
+            timing['nifti_slice'] += time.perf_counter() - start
+            start = time.perf_counter()
+            read_slices(row.target, z, z + 1)
+            timing['store_slice'] += time.perf_counter() - start
+            slices += 1
+
+    mb = voxel_bytes / 1e6
+    return pd.DataFrame([{'format': name,
+                          'volume_MB_per_s': mb / timing[f'{key}_volume'] if timing[f'{key}_volume'] else np.nan,
+                          'slices_per_s': slices / timing[f'{key}_slice'] if timing[f'{key}_slice'] else np.nan}
+                         for name, key in [('nifti', 'nifti'), ('volume store', 'store')]])
@@ -0,0 +1,113 @@
+# Date: 10-19-2026
+# Objective: Read the excel workbooks (manual review sheets, annotated radiology reports) once and keep typed parquet
+# snapshots of their sheets, keyed by the hash of the workbook's content.
+# openpyxl parses the whole workbook on every pd.read_excel call, and the manual review workbook is read by 09, 10 and 11.
+# On the first read of a workbook all of its sheets are parsed in one openpyxl pass and each sheet is written to
+# CACHE_DIR/<workbook>-<hash>/; later reads of the unchanged workbook only read the parquet files.
+# Editing the workbook changes its hash, so the next read re-parses it and the old snapshot is removed.
+# Columns that mix types (e.g. numbers and text in a notes column) cannot be stored in parquet; such sheets are
+# snapshotted as pickles so the values and types read back are exactly those from pd.read_excel.
+# Parquet column names are text, so the original column labels (e.g. a header cell 2019 read as a number) are kept in
+# the file's metadata and restored on read; sheets whose labels cannot be stored as JSON are pickled as well.
+#
+#   scans_to_exclude = read_sheet('data/processed/manual_review/02_initial_tbi_patient_list_inclusion.xlsx', 'scans_to_exclude')
+# Note: requires pyarrow (pip install pyarrow)
+
+import json
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from nu_tbi.hashing import file_digest
+
+# relative to NU_TBI/
+CACHE_DIR = 'data/processed/workbook_cache'
+# part of the snapshot folder name; increase it when the snapshot format changes so old snapshots are rebuilt
+SNAPSHOT_VERSION = 2
+# parquet metadata key holding the JSON list of the sheet's column labels
+LABELS_KEY = b'nu_tbi.column_labels'
+
+
+# folder holding the snapshot of a workbook's current content
+def snapshot_dir(path, cache_dir = CACHE_DIR):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_dir, f'{stem}-{file_digest(path, {})}.v{SNAPSHOT_VERSION}')
+
+
+# write one sheet; parquet if every column has a single type and its labels can be stored as JSON, pickle otherwise
+def _write_sheet(dataframe, base):
+    try:
+        labels = json.dumps(list(dataframe.columns))
+        table = pa.Table.from_pandas(dataframe.set_axis([str(c) for c in dataframe.columns], axis = 1))
+        table = table.replace_schema_metadata({**table.schema.metadata, LABELS_KEY: labels.encode()})
+        pq.write_table(table, base + '.parquet')
+    except (TypeError, ValueError, pa.ArrowNotImplementedError):
+        # ArrowInvalid and ArrowTypeError are ValueError and TypeError
+        dataframe.to_pickle(base + '.pkl')
+
+
+# parse every sheet of the workbook once and write the snapshot; older snapshots of the workbook are removed
+# sheets are stored as 0.parquet, 1.parquet, ... in workbook order; sheets.json holds their names
+def _build_snapshot(path, folder, cache_dir):
+    print(f'parsing {path} (no snapshot for its current content)')
+    sheets = pd.read_excel(path, sheet_name = None, engine = 'openpyxl')
+
+    # write to a temporary folder first: stages that run concurrently (10 and 11) may build the same snapshot
+    os.makedirs(cache_dir, exist_ok = True)
+    tmp = tempfile.mkdtemp(dir = cache_dir)
+    for i, dataframe in enumerate(sheets.values()):
+        _write_sheet(dataframe, os.path.join(tmp, str(i)))
+    with open(os.path.join(tmp, 'sheets.json'), 'w') as f:
+        json.dump([str(name) for name in sheets], f)
+    try:
+        os.rename(tmp, folder)
+    except OSError:
+        shutil.rmtree(tmp)
+
+    stem = os.path.basename(folder).rsplit('-', 1)[0]
+    for other in os.listdir(cache_dir):
+        if other != os.path.basename(folder) and other.rsplit('-', 1)[0] == stem:
+            shutil.rmtree(os.path.join(cache_dir, other), ignore_errors = True)
+    return sheets
+
+
+# read one sheet from a snapshot
+def _read_snapshot_sheet(folder, i):
+    base = os.path.join(folder, str(i))
+    if os.path.exists(base + '.parquet'):
+        dataframe = pd.read_parquet(base + '.parquet', engine = 'pyarrow')
+        dataframe.columns = json.loads(pq.read_schema(base + '.parquet').metadata[LABELS_KEY])
+        return dataframe
+    return pd.read_pickle(base + '.pkl')
+
+
+# read sheets of a workbook; `sheet_names` = None reads every sheet
+# returns a dict sheet name -> dataframe, as pd.read_excel(path, sheet_name = [...])
+def read_workbook(path, sheet_names = None, cache_dir = CACHE_DIR):
+    folder = snapshot_dir(path, cache_dir)
+    if os.path.isdir(folder):
+        with open(os.path.join(folder, 'sheets.json')) as f:
+            names = json.load(f)
+        sheets = None
+    else:
+        sheets = _build_snapshot(path, folder, cache_dir)
+        names = list(sheets)
+
+    # sheets can also be given by position, as in pd.read_excel
+    sheet_names = names if sheet_names is None else [names[name] if isinstance(name, int) and name < len(names) else name
+                                                     for name in sheet_names]
+    missing = [name for name in sheet_names if name not in names]
+    if missing:
+        raise ValueError(f'Worksheet(s) {missing} not found in {path}. Sheets: {names}')
+    if sheets is not None:
+        return {name: sheets[name] for name in sheet_names}
+    return {name: _read_snapshot_sheet(folder, names.index(name)) for name in sheet_names}
+
+
+# read one sheet of a workbook (by name or position)
+def read_sheet(path, sheet_name = 0, cache_dir = CACHE_DIR):
+    return next(iter(read_workbook(path, [sheet_name], cache_dir = cache_dir).values()))
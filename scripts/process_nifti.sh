@@ -1,8 +1,11 @@
 #!/bin/bash
 
-for i in $(cat /share/nubar/Neurotrauma/hematoma_expansion/NU_TBI/data/processed/axial_brain_folders.txt); do
+# project directory; set NU_TBI_DIR to run elsewhere (see scripts/nu_tbi/paths.py)
+NU_TBI_DIR=${NU_TBI_DIR:-/share/nubar/Neurotrauma/hematoma_expansion/NU_TBI}
+
+for i in $(cat $NU_TBI_DIR/data/processed/axial_brain_folders.txt); do
    echo $i
-   output_dir=/share/nubar/Neurotrauma/hematoma_expansion/NU_TBI/nifti_images/
+   output_dir=$NU_TBI_DIR/nifti_images/
    # modify output to remove everything before actual patient specific image folder 
    output_folder=${i##*/images/}
    mkdir -p $output_dir$output_folder
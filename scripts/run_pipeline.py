@@ -0,0 +1,39 @@
+# Date: 10-19-2026
+# Objective: Run the NU_TBI pipeline (scripts 01-12) in dependency order, skipping stages whose inputs have not changed.
+# Stage inputs/outputs are declared in scripts/nu_tbi/runner.py.
+#
+# Usage (from NU_TBI/):
+#   python scripts/run_pipeline.py                 # run every stage that is out of date
+#   python scripts/run_pipeline.py --dry-run       # list the stages that would run
+#   python scripts/run_pipeline.py 09 11 --force   # rerun 09 and 11 even if they are up to date
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from nu_tbi.runner import run_pipeline, STAGES
+
+parser = argparse.ArgumentParser(description = 'run the NU_TBI pipeline')
+parser.add_argument('stages', nargs = '*', help = 'stage names or number prefixes to run (default: all stages)')
+parser.add_argument('--force', action = 'store_true', help = 'rerun the selected stages even if they are up to date')
+parser.add_argument('--dry-run', action = 'store_true', help = 'only print which stages would run')
+parser.add_argument('--jobs', type = int, default = 2, help = 'number of stages to run concurrently')
+parser.add_argument('--list', action = 'store_true', help = 'list the stages and exit')
+args = parser.parse_args()
+
+if args.list:
+    for stage in STAGES:
+        print(stage['name'])
+        print('    inputs: ', ', '.join(stage['inputs']))
+        print('    outputs:', ', '.join(stage['outputs']))
+    sys.exit(0)
+
+summary = run_pipeline(selected = args.stages or None, force = args.force, jobs = args.jobs, dry_run = args.dry_run)
+
+for name, status in summary.items():
+    print(f'{name}: {status}')
+
+if any(status.startswith(('failed', 'missing', 'skipped')) for status in summary.values()):
+    sys.exit(1)
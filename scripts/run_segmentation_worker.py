@@ -0,0 +1,44 @@
+# Date: 10-19-2026
+# Objective: Run a long-lived segmentation worker (see scripts/nu_tbi/segmentation_worker.py): the model is loaded
+# once and every batch file submitted to the queue is segmented in turn, with prediction.csv rows written as scans
+# finish. Replaces launching blast-ct-inference by hand for every batch in README/03_run_blast_ct.md.
+#
+# Usage (from NU_TBI/):
+#   python scripts/run_segmentation_worker.py --submit data/processed/blast_ct_batches/blast_ct_batch_*.csv
+#   python scripts/run_segmentation_worker.py --model my_blast_ct_adapter:load_model     # keeps polling the queue
+#   python scripts/run_segmentation_worker.py --model threshold --once                   # CPU stub, stop when empty
+#   touch data/processed/segmentation_queue/STOP                                         # stop a running worker
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from nu_tbi.paths import NU_TBI_DIR
+from nu_tbi.segmentation_worker import OUTPUT_DIR, PREFETCH, QUEUE_DIR, load_model, serve_queue, submit_batches
+
+parser = argparse.ArgumentParser(description = 'long-lived segmentation worker')
+parser.add_argument('--submit', nargs = '+', help = 'copy these batch files into the queue and exit')
+parser.add_argument('--model', default = 'threshold', help = "'threshold' (CPU stub) or 'module:function' returning predict(image)")
+parser.add_argument('--queue-dir', default = QUEUE_DIR)
+parser.add_argument('--output-dir', default = OUTPUT_DIR, help = 'job folders (batch_<n>/predictions/) are created here')
+parser.add_argument('--once', action = 'store_true', help = 'stop when the queue is empty instead of waiting for new batches')
+parser.add_argument('--poll', type = float, default = 10, help = 'seconds between checks of an empty queue')
+parser.add_argument('--prefetch', type = int, default = PREFETCH, help = 'images read and decoded ahead of the model')
+args = parser.parse_args()
+
+os.chdir(NU_TBI_DIR)
+
+if args.submit:
+    submit_batches(args.submit, queue_dir = args.queue_dir)
+    print('Submitted batches:', len(args.submit))
+    sys.exit(0)
+
+start = time.time()
+predict = load_model(args.model)
+print(f'loaded model {args.model} in {time.time() - start:.1f} seconds')
+
+serve_queue(predict, queue_dir = args.queue_dir, output_dir = args.output_dir, poll_seconds = args.poll, once = args.once,
+            prefetch = args.prefetch)
@@ -0,0 +1,57 @@
+# Date: 10-19-2026
+# Objective: Estimate how stable model performance is over many patient-grouped, outcome-stratified splits of the data
+# prepared by scripts/11_prepare_cohort.py (the single split used for modeling is made in 12_prepare_training_test.py).
+# See scripts/nu_tbi/modeling.py for how splits are made, cached and evaluated.
+# Output: data/modeling/split_study/summary.csv (bootstrap and across-repeat intervals per outcome and model),
+#         fold_metrics.csv (metrics of every fold) and predictions.csv (out-of-fold scores averaged over repeats)
+#
+# Usage (from NU_TBI/):
+#   python scripts/run_split_study.py --n-repeats 50 --jobs 8
+#   python scripts/run_split_study.py --mode holdout --test-size 0.3 --models logistic --outcomes outcome_8ml
+
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from nu_tbi.cohort_store import read_table
+from nu_tbi.modeling import run_study, MODELS, OUTCOMES, FEATURES
+
+OUT_DIR = 'data/modeling/split_study'
+
+parser = argparse.ArgumentParser(description = 'repeated split modeling study')
+parser.add_argument('--outcomes', nargs = '+', default = OUTCOMES)
+parser.add_argument('--models', nargs = '+', default = list(MODELS), choices = list(MODELS))
+parser.add_argument('--mode', default = 'cv', choices = ['cv', 'holdout'], help = 'k-fold cross-validation or repeated holdout')
+parser.add_argument('--n-repeats', type = int, default = 20)
+parser.add_argument('--n-splits', type = int, default = 5, help = 'folds per repeat (cv)')
+parser.add_argument('--test-size', type = float, default = 0.3, help = 'test fraction (holdout)')
+parser.add_argument('--n-boot', type = int, default = 2000, help = 'bootstrap samples for confidence intervals')
+parser.add_argument('--seed', type = int, default = 1300)
+parser.add_argument('--exclude-censored', action = 'store_true', help = 'drop patients with second_scan_post_surgery_trauma == 1')
+parser.add_argument('--jobs', type = int, default = os.cpu_count())
+args = parser.parse_args()
+
+start = time.time()
+tbi_data = read_table('tbi_data_first_scan', columns = ['unique_study_id', 'second_scan_post_surgery_trauma'] + FEATURES + OUTCOMES)
+if args.exclude_censored:
+    tbi_data = tbi_data[tbi_data['second_scan_post_surgery_trauma'].fillna(0) == 0]
+print('Number of patients:', len(tbi_data))
+
+summary, fold_metrics, predictions = run_study(tbi_data, outcomes = args.outcomes, models = args.models, mode = args.mode,
+                                               n_repeats = args.n_repeats, n_splits = args.n_splits, test_size = args.test_size,
+                                               seed = args.seed, n_boot = args.n_boot, jobs = args.jobs)
+
+os.makedirs(OUT_DIR, exist_ok = True)
+summary.to_csv(os.path.join(OUT_DIR, 'summary.csv'), index = False)
+fold_metrics.to_csv(os.path.join(OUT_DIR, 'fold_metrics.csv'), index = False)
+predictions.to_csv(os.path.join(OUT_DIR, 'predictions.csv'), index = False)
+
+pd.set_option('display.width', 250)
+print(summary[['outcome', 'model', 'n', 'n_cases', 'auroc', 'auroc_low', 'auroc_high', 'auroc_repeat_low', 'auroc_repeat_high',
+               'average_precision', 'average_precision_low', 'average_precision_high', 'brier']].round(3).to_string(index = False))
+print(f'{len(fold_metrics)} fits in {(time.time() - start) / 60:.2f} minutes')
@@ -0,0 +1,25 @@
+# Date: 10-19-2026
+# Objective: Serve filter/sort/aggregate queries on the TBI cohort over a local HTTP/JSON server, so review questions
+# (as in scripts/10_tbi_cohort_inclusion.py) do not reload the cohort each time. See scripts/nu_tbi/cohort_query.py
+# for the query format.
+#
+# Usage (from NU_TBI/):
+#   python scripts/serve_cohort.py --port 8050
+#   curl -s localhost:8050/query -d '{"filters": [{"column": "eah_predicted_volume_ml", "op": ">=", "value": 10}],
+#                                    "columns": ["unique_study_id", "id", "eah_predicted_volume_ml"],
+#                                    "sort": [{"column": "eah_predicted_volume_ml", "ascending": false}]}'
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from nu_tbi.cohort_query import serve
+
+parser = argparse.ArgumentParser(description = 'serve cohort queries')
+parser.add_argument('--host', default = '127.0.0.1', help = 'address to bind (default: localhost only)')
+parser.add_argument('--port', type = int, default = 8050)
+args = parser.parse_args()
+
+serve(host = args.host, port = args.port)
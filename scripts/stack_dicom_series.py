@@ -0,0 +1,76 @@
+# Date: 10-19-2026
+# Objective: Stack the axial brain DICOM series selected by scripts/06_prepare_axial_brain_windows.py into volumes in
+# memory (see scripts/nu_tbi/dicom_series.py), check their geometry, and optionally archive them as nifti in the same
+# layout as scripts/process_nifti.sh (nifti_images/<folder after /images/>/<PatientID>_<SeriesNumber>.nii).
+# Stages that read images through nu_tbi.volume_store.load_image accept a series folder directly, so writing nifti is
+# only needed for blast-ct and for archiving.
+# Output: data/processed/dicom_series_index.csv (series folder, shape, spacing, tilt, irregular spacing, nifti path)
+#
+# Usage (from NU_TBI/):
+#   python scripts/stack_dicom_series.py --jobs 8                   # check every series, nothing written
+#   python scripts/stack_dicom_series.py --jobs 8 --write-nifti     # also archive as nifti
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import nibabel as nib
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from nu_tbi.dicom_series import nifti_name, read_series, save_nifti
+from nu_tbi.paths import NU_TBI_DIR
+
+
+# stack one series (and write it as nifti when asked); returns its index row
+def stack(task):
+    directory, write_nifti = task
+    row = {'series_dir': directory, 'error': None}
+    try:
+        start = time.perf_counter()
+        data, affine, info = read_series(directory, threads = 8)
+        row.update({key: info[key] for key in ['n_slices', 'shape', 'spacing', 'irregular_spacing', 'tilted']})
+        if write_nifti:
+            row['nifti'] = os.path.join('nifti_images', directory.split('/images/', 1)[-1], nifti_name(info))
+            save_nifti(nib.Nifti1Image(data, affine), row['nifti'])
+        row['seconds'] = time.perf_counter() - start
+    except Exception as e:
+        row['error'] = f'{type(e).__name__}: {e}'
+    return row
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'stack DICOM series into volumes')
+    parser.add_argument('--folders', default = 'data/processed/axial_brain_folders.txt', help = 'file with one series folder per line')
+    parser.add_argument('--write-nifti', action = 'store_true', help = 'archive the volumes as nifti in nifti_images/')
+    parser.add_argument('--jobs', type = int, default = os.cpu_count())
+    args = parser.parse_args()
+
+    os.chdir(NU_TBI_DIR)
+
+    with open(args.folders) as f:
+        folders = list(dict.fromkeys(line.strip().rstrip('/') for line in f if line.strip()))
+    print('Number of series:', len(folders))
+
+    start = time.time()
+    tasks = [(folder, args.write_nifti) for folder in folders]
+    if args.jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers = args.jobs) as pool:
+            index = pd.DataFrame(pool.map(stack, tasks, chunksize = max(1, len(tasks) // (args.jobs * 8))))
+    else:
+        index = pd.DataFrame([stack(task) for task in tasks])
+    print(f'stacked {index["error"].isnull().sum()} series in {(time.time() - start) / 60:.2f} minutes')
+
+    errors = index[index['error'].notnull()]
+    print('Number of series that could not be stacked:', len(errors))
+    if len(errors):
+        print(errors[['series_dir', 'error']].head(20).to_string(index = False))
+    done = index[index['error'].isnull()]
+    if len(done):
+        print('Number of gantry tilted series:', done['tilted'].sum())
+        print('Number of series with irregular slice spacing:', done['irregular_spacing'].sum())
+
+    index.to_csv('data/processed/dicom_series_index.csv', index = False)
@@ -0,0 +1,36 @@
+# Date: 10-19-2026
+# Objective: Summarize and compare stage timings recorded by nu_tbi/instrument.py (data/processed/pipeline_logs/run_log.jsonl).
+#
+# Usage (from NU_TBI/):
+#   python scripts/summarize_runs.py                       # compare the two most recent runs
+#   python scripts/summarize_runs.py RUN_ID_1 RUN_ID_2     # compare specific runs
+#   python scripts/summarize_runs.py --list                # list recorded runs
+
+import argparse
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from nu_tbi.instrument import compare_runs, load_run_log, RUN_LOG
+
+# set options so the full comparison table is printed
+pd.set_option('display.max_columns', None)
+pd.set_option('display.width', 250)
+
+parser = argparse.ArgumentParser(description = 'compare pipeline runs')
+parser.add_argument('run_ids', nargs = '*', help = 'run ids to compare (default: the two most recent runs)')
+parser.add_argument('--log', default = RUN_LOG, help = 'path to the run log')
+parser.add_argument('--list', action = 'store_true', help = 'list recorded runs and exit')
+args = parser.parse_args()
+
+log = load_run_log(args.log)
+
+if args.list:
+    runs = log.groupby('run_id').agg(started = ('started', 'min'), spans = ('span', 'count'), wall_seconds = ('wall_seconds', 'sum'))
+    print(runs.sort_values('started'))
+    sys.exit(0)
+
+print(compare_runs(log, run_ids = args.run_ids or None).round(3))